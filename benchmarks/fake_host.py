@@ -0,0 +1,419 @@
+"""
+Stand-in SSH hosts for the benchmarks, served with asyncssh in a subprocess.
+
+A FakeHost answers every command of const.ACTIONS with a canned Linux or Windows output without spawning any process,
+including the inventory scripts and the framed commands of the persistent shell, so the client side (Computer and its
+SSH client) is what gets measured. Latency and failures can be injected per command.
+
+The hosts run in their own process (see start_hosts): the server side patches asyncssh, which must not affect the
+asyncssh client being measured, and the hosts do not compete with the client for its event loop.
+"""
+import asyncio
+import json
+import random
+import re
+import shlex
+import os
+import signal
+import sys
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncssh
+import asyncssh.channel
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.easy_computer_manager.computer.actions import ACTION_REGISTRY  # noqa: E402
+from custom_components.easy_computer_manager.computer.inventory import SECTION_MARKER  # noqa: E402
+from custom_components.easy_computer_manager.computer.shell import FRAME_MARKER, SHELL_COMMAND  # noqa: E402
+
+LINUX = "linux"
+WINDOWS = "windows"
+
+GNOME_MONITORS = """Monitor [ DP-1 ] ON
+  display-name: "Dell Inc. 27\\""
+  2560x1440@143.912 [preferred]
+  2560x1440@119.998
+  2560x1440@59.951
+  1920x1080@60.000
+  1280x720@60.000
+  1024x768@60.004
+
+Monitor [ HDMI-1 ] OFF
+  display-name: "LG Electronics 24\\""
+  1920x1080@60.000 [preferred]
+  1920x1080@59.940
+  1280x1024@60.020"""
+
+MUTTER_STATE = (
+    '{"type":"ua((ssss)a(siiddada{sv})a{sv})a(iiduba(ssss)a{sv})a{sv}","data":[1,'
+    '[[["DP-1","DEL","Dell Inc. 27\\"","0001"],['
+    '["2560x1440@143.912",2560,1440,143.912,1.0,[1.0,2.0],{"is-current":{"type":"b","data":true}}],'
+    '["2560x1440@59.951",2560,1440,59.951,1.0,[1.0,2.0],{}],["1920x1080@60.000",1920,1080,60.0,1.0,[1.0,2.0],{}]],'
+    '{"display-name":{"type":"s","data":"Dell Inc. 27\\""}}],'
+    '[["HDMI-1","GSM","LG Electronics 24\\"","0002"],[["1920x1080@60.000",1920,1080,60.0,1.0,[1.0],{}]],'
+    '{"display-name":{"type":"s","data":"LG Electronics 24\\""}}]],'
+    '[[0,0,1.0,0,true,[["DP-1","DEL","Dell Inc. 27\\"","0001"]],{}]],{}]}'
+)
+
+
+def _pactl_text(device_type: str, devices: List[Tuple[str, str]]) -> str:
+    return "\n".join(
+        f"{device_type} #{index}\n\tState: SUSPENDED\n\tName: {name}\n\tDescription: {description}\n"
+        f"\tDriver: PipeWire\n\tMute: no\n\tVolume: front-left: 65536 / 100% / 0.00 dB\n"
+        for index, (name, description) in enumerate(devices, start=40)
+    )
+
+
+def _pactl_json(devices: List[Tuple[str, str]]) -> str:
+    return json.dumps([
+        {"index": index, "state": "SUSPENDED", "name": name, "description": description, "monitor_of_sink": "n/a",
+         "properties": {"device.class": "monitor" if "Monitor" in description else "sound"}}
+        for index, (name, description) in enumerate(devices, start=40)
+    ])
+
+
+SINKS = [("alsa_output.pci-0000_0c_00.4.analog-stereo", "Starship/Matisse HD Audio Controller Analog Stereo"),
+         ("alsa_output.usb-SteelSeries_Arctis_7-00.analog-stereo", "Arctis 7 Analog Stereo")]
+SOURCES = [("alsa_output.pci-0000_0c_00.4.analog-stereo.monitor", "Monitor of Starship/Matisse HD Audio Controller"),
+           ("alsa_input.usb-SteelSeries_Arctis_7-00.mono-fallback", "Arctis 7 Mono")]
+
+BLUETOOTHCTL = """Device 38:18:4C:12:34:56 (public)
+\tName: WH-1000XM4
+\tAlias: WH-1000XM4
+\tPaired: yes
+\tTrusted: yes
+\tConnected: yes"""
+
+BLUEZ_OBJECTS = (
+    '{"type":"a{oa{sa{sv}}}","data":[{"/org/bluez/hci0/dev_38_18_4C_12_34_56":{"org.bluez.Device1":{'
+    '"Address":{"type":"s","data":"38:18:4C:12:34:56"},"Name":{"type":"s","data":"WH-1000XM4"},'
+    '"Connected":{"type":"b","data":true}}}}]}'
+)
+
+# (exit code, stdout) of the first command of each action, the actions not listed succeed silently
+CANNED_OUTPUTS: Dict[str, Dict[str, Tuple[int, str]]] = {
+    LINUX: {
+        "operating_system": (0, "Linux"),
+        "operating_system_version": (0, "Fedora Linux 40 (Workstation Edition) "),
+        "desktop_environment": (0, "gnome"),
+        "get_windows_entry_grub": (0, "Windows Boot Manager (on /dev/nvme0n1p1)"),
+        "get_monitors_config": (0, GNOME_MONITORS),
+        "get_monitors_config_json": (0, MUTTER_STATE),
+        "get_speakers": (0, _pactl_text("Sink", SINKS)),
+        "get_speakers_json": (0, _pactl_json(SINKS)),
+        "get_microphones": (0, _pactl_text("Source", SOURCES)),
+        "get_microphones_json": (0, _pactl_json(SOURCES)),
+        "get_bluetooth_devices": (0, BLUETOOTHCTL),
+        "get_bluetooth_devices_json": (0, BLUEZ_OBJECTS),
+    },
+    WINDOWS: {
+        "operating_system_version": (0, "Microsoft Windows 11 Pro"),
+        "boot_id": (0, "LastBootUpTime=20240601083015.500000+120"),
+        "desktop_environment": (0, "Windows"),
+    },
+}
+
+NOT_FOUND = {
+    LINUX: "sh: 1: {}: not found",
+    WINDOWS: "'{}' is not recognized as an internal or external command, operable program or batch file.",
+}
+
+INVENTORY_CAPTURE = re.compile(
+    r'^(\[ "\$__ecm_rc" -eq 0 \] \|\| \{ )?__ecm_out=\$\( \{ (.*) ; \} 2>/dev/null \); __ecm_rc=\$\?; __ecm_cmd=(\d+)'
+)
+INVENTORY_BEGIN = re.compile(rf"'({re.escape(SECTION_MARKER)}:[0-9a-f]+:begin:[^']*)'")
+INVENTORY_END = re.compile(rf'"({re.escape(SECTION_MARKER)}:[0-9a-f]+:end:)\$__ecm_rc:\$__ecm_cmd"')
+SHELL_FRAME = re.compile(
+    rf'^__ecm_err=\$\( \( eval (.*) \) 2>&1 1>&3 </dev/null \); '
+    rf'.*"{re.escape(FRAME_MARKER)}:([0-9a-f]+):rc:.*:end\'\n$',
+    re.DOTALL
+)
+
+
+def _command_patterns(os_type: str) -> List[Tuple[re.Pattern, str]]:
+    """Match the commands of every action (with their parameters filled in) back to the action."""
+    return [
+        (re.compile("(?:.*)".join(re.escape(literal) for literal in command.literals), re.DOTALL), plan.action_id)
+        for plan in ACTION_REGISTRY.plans() if plan.operating_system.value.lower() == os_type
+        for command in plan.commands
+    ]
+
+
+COMMAND_PATTERNS = {os_type: _command_patterns(os_type) for os_type in (LINUX, WINDOWS)}
+
+COUNTERS = ("connections", "commands", "errors", "drops")
+
+
+def _patch_asyncssh_server() -> None:
+    """Only ever called in the process of the hosts, never in the one of the client being measured."""
+    flush_recv_buf = asyncssh.channel.SSHChannel._flush_recv_buf
+
+    def flush_recv_buf_after_close(channel, *args, **kwargs):
+        # Paramiko sends EOF when it closes stdin, the server crashes the whole connection if the channel closed
+        # meanwhile
+        if channel._session is None:
+            return None
+        return flush_recv_buf(channel, *args, **kwargs)
+
+    asyncssh.channel.SSHChannel._flush_recv_buf = flush_recv_buf_after_close
+
+
+class FakeHost:
+    """
+    One simulated computer listening on 127.0.0.1.
+
+    :param os_type: LINUX or WINDOWS.
+    :param latency: Seconds each command takes to answer (a whole inventory script counts as one command).
+    :param jitter: Up to that many seconds added at random to the latency.
+    :param error_rate: Probability for a command to fail (exit code 1).
+    :param drop_rate: Probability for a command to kill the SSH connection instead of answering.
+    :param json: Whether the JSON variants of the read actions are supported (recent pactl/systemd).
+    :param failing: Commands (or their beginning) that are not available on this host, e.g. to make the first
+        fallback of an action fail.
+    """
+
+    def __init__(self, os_type: str = LINUX, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 drop_rate: float = 0.0, json: bool = True, failing: Tuple[str, ...] = (),
+                 seed: Optional[int] = None) -> None:
+        self.os_type = os_type
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.json = json
+        self.failing = tuple(failing)
+        self.boot_id = str(uuid.uuid4())
+
+        self.port: Optional[int] = None
+        self.connections = 0  # Currently open
+        self.commands = 0  # Answered, an inventory script or a shell command counts as one
+        self.errors = 0
+        self.drops = 0
+
+        self._random = random.Random(seed)
+        self._server: Optional[asyncssh.SSHAcceptor] = None
+
+    async def start(self, host_key: asyncssh.SSHKey) -> None:
+        host = self
+
+        class Server(asyncssh.SSHServer):
+            def connection_made(self, conn: asyncssh.SSHServerConnection) -> None:
+                host.connections += 1
+
+            def connection_lost(self, exc: Optional[Exception]) -> None:
+                host.connections -= 1
+
+            def begin_auth(self, username: str) -> bool:
+                return True
+
+            def password_auth_supported(self) -> bool:
+                return True
+
+            def validate_password(self, username: str, password: str) -> bool:
+                return True
+
+        self._server = await asyncssh.create_server(Server, "127.0.0.1", 0, server_host_keys=[host_key],
+                                                    process_factory=self._handle, encoding="utf-8")
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, process: asyncssh.SSHServerProcess) -> None:
+        command = process.command or SHELL_COMMAND
+        try:
+            if command == SHELL_COMMAND:
+                await self._serve_shell(process)
+            elif "read _" in command:  # Event stream, nothing ever happens on this host
+                await process.stdin.read()
+                process.exit(0)
+            elif await self._inject_failure(process):
+                return
+            else:
+                return_code, stdout, stderr = self.run(command)
+                process.stdout.write(f"{stdout}\n" if stdout else "")
+                process.stderr.write(f"{stderr}\n" if stderr else "")
+                process.exit(return_code)
+        except (asyncssh.Error, BrokenPipeError, ConnectionError):
+            pass
+
+    async def _serve_shell(self, process: asyncssh.SSHServerProcess) -> None:
+        if self.os_type != LINUX:
+            process.exit(127)
+            return
+
+        frame_lines = []
+        async for line in process.stdin:
+            if not frame_lines and not line.startswith("__ecm_err="):
+                continue  # Setup line
+
+            # The framed command spans several lines when it does (e.g. an inventory script)
+            frame_lines.append(line)
+            frame = SHELL_FRAME.match("".join(frame_lines))
+            if frame is None:
+                continue
+            frame_lines = []
+
+            if await self._inject_failure(process):
+                return
+
+            return_code, stdout, stderr = self.run(shlex.split(frame.group(1))[0])
+            token = frame.group(2)
+            process.stdout.write(f"{stdout}\n" if stdout else "")
+            process.stdout.write(f"\n{FRAME_MARKER}:{token}:rc:{return_code}\n")
+            process.stdout.write(f"{stderr}\n" if stderr else "")
+            process.stdout.write(f"{FRAME_MARKER}:{token}:end\n")
+
+        process.exit(0)
+
+    async def _inject_failure(self, process: asyncssh.SSHServerProcess) -> bool:
+        """Wait for the latency, then maybe drop the connection. Return True if it was dropped."""
+        self.commands += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.drop_rate and self._random.random() < self.drop_rate:
+            self.drops += 1
+            process.channel.get_connection().abort()
+            return True
+        return False
+
+    def run(self, command: str) -> Tuple[int, str, str]:
+        """Return the (exit code, stdout, stderr) of a command."""
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return 1, "", "injected failure"
+
+        if command.startswith("sh -c "):
+            return self._run_inventory(shlex.split(command)[2])
+
+        return self._run_command(command)
+
+    def _run_command(self, command: str) -> Tuple[int, str, str]:
+        if command == "exit 0":
+            return 0, "", ""
+        if command == "cat /proc/sys/kernel/random/boot_id" and self.os_type == LINUX:
+            return 0, self.boot_id, ""
+        if self.failing and command.startswith(self.failing):
+            return 127, "", NOT_FOUND[self.os_type].format(command.split()[0])
+
+        for pattern, action_id in COMMAND_PATTERNS[self.os_type]:
+            if pattern.fullmatch(command):
+                if action_id.endswith("_json") and not self.json:
+                    return 1, "", "Unknown option"
+                return (*CANNED_OUTPUTS[self.os_type].get(action_id, (0, "")), "")
+
+        return 127, "", NOT_FOUND[self.os_type].format(command.split()[0] if command.split() else command)
+
+    def _run_inventory(self, script: str) -> Tuple[int, str, str]:
+        """Interpret a script built by build_inventory_script()."""
+        lines = []
+        output, return_code, index = "", 0, "0"
+
+        for line in script.split("\n"):
+            capture = INVENTORY_CAPTURE.match(line)
+            if capture is not None:
+                is_fallback, command, command_index = capture.groups()
+                if not is_fallback or return_code != 0:
+                    return_code, output, _ = self._run_command(command)
+                    index = command_index
+            elif line.startswith('[ -n "$__ecm_out" ]'):
+                if output:
+                    lines.append(output.rstrip("\n"))
+            elif (begin := INVENTORY_BEGIN.search(line)) is not None:
+                lines.append(begin.group(1))
+                output, return_code = "", 0
+            elif (end := INVENTORY_END.search(line)) is not None:
+                lines.append(f"{end.group(1)}{return_code}:{index}")
+
+        return 0, "\n".join(lines), ""
+
+
+class FakeHosts:
+    """
+    The hosts started by start_hosts(), running in a subprocess.
+
+    :ivar ports: The port each host listens on (127.0.0.1), in order.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process, ports: List[int]) -> None:
+        self.ports = ports
+        self._process = process
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    async def stats(self) -> List[Dict[str, int]]:
+        """Return the counters (see COUNTERS) of each host."""
+        async with self._lock:
+            self._process.stdin.write(b"stats\n")
+            await self._process.stdin.drain()
+            return json.loads(await self._process.stdout.readline())
+
+    async def totals(self) -> Dict[str, int]:
+        """Return the counters summed over all the hosts."""
+        stats = await self.stats()
+        return {counter: sum(host[counter] for host in stats) for counter in COUNTERS}
+
+    def freeze(self) -> None:
+        """Stop the hosts without closing their connections, like a host that hangs (no counters until thaw())."""
+        self._process.send_signal(signal.SIGSTOP)
+
+    def thaw(self) -> None:
+        self._process.send_signal(signal.SIGCONT)
+
+    async def stop(self) -> None:
+        if self._process.returncode is None:
+            self.thaw()
+            self._process.stdin.close()
+            await self._process.wait()
+
+
+async def start_hosts(count: int, windows_ratio: float = 0.0, **options: Any) -> FakeHosts:
+    """
+    Start `count` hosts in a subprocess, the first `windows_ratio` of them running Windows.
+
+    :param options: Passed to each FakeHost (latency, jitter, error_rate, drop_rate, json, failing).
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), json.dumps({"count": count, "windows_ratio": windows_ratio,
+                                                               "options": options}),
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=2 ** 24
+    )
+
+    line = await process.stdout.readline()
+    if not line:
+        await process.wait()
+        raise RuntimeError(f"The fake hosts exited with {process.returncode}")
+    return FakeHosts(process, json.loads(line))
+
+
+async def _serve(count: int, windows_ratio: float, options: Dict[str, Any]) -> None:
+    """Run the hosts until stdin is closed, printing their ports then their counters whenever asked."""
+    _patch_asyncssh_server()
+
+    host_key = asyncssh.generate_private_key("ssh-ed25519")
+    windows = round(count * windows_ratio)
+    options["failing"] = tuple(options.get("failing", ()))
+
+    hosts = [FakeHost(WINDOWS if index < windows else LINUX, seed=index, **options) for index in range(count)]
+    await asyncio.gather(*(host.start(host_key) for host in hosts))
+    print(json.dumps([host.port for host in hosts]), flush=True)
+
+    while (request := await asyncio.to_thread(sys.stdin.readline)) != "":
+        if request.strip() == "stats":
+            print(json.dumps([{counter: getattr(host, counter) for counter in COUNTERS} for host in hosts]),
+                  flush=True)
+
+    await asyncio.gather(*(host.stop() for host in hosts))
+
+
+if __name__ == "__main__":
+    config = json.loads(sys.argv[1])
+    asyncio.run(_serve(config["count"], config["windows_ratio"], config["options"]))
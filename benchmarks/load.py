@@ -0,0 +1,178 @@
+"""
+Load-test Computer and both SSH backends against simulated hosts.
+
+Starts 1 to 200 fake SSH hosts in a subprocess (see fake_host.py) and polls every one of them like the coordinators
+do, as fast as they answer, for a fixed duration per scenario. Reports the polls per second, p50/p99 latency per
+operation, thread and connection counts, and the memory used per host.
+
+The threads and memory are the ones of this process, i.e. of the client only. The fake hosts still share the
+machine with the client, the figures are meant to be compared between runs on the same machine rather than read as
+absolute capacities.
+
+Usage (from the repository root):
+    python benchmarks/load.py [--hosts 1 10 50 200] [--backend paramiko asyncssh] [--duration 10]
+                              [--latency 0.005] [--jitter 0] [--error-rate 0] [--drop-rate 0] [--windows 0]
+                              [--mode poll|actions] [--no-persistent-shell] [--no-inventory] [--no-json]
+                              [--fail-first-fallback]
+                              [--json-report results.json]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_host import FakeHosts, start_hosts  # noqa: E402
+from custom_components.easy_computer_manager.computer.actions import ACTION_REGISTRY  # noqa: E402
+from custom_components.easy_computer_manager.computer import Computer  # noqa: E402
+from custom_components.easy_computer_manager.computer.inventory import INVENTORY_ACTIONS  # noqa: E402
+from custom_components.easy_computer_manager.const import PRESENCE_PROBE_TCP, SSH_BACKENDS  # noqa: E402
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else float("nan")
+
+
+def first_fallbacks() -> tuple:
+    """The first command of every action that has fallbacks (up to its first parameter)."""
+    return tuple(plan.commands[0].literals[0] for plan in ACTION_REGISTRY.plans() if len(plan.commands) > 1)
+
+
+async def drive(computer: Computer, mode: str, deadline: float, latencies: Dict[str, List[float]],
+                failures: Dict[str, int]) -> None:
+    """Poll a computer back to back until the deadline."""
+    while time.perf_counter() < deadline:
+        operations = [("update", computer.update)] if mode == "poll" else [
+            (action_id, lambda action_id=action_id: computer.run_action(action_id, use_cache=False))
+            for action_id in INVENTORY_ACTIONS if computer._supports_action(action_id)
+        ] or [("update", computer.update)]
+
+        for name, operation in operations:
+            start = time.perf_counter()
+            try:
+                result = await operation()
+                # An update returns the actions it refreshed, missing some (timed out, connection lost) is a failure
+                ok = result == set(INVENTORY_ACTIONS) if name == "update" else result.successful()
+            except Exception:  # noqa: BLE001 - a failed operation is counted, not fatal
+                ok = False
+            latencies[name].append(time.perf_counter() - start)
+            if not ok:
+                failures[name] += 1
+
+
+async def run_scenario(hosts: int, backend: str, args: argparse.Namespace) -> dict:
+    fake_hosts: FakeHosts = await start_hosts(
+        hosts, args.windows, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        drop_rate=args.drop_rate, json=not args.no_json, failing=first_fallbacks() if args.fail_first_fallback else ()
+    )
+    gc.collect()
+    threads_before, rss_before = threading.active_count(), rss_bytes()
+
+    computers = [
+        Computer("127.0.0.1", f"02:00:00:00:{index // 256:02x}:{index % 256:02x}", "bench", "bench", port,
+                 inventory=not args.no_inventory, ssh_backend=backend, persistent_shell=not args.no_persistent_shell,
+                 presence_probe=PRESENCE_PROBE_TCP)
+        for index, port in enumerate(fake_hosts.ports)
+    ]
+
+    # Warm up: connect, detect the OS and the JSON support, the steady state is what gets measured
+    await asyncio.gather(*(computer.update() for computer in computers))
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    failures: Dict[str, int] = defaultdict(int)
+    commands_before = (await fake_hosts.totals())["commands"]
+    start = time.perf_counter()
+    await asyncio.gather(*(drive(computer, args.mode, start + args.duration, latencies, failures)
+                           for computer in computers))
+    elapsed = time.perf_counter() - start
+    totals = await fake_hosts.totals()
+
+    gc.collect()
+    result = {
+        "hosts": hosts,
+        "backend": backend,
+        "polls_per_second": round(sum(len(samples) for samples in latencies.values()) / elapsed, 1),
+        "commands_per_second": round((totals["commands"] - commands_before) / elapsed, 1),
+        "operations": {
+            name: {
+                "count": len(samples),
+                "failures": failures[name],
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+            }
+            for name, samples in sorted(latencies.items())
+        },
+        "threads": threading.active_count(),
+        "threads_added": threading.active_count() - threads_before,
+        "connections": totals["connections"],
+        "memory_per_host_kib": round((rss_bytes() - rss_before) / hosts / 1024, 1),
+        "injected_errors": totals["errors"],
+        "injected_drops": totals["drops"],
+    }
+
+    await asyncio.gather(*(computer._connection.close() for computer in computers))
+    await fake_hosts.stop()
+    return result
+
+
+def print_result(result: dict) -> None:
+    print(f"\n{result['hosts']} host(s), {result['backend']}: {result['polls_per_second']} polls/s "
+          f"({result['commands_per_second']} commands/s on the hosts), {result['threads']} threads "
+          f"(+{result['threads_added']}), {result['connections']} connections, "
+          f"{result['memory_per_host_kib']} KiB/host")
+    if result["injected_errors"] or result["injected_drops"]:
+        print(f"  injected: {result['injected_errors']} errors, {result['injected_drops']} dropped connections")
+    for name, stats in result["operations"].items():
+        print(f"  {name:<26} {stats['count']:>7} runs  {stats['failures']:>5} failed  "
+              f"p50 {stats['p50_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms")
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = []
+    for backend in args.backend:
+        for hosts in args.hosts:
+            result = await run_scenario(hosts, backend, args)
+            print_result(result)
+            results.append(result)
+
+    if args.json_report:
+        with open(args.json_report, "w") as report:
+            json.dump(results, report, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hosts", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--backend", nargs="+", choices=SSH_BACKENDS, default=SSH_BACKENDS)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per command on the hosts")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to that many seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability for a command to fail")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="probability for a command to drop the connection")
+    parser.add_argument("--windows", type=float, default=0.0, help="fraction of the hosts running Windows")
+    parser.add_argument("--mode", choices=["poll", "actions"], default="poll",
+                        help="poll: full updates, actions: every read action on its own")
+    parser.add_argument("--no-persistent-shell", action="store_true")
+    parser.add_argument("--no-inventory", action="store_true")
+    parser.add_argument("--no-json", action="store_true", help="hosts without JSON support (old pactl/systemd)")
+    parser.add_argument("--fail-first-fallback", action="store_true",
+                        help="hosts where only the second command of the actions with fallbacks works")
+    parser.add_argument("--json-report", help="also write the results to this file")
+    parsed = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parsed))
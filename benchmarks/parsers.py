@@ -0,0 +1,181 @@
+"""
+Benchmark the gnome-monitor-config and pactl parsers on large outputs.
+
+Compares the parsers of computer/parser.py with the implementation they replaced (kept below for reference) on
+synthetic outputs the size of a multi-monitor rig and of a PipeWire setup with many nodes, and checks both give the
+same result.
+
+Usage (from the repository root): python benchmarks/parsers.py [--repeat N]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.easy_computer_manager.computer.parser import parse_gnome_monitors_output, \
+    parse_pactl_output  # noqa: E402
+
+SIZES = ["7680x4320", "5120x2880", "3840x2160", "3440x1440", "2560x1440", "2560x1080", "1920x1200", "1920x1080",
+         "1680x1050", "1600x900", "1440x900", "1366x768", "1280x1024", "1280x720", "1024x768", "800x600", "640x480"]
+FRAMERATES = ["240.000", "239.760", "165.000", "144.000", "143.856", "120.000", "119.880", "100.000", "75.000",
+              "60.000", "59.940", "50.000", "30.000", "29.970", "24.000", "23.976"]
+
+
+def monitors_output(monitors: int = 6, modes: int = 300) -> str:
+    lines = []
+    for index in range(monitors):
+        lines.append(f"Monitor [ DP-{index} ] ON")
+        lines.append(f"  display-name: \"Display {index}\"")
+        for mode in range(modes):
+            size = SIZES[mode // len(FRAMERATES) % len(SIZES)]
+            framerate = FRAMERATES[mode % len(FRAMERATES)]
+            lines.append(f"  {size}@{framerate}{' [preferred]' if mode == 0 else ''}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def pactl_output(device_type: str, devices: int = 200) -> str:
+    lines = []
+    for index in range(devices):
+        monitor = device_type == "Source" and index % 2 == 0
+        lines.extend([
+            f"{device_type} #{index}",
+            "\tState: SUSPENDED",
+            f"\tName: alsa_{device_type.lower()}.node_{index}{'.monitor' if monitor else ''}",
+            f"\tDescription: {'Monitor of ' if monitor else ''}Node {index}",
+            "\tDriver: PipeWire",
+            "\tSample Specification: s32le 2ch 48000Hz",
+            "\tChannel Map: front-left,front-right",
+            "\tOwner Module: 4294967295",
+            "\tMute: no",
+            "\tVolume: front-left: 65536 / 100% / 0.00 dB,   front-right: 65536 / 100% / 0.00 dB",
+            "\tProperties:",
+            "\t\tdevice.description = \"Node\"",
+            "\t\tnode.name = \"node\"",
+            "\t\tmedia.class = \"Audio/Sink\"",
+            "\tPorts:",
+            "\t\tanalog-output: Analog Output (type: Analog, priority: 100, availability unknown)",
+            "",
+        ])
+    lines.append(f"{device_type} #{devices}")  # Ends with a regular device, the old parser did not filter the last one
+    lines.extend(["\tName: last", "\tDescription: Last node", ""])
+    return "\n".join(lines)
+
+
+# Implementation replaced by the single-pass parsers, kept as the baseline
+def legacy_parse_gnome_monitors_output(config: str) -> list:
+
+    monitors = []
+    current_monitor = None
+
+    for line in config.split('\n'):
+        monitor_match = re.match(r'^Monitor \[ (.+?) \] (ON|OFF)$', line)
+        if monitor_match:
+            if current_monitor:
+                monitors.append(current_monitor)
+            source, status = monitor_match.groups()
+            current_monitor = {'source': source, 'status': status, 'names': [], 'resolutions': []}
+        elif current_monitor:
+            display_name_match = re.match(r'^\s+display-name: (.+)$', line)
+            resolution_match = re.match(r'^\s+(\d+x\d+@\d+(?:\.\d+)?).*$', line)
+            if display_name_match:
+                current_monitor['names'].append(display_name_match.group(1).replace('"', ''))
+            elif resolution_match:
+                # Don't include resolutions under 1280x720
+                if int(resolution_match.group(1).split('@')[0].split('x')[0]) >= 1280:
+
+                    # If there are already resolutions in the list, check if the framerate between the last is >1
+                    if len(current_monitor['resolutions']) > 0:
+                        last_resolution = current_monitor['resolutions'][-1]
+                        last_resolution_size = last_resolution.split('@')[0]
+                        this_resolution_size = resolution_match.group(1).split('@')[0]
+
+                        # Only truncate some framerates if the resolution are the same
+                        if last_resolution_size == this_resolution_size:
+                            last_resolution_framerate = float(last_resolution.split('@')[1])
+                            this_resolution_framerate = float(resolution_match.group(1).split('@')[1])
+
+                            # If the difference between the last resolution framerate and this one is >1, ignore it
+                            if last_resolution_framerate - 1 > this_resolution_framerate:
+                                current_monitor['resolutions'].append(resolution_match.group(1))
+                        else:
+                            # If the resolution is different, this adds the new resolution
+                            # to the list without truncating
+                            current_monitor['resolutions'].append(resolution_match.group(1))
+                    else:
+                        # This is the first resolution, add it to the list
+                        current_monitor['resolutions'].append(resolution_match.group(1))
+
+    if current_monitor:
+        monitors.append(current_monitor)
+
+    return monitors
+
+
+def legacy_parse_pactl_output(config_speakers: str, config_microphones: str) -> dict:
+
+    config = {'speakers': [], 'microphones': []}
+
+    def parse_device_info(lines, device_type):
+        devices = []
+        current_device = {}
+
+        for line in lines:
+            if line.startswith(f"{device_type} #"):
+                if current_device and "Monitor" not in current_device['description']:
+                    devices.append(current_device)
+                current_device = {'id': int(re.search(r'#(\d+)', line).group(1))}
+            elif line.startswith("	Name:"):
+                current_device['name'] = line.split(":")[1].strip()
+            elif line.startswith("	State:"):
+                current_device['state'] = line.split(":")[1].strip()
+            elif line.startswith("	Description:"):
+                current_device['description'] = line.split(":")[1].strip()
+
+        if current_device:
+            devices.append(current_device)
+
+        return devices
+
+    config['speakers'] = parse_device_info(config_speakers.split('\n'), 'Sink')
+    config['microphones'] = parse_device_info(config_microphones.split('\n'), 'Source')
+
+    return config
+
+
+def audio_config_as_legacy(audio_config) -> dict:
+    """The legacy parser leaves out the fields a device does not list, the models set them to None."""
+    return {
+        kind: [{key: value for key, value in device.items() if value is not None} for device in devices]
+        for kind, devices in audio_config.as_dict().items()
+    }
+
+
+def bench(name: str, legacy, current, as_plain, repeat: int) -> None:
+    assert legacy() == as_plain(current()), f"{name}: parsers disagree"
+    legacy_time = min(timeit.repeat(legacy, number=1, repeat=repeat))
+    current_time = min(timeit.repeat(current, number=1, repeat=repeat))
+    print(f"{name:<10} legacy {legacy_time * 1000:8.2f} ms   current {current_time * 1000:8.2f} ms   "
+          f"x{legacy_time / current_time:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    monitors = monitors_output()
+    sinks, sources = pactl_output("Sink"), pactl_output("Source")
+    print(f"monitors: {monitors.count(chr(10))} lines, pactl: {sinks.count(chr(10)) + sources.count(chr(10))} lines")
+
+    bench("monitors", lambda: legacy_parse_gnome_monitors_output(monitors),
+          lambda: parse_gnome_monitors_output(monitors), lambda parsed: parsed.as_list(), args.repeat)
+    bench("pactl", lambda: legacy_parse_pactl_output(sinks, sources),
+          lambda: parse_pactl_output(sinks, sources), audio_config_as_legacy, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
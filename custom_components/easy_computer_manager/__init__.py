@@ -6,15 +6,28 @@ from __future__ import annotations
 
 import logging
 from functools import partial
+from typing import Any
 
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
 import wakeonlan
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_BROADCAST_ADDRESS, CONF_BROADCAST_PORT, CONF_MAC
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.const import (
+    CONF_BROADCAST_ADDRESS, CONF_BROADCAST_PORT, CONF_HOST, CONF_MAC, CONF_PASSWORD, CONF_PORT, CONF_USERNAME,
+)
 from homeassistant.core import HomeAssistant, ServiceCall
-
-from .const import DOMAIN, SERVICE_SEND_MAGIC_PACKET, SERVICE_CHANGE_MONITORS_CONFIG
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN, SERVICE_SEND_MAGIC_PACKET, DATA_CONNECTION_MANAGER, DATA_PRESENCE_SCANNER, CONF_SSH_BACKEND,
+    DEFAULT_SSH_BACKEND, CONF_PERSISTENT_SHELL, DEFAULT_PERSISTENT_SHELL, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL,
+    CONF_STATIC_REFRESH_INTERVAL, DEFAULT_STATIC_REFRESH_INTERVAL, CONF_MEDIUM_REFRESH_INTERVAL,
+    DEFAULT_MEDIUM_REFRESH_INTERVAL, TIER_STATIC, TIER_MEDIUM, CONF_EVENT_STREAM, DEFAULT_EVENT_STREAM,
+    CONF_PRESENCE_PROBE, DEFAULT_PRESENCE_PROBE, CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL, STORAGE_VERSION,
+    STORAGE_KEY_COMMANDS, STORAGE_SAVE_DELAY, CONF_SCENES, DATA_BOOT_ORCHESTRATOR, CONF_LIVENESS_FRESHNESS,
+    DEFAULT_LIVENESS_FRESHNESS
+)
 
 LOGGER = logging.getLogger(__name__)
 
@@ -27,6 +40,74 @@ WAKE_ON_LAN_SEND_MAGIC_PACKET_SCHEMA = vol.Schema({
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up the Easy Dualboot Computer Manager integration."""
+    # Imported here, the computer package imports LOGGER from this module
+    from .computer import Computer
+    from .computer.boot import BootOrchestrator
+    from .computer.command_memory import CommandMemory
+    from .computer.scenes import parse_scenes
+    from .connection_manager import ConnectionLimitError, ConnectionManager
+    from .coordinator import ComputerUpdateCoordinator
+    from .presence_scanner import PresenceScanner
+
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_CONNECTION_MANAGER not in domain_data:
+        domain_data[DATA_CONNECTION_MANAGER] = ConnectionManager(hass)
+    if DATA_PRESENCE_SCANNER not in domain_data:
+        domain_data[DATA_PRESENCE_SCANNER] = PresenceScanner(hass)
+    if DATA_BOOT_ORCHESTRATOR not in domain_data:
+        domain_data[DATA_BOOT_ORCHESTRATOR] = BootOrchestrator()
+
+    # Computers on the same host/port/credentials using the same SSH backend share their SSH connection
+    connection_manager = domain_data[DATA_CONNECTION_MANAGER]
+    ssh_backend = _get_option(entry, CONF_SSH_BACKEND, DEFAULT_SSH_BACKEND)
+    try:
+        ssh_client = connection_manager.acquire(
+            entry.data[CONF_HOST], entry.data[CONF_USERNAME], entry.data[CONF_PASSWORD], entry.data.get(CONF_PORT, 22),
+            ssh_backend, _get_option(entry, CONF_LIVENESS_FRESHNESS, DEFAULT_LIVENESS_FRESHNESS)
+        )
+    except ConnectionLimitError as exc:
+        # Set up again later by Home Assistant, once other computers released their client
+        raise ConfigEntryNotReady(str(exc)) from exc
+    entry.async_on_unload(partial(connection_manager.release, ssh_client))
+
+    # The fallback commands learned for this computer survive restarts
+    store = Store(hass, STORAGE_VERSION, _commands_storage_key(entry))
+    command_memory = CommandMemory(await store.async_load())
+    command_memory.on_change = lambda: store.async_delay_save(command_memory.as_dict, STORAGE_SAVE_DELAY)
+
+    # Validated by the options flow, only a hand-edited entry can get here with malformed scenes
+    try:
+        scenes = parse_scenes(_get_option(entry, CONF_SCENES, {}))
+    except ValueError as exc:
+        LOGGER.error("Ignoring the scenes of %s: %s", entry.data[CONF_HOST], exc)
+        scenes = {}
+
+    computer = Computer(
+        entry.data[CONF_HOST], entry.data[CONF_MAC], entry.data[CONF_USERNAME], entry.data[CONF_PASSWORD],
+        entry.data.get(CONF_PORT, 22), entry.data.get("dualboot", False), ssh_backend=ssh_backend,
+        persistent_shell=_get_option(entry, CONF_PERSISTENT_SHELL, DEFAULT_PERSISTENT_SHELL),
+        presence_probe=_get_option(entry, CONF_PRESENCE_PROBE, DEFAULT_PRESENCE_PROBE), connection=ssh_client,
+        command_memory=command_memory, scenes=scenes
+    )
+
+    coordinator = ComputerUpdateCoordinator(
+        hass, computer,
+        scan_interval=_get_option(entry, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+        fast_scan_interval=_get_option(entry, CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL),
+        tier_intervals={
+            TIER_STATIC: _get_option(entry, CONF_STATIC_REFRESH_INTERVAL, DEFAULT_STATIC_REFRESH_INTERVAL),
+            TIER_MEDIUM: _get_option(entry, CONF_MEDIUM_REFRESH_INTERVAL, DEFAULT_MEDIUM_REFRESH_INTERVAL),
+        },
+        event_stream=_get_option(entry, CONF_EVENT_STREAM, DEFAULT_EVENT_STREAM),
+        presence_scanner=domain_data[DATA_PRESENCE_SCANNER]
+    )
+    # Every computer is probed by the one scanner of the integration
+    entry.async_on_unload(
+        domain_data[DATA_PRESENCE_SCANNER].register(computer, coordinator.handle_presence_change)
+    )
+    # Not async_config_entry_first_refresh: a computer that is off is not a setup failure
+    await coordinator.async_refresh()
+    domain_data[entry.entry_id] = coordinator
 
     async def send_magic_packet(call: ServiceCall) -> None:
         """Send a magic packet to wake up a device."""
@@ -61,11 +142,48 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     await hass.config_entries.async_forward_entry_setups(entry, ["switch"])
 
+    # Options (e.g. the SSH backend) are only read at setup, reload the entry when they change
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     return True
 
 
+def _get_option(entry: ConfigEntry, key: str, default: Any) -> Any:
+    """Return an option of the entry, falling back to what was set when the entry was created."""
+    return entry.options.get(key, entry.data.get(key, default))
+
+
+def _commands_storage_key(entry: ConfigEntry) -> str:
+    return f"{STORAGE_KEY_COMMANDS}.{entry.entry_id}"
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the Easy Dualboot Computer Manager integration after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload the Easy Dualboot Computer Manager integration."""
-    return await hass.config_entries.async_forward_entry_unload(
+    unloaded = await hass.config_entries.async_forward_entry_unload(
         entry, "switch"
     )
+    if unloaded:
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+
+    # Once the last computer is gone, close the shared SSH connections, stop the presence sweeps and boots in progress
+    other_entries_loaded = any(
+        other.entry_id != entry.entry_id and other.state is ConfigEntryState.LOADED
+        for other in hass.config_entries.async_entries(DOMAIN)
+    )
+    if unloaded and not other_entries_loaded:
+        for key in (DATA_CONNECTION_MANAGER, DATA_PRESENCE_SCANNER, DATA_BOOT_ORCHESTRATOR):
+            shared = hass.data.get(DOMAIN, {}).pop(key, None)
+            if shared is not None:
+                await shared.async_shutdown()
+
+    return unloaded
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Forget what was learned about a computer when it is removed."""
+    await Store(hass, STORAGE_VERSION, _commands_storage_key(entry)).async_remove()
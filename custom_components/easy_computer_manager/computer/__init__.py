@@ -1,20 +1,54 @@
 import asyncio
-from typing import Optional, Dict, Any
+import hashlib
+import secrets
+import shlex
+from typing import Optional, Dict, Any, Iterable, List, Callable, Sequence, Tuple, FrozenSet, AsyncIterator
 
 from wakeonlan import send_magic_packet
 
 from custom_components.easy_computer_manager import const, LOGGER
-from custom_components.easy_computer_manager.computer.common import OSType, CommandOutput
+from custom_components.easy_computer_manager.computer.actions import ACTION_REGISTRY, ActionPlan
+from custom_components.easy_computer_manager.computer.batch import Batch, build_batch_script, parse_batch_output
+from custom_components.easy_computer_manager.computer.circuit_breaker import CircuitOpenError
+from custom_components.easy_computer_manager.computer.command_memory import CommandMemory
+from custom_components.easy_computer_manager.computer.common import OSType, CommandOutput, TIMEOUT_RETURN_CODE
+from custom_components.easy_computer_manager.computer.deadline import Deadline, narrow
 from custom_components.easy_computer_manager.computer.formatter import format_gnome_monitors_args, format_pactl_commands
-from custom_components.easy_computer_manager.computer.parser import parse_gnome_monitors_output, parse_pactl_output, \
-    parse_bluetoothctl
-from custom_components.easy_computer_manager.computer.ssh_client_paramiko import SSHClient
+from custom_components.easy_computer_manager.computer.models import AudioConfig, BluetoothDevices, Monitors
+from custom_components.easy_computer_manager.computer.inventory import INVENTORY_ACTIONS, build_inventory_script, \
+    parse_inventory_output
+from custom_components.easy_computer_manager.computer.presence import PresenceProbe, ProbeResult
+from custom_components.easy_computer_manager.computer.result_cache import ResultCache, cache_key
+from custom_components.easy_computer_manager.computer.scenes import Scene
+from custom_components.easy_computer_manager.computer.single_flight import SingleFlight
+from custom_components.easy_computer_manager.computer.parser import parse_gnome_monitors_output, \
+    parse_mutter_display_config, parse_pactl_devices, parse_pactl_json_devices, parse_bluetoothctl, parse_bluez_objects
+from custom_components.easy_computer_manager.computer.ssh_client_asyncssh import SSHClient as AsyncSSHClient
+from custom_components.easy_computer_manager.computer.ssh_client_paramiko import SSHClient as ParamikoSSHClient
+
+SSH_CLIENTS = {
+    const.SSH_BACKEND_PARAMIKO: ParamikoSSHClient,
+    const.SSH_BACKEND_ASYNCSSH: AsyncSSHClient,
+}
 
 
 class Computer:
     def __init__(self, host: str, mac: str, username: str, password: str, port: int = 22,
-                 dualboot: bool = False) -> None:
-        """Initialize the Computer object."""
+                 dualboot: bool = False, inventory: bool = True,
+                 liveness_freshness: float = const.DEFAULT_LIVENESS_FRESHNESS,
+                 ssh_backend: str = const.DEFAULT_SSH_BACKEND,
+                 persistent_shell: bool = const.DEFAULT_PERSISTENT_SHELL,
+                 presence_probe: str = const.DEFAULT_PRESENCE_PROBE, connection=None,
+                 command_memory: Optional[CommandMemory] = None,
+                 read_cache_ttl: float = const.READ_CACHE_TTL, scenes: Optional[Dict[str, Scene]] = None) -> None:
+        """
+        Initialize the Computer object.
+
+        The SSH connection is opened on the first update/action. A shared client (see ConnectionManager) can be given
+        with `connection`, otherwise the computer creates its own client using `ssh_backend`. The fallback commands
+        learned in a previous run can be given with `command_memory`. Successful reads are reused for `read_cache_ttl`
+        seconds (0 disables it). `scenes` are the setups apply_scene() can switch to (see scenes.parse_scenes).
+        """
         self.initialized = False
         self.host = host
         self.mac = mac
@@ -22,181 +56,672 @@ class Computer:
         self._password = password
         self.port = port
         self.dualboot = dualboot
+        self.inventory = inventory
+        self.ssh_backend = ssh_backend
+        self.persistent_shell = persistent_shell
 
         self.operating_system: Optional[OSType] = None
         self.operating_system_version: Optional[str] = None
+        self.boot_id: Optional[str] = None
         self.desktop_environment: Optional[str] = None
         self.windows_entry_grub: Optional[str] = None
-        self.monitors_config: Optional[Dict[str, Any]] = None
-        self.audio_config: Dict[str, Optional[Dict]] = {}
-        self.bluetooth_devices: Dict[str, Any] = {}
+        self.monitors_config = Monitors()
+        self.audio_config = AudioConfig()
+        self.bluetooth_devices = BluetoothDevices()
+        self.latency: Optional[float] = None
 
         self.is_linux = lambda: self.operating_system == OSType.LINUX
+        self._was_on = False
 
-        self._connection = SSHClient(host, username, password, port)
-        asyncio.create_task(self._initialize_connection())
+        self._connection = connection or SSH_CLIENTS[ssh_backend](host, username, password, port, liveness_freshness)
+        self.presence = PresenceProbe(host, port, mac, presence_probe)
 
-    async def _initialize_connection(self):
-        await self._connection.connect()
-        self.initialized = True
+        # Which fallback command of each action works on this host, tried first
+        self.command_memory = command_memory or CommandMemory()
+
+        # Read actions whose JSON variant works (True) or not (False) on this host, unknown until first collected
+        self.json_support: Dict[str, bool] = {}
+
+        # Digest of the raw output each parsed fact was last parsed from, unchanged outputs are not parsed again
+        self._output_digests: Dict[str, bytes] = {}
+
+        # Concurrent updates, presence checks, OS detections and identical reads share a single call
+        self._single_flight = SingleFlight()
+
+        # Recent results of the read actions, dropped by the writes that make them stale
+        self.read_cache = ResultCache(read_cache_ttl)
+
+        # Each scene is rendered into a batch once, again only when what it was rendered from changed
+        self.scenes: Dict[str, Scene] = scenes or {}
+        self._scene_batches: Dict[str, Tuple[tuple, Batch]] = {}
 
-    async def update(self, state: Optional[bool] = True, timeout: int = 2) -> None:
-        """Update computer details."""
-        if not state or not await self.is_on():
+    async def update(self, state: Optional[bool] = None, timeout: int = 2,
+                     actions: Iterable[str] = INVENTORY_ACTIONS,
+                     deadline: Optional[Deadline] = None) -> FrozenSet[str]:
+        """
+        Update computer details.
+
+        An update requested while an identical one is running (e.g. a poll overlapping a slow one) waits for it and
+        shares its result instead of running again.
+
+        :param state:
+            Whether the computer is known to be on, pinged if None.
+        :param actions:
+            The read actions to refresh, all of them by default.
+        :param deadline:
+            When the update must be done, the facts whose commands did not complete in time keep their value.
+
+        :returns: FrozenSet[str]
+            The actions that were refreshed, i.e. not those that timed out or lost the connection (none if the computer
+            is off/unreachable). An action the detected OS does not define counts as refreshed, it has nothing to read.
+        """
+        actions = tuple(actions)
+        return await self._single_flight.run(("update", state, actions),
+                                             lambda: self._update(state, timeout, actions, deadline))
+
+    async def _update(self, state: Optional[bool], timeout: int, actions: Iterable[str],
+                      deadline: Optional[Deadline]) -> FrozenSet[str]:
+        if state is None:
+            state = await self.is_on()
+
+        if not state:
             LOGGER.debug("Computer is off, skipping update")
-            return
+            return frozenset()
 
         # Ensure connection is established before updating
-        await self._ensure_connection_alive(timeout)
-
-        # Update tasks
-        await asyncio.gather(
-            self._update_operating_system(),
-            self._update_operating_system_version(),
-            self._update_desktop_environment(),
-            self._update_windows_entry_grub(),
-            self._update_monitors_config(),
-            self._update_audio_config(),
-            self._update_bluetooth_devices()
-        )
+        try:
+            async with asyncio.timeout(deadline.remaining() if deadline is not None else None):
+                await self._ensure_connection_alive(timeout)
+        except CircuitOpenError as exc:
+            LOGGER.debug(f"Skipping update: {exc}")
+            return frozenset()
+        except TimeoutError as exc:
+            raise ConnectionError(f"Connecting to {self.host} did not complete in time") from exc
+
+        # The OS decides which commands are run, only re-detect it when not known to be Linux
+        # (on Linux the inventory itself runs `uname` and will notice a change)
+        if not self.is_linux():
+            await self._update_operating_system(deadline)
+
+        keys = {action_id: cache_key(self.host, action_id) for action_id in actions}
+        epochs = {action_id: self.read_cache.epoch(key) for action_id, key in keys.items()}
+        outputs = await self._collect_outputs(actions, deadline)
+        timed_out = [action_id for action_id, output in outputs.items() if output.timed_out]
+        if timed_out:
+            LOGGER.warning(f"Reading {', '.join(timed_out)} on {self.host} did not complete in time")
+        lost = [action_id for action_id, output in outputs.items() if output.connection_lost]
+        if lost:
+            LOGGER.debug(f"Connection to {self.host} lost while reading {', '.join(lost)}")
+        outputs = {action_id: output for action_id, output in outputs.items()
+                   if not output.timed_out and not output.connection_lost}
+
+        self._apply_outputs(outputs)
+        for action_id, output in outputs.items():
+            self.read_cache.put(keys[action_id], output, epochs[action_id])
+        # Unless the OS is still unknown, what it does not define was skipped on purpose
+        return frozenset(action_id for action_id in actions if action_id in outputs
+                         or (self.operating_system is not None and not self._supports_action(action_id)))
 
     async def _ensure_connection_alive(self, timeout: int) -> None:
         """Ensure SSH connection is alive, reconnect if needed."""
-        for _ in range(timeout * 4):
-            if self._connection.is_connection_alive():
-                return
-            await asyncio.sleep(0.25)
+        if await self._connection.check_connection_alive():
+            return
 
-        if not self._connection.is_connection_alive():
-            LOGGER.debug(f"Reconnecting to {self.host}")
-            await self._connection.connect()
-            if not self._connection.is_connection_alive():
-                LOGGER.debug(f"Failed to connect to {self.host} after {timeout}s")
-                raise ConnectionError("SSH connection could not be re-established")
+        LOGGER.debug(f"Reconnecting to {self.host}")
+        await self._connection.connect()
+        self.initialized = True
+        if not await self._connection.check_connection_alive():
+            LOGGER.debug(f"Failed to connect to {self.host} after {timeout}s")
+            raise ConnectionError("SSH connection could not be re-established")
+
+    async def _update_operating_system(self, deadline: Optional[Deadline] = None) -> None:
+        self.operating_system = await self._detect_operating_system(deadline)
+
+    async def _collect_outputs(self, action_ids: Iterable[str],
+                               deadline: Optional[Deadline] = None) -> Dict[str, CommandOutput]:
+        """Run the given read actions, in a single inventory script when possible."""
+        if self.is_linux() and self.inventory:
+            outputs = await self._run_inventory(action_ids, deadline)
+            if outputs or (deadline is not None and deadline.expired()):
+                return outputs
+
+            LOGGER.debug(f"Inventory script failed on {self.host}, falling back to one command per action")
+            await self._update_operating_system(deadline)
+
+        action_ids = [action_id for action_id in action_ids if self._supports_action(action_id)]
+        results = await asyncio.gather(*(self.run_action(action_id, use_cache=False, deadline=deadline)
+                                         for action_id in action_ids))
+        return dict(zip(action_ids, results))
+
+    async def _run_inventory(self, action_ids: Iterable[str],
+                             deadline: Optional[Deadline] = None) -> Dict[str, CommandOutput]:
+        """
+        Run all the given read actions in one SSH exec and split the result per action.
+
+        If the script does not complete in time, the actions it completed are still returned.
+        """
+        sections = {
+            action_id: self._read_commands(action_id)
+            for action_id in action_ids if self._supports_action(action_id)
+        }
+        token = secrets.token_hex(8)
+
+        result = await self.run_manually(build_inventory_script(sections, token), read_only=True,
+                                         deadline=narrow(deadline, const.INVENTORY_TIMEOUT))
+        outputs = parse_inventory_output(result.output, sections, token)
+
+        for action_id, output in outputs.items():
+            self._remember(action_id, output.successful(), output.command)
+        return outputs
+
+    def _apply_outputs(self, outputs: Dict[str, CommandOutput]) -> None:
+        """Update the computer details from the outputs of the read actions."""
+        if "operating_system" in outputs:
+            self.operating_system = OSType.LINUX if outputs["operating_system"].successful() else None
+
+        if "boot_id" in outputs and outputs["boot_id"].successful():
+            if self.boot_id != outputs["boot_id"].output:
+                self.json_support.clear()  # Rebooted, the software might have been upgraded
+                self.read_cache.invalidate()
+            self.boot_id = outputs["boot_id"].output
+
+        if "operating_system_version" in outputs:
+            self.operating_system_version = outputs["operating_system_version"].output
+            if self.operating_system is not None and outputs["operating_system_version"].successful():
+                self.command_memory.set_version(self.operating_system.value, self.operating_system_version)
+
+        if "desktop_environment" in outputs:
+            self.desktop_environment = outputs["desktop_environment"].output.lower()
+
+        if "get_windows_entry_grub" in outputs:
+            # Only the first entry is used, like _windows_grub_entry() does
+            self.windows_entry_grub = outputs["get_windows_entry_grub"].output.split('\n')[0]
 
-    async def _update_operating_system(self) -> None:
-        self.operating_system = await self._detect_operating_system()
+        if self.operating_system == OSType.LINUX:
+            if "get_monitors_config" in outputs and self._output_changed("monitors", outputs["get_monitors_config"]):
+                self.monitors_config = self._parse_output(
+                    "get_monitors_config", outputs["get_monitors_config"], parse_mutter_display_config,
+                    lambda output: parse_gnome_monitors_output(output.output), self.monitors_config
+                )
+
+            if "get_speakers" in outputs and "get_microphones" in outputs and \
+                    self._output_changed("audio", outputs["get_speakers"], outputs["get_microphones"]):
+                self.audio_config = AudioConfig(
+                    self._parse_output(
+                        "get_speakers", outputs["get_speakers"], parse_pactl_json_devices,
+                        lambda output: parse_pactl_devices(output.output, 'Sink'), self.audio_config.speakers
+                    ),
+                    self._parse_output(
+                        "get_microphones", outputs["get_microphones"], parse_pactl_json_devices,
+                        lambda output: parse_pactl_devices(output.output, 'Source'), self.audio_config.microphones
+                    ),
+                )
+
+            if "get_bluetooth_devices" in outputs and \
+                    self._output_changed("bluetooth", outputs["get_bluetooth_devices"]):
+                self.bluetooth_devices = self._parse_output(
+                    "get_bluetooth_devices", outputs["get_bluetooth_devices"], parse_bluez_objects, parse_bluetoothctl,
+                    self.bluetooth_devices
+                )
+        # TODO: Implement monitors, audio and bluetooth for Windows
+
+    def _parse_output(self, action_id: str, output: CommandOutput, json_parser: Callable[[str], Any],
+                      text_parser: Callable[[CommandOutput], Any], previous: Any) -> Any:
+        """Parse the output of a read action with the parser of its format, remembering which format the host gave."""
+        if not output.output.lstrip().startswith(("[", "{")):
+            if output.successful():
+                self.json_support[action_id] = False
+            return text_parser(output)
+
+        try:
+            parsed = json_parser(output.output)
+        except ValueError as exc:
+            LOGGER.debug(f"Cannot parse the JSON output of {action_id} on {self.host}, using text from now on: {exc}")
+            self.json_support[action_id] = False
+            return previous
+
+        self.json_support[action_id] = True
+        return parsed
+
+    def _output_changed(self, fact: str, *outputs: CommandOutput) -> bool:
+        """Return whether the outputs a fact is parsed from changed since it was last parsed."""
+        digest = hashlib.blake2b(digest_size=16)
+        for output in outputs:
+            digest.update(f"{output.return_code}\0{output.output}\0".encode())
+
+        digest = digest.digest()
+        if self._output_digests.get(fact) == digest:
+            return False
+
+        self._output_digests[fact] = digest
+        return True
+
+    async def _detect_operating_system(self, deadline: Optional[Deadline] = None) -> Optional[OSType]:
+        async def detect() -> Optional[OSType]:
+            result = await self.run_manually("uname", deadline=narrow(deadline, const.DEFAULT_ACTION_TIMEOUT))
+            if result.timed_out or result.connection_lost:
+                return self.operating_system  # Unknown, not a reason to assume Windows
+            return OSType.LINUX if result.successful() else OSType.WINDOWS
+
+        return await self._single_flight.run("operating_system", detect)
 
-    async def _update_operating_system_version(self) -> None:
-        self.operating_system_version = (await self.run_action("operating_system_version")).output
+    async def is_on(self, timeout: int = 1) -> bool:
+        async def probe() -> bool:
+            return self.set_presence(await self.presence.probe(timeout))
 
-    async def _update_desktop_environment(self) -> None:
-        self.desktop_environment = (await self.run_action("desktop_environment")).output.lower()
+        return await self._single_flight.run("is_on", probe)
 
-    async def _update_windows_entry_grub(self) -> None:
-        self.windows_entry_grub = (await self.run_action("get_windows_entry_grub")).output
+    def set_presence(self, result: ProbeResult) -> bool:
+        """Record the result of a presence probe (e.g. run by the PresenceScanner) and return whether it is on."""
+        is_on = result.reachable
+        self.latency = result.latency
 
-    async def _update_monitors_config(self) -> None:
-        if self.operating_system == OSType.LINUX:
-            output = (await self.run_action("get_monitors_config")).output
-            self.monitors_config = parse_gnome_monitors_output(output)
-        # TODO: Implement for Windows if needed
+        # The host just came back, let the next connection attempt through without waiting for the backoff
+        if is_on and not self._was_on:
+            self._connection.circuit_breaker.reset()
+        # Whatever was read before it went off (or rebooted into another OS) is stale
+        if self._was_on and not is_on:
+            self.read_cache.invalidate()
+        self._was_on = is_on
 
-    async def _update_audio_config(self) -> None:
-        speakers_output = (await self.run_action("get_speakers")).output
-        microphones_output = (await self.run_action("get_microphones")).output
+        return is_on
 
-        if self.operating_system == OSType.LINUX:
-            self.audio_config = parse_pactl_output(speakers_output, microphones_output)
-        # TODO: Implement for Windows
+    async def start(self) -> None:
+        send_magic_packet(self.mac)
 
-    async def _update_bluetooth_devices(self) -> None:
-        if self.operating_system == OSType.LINUX:
-            self.bluetooth_devices = parse_bluetoothctl(await self.run_action("get_bluetooth_devices"))
-        # TODO: Implement for Windows
+    async def shutdown(self, deadline: Optional[Deadline] = None) -> None:
+        await self.run_action("shutdown", deadline=deadline)
 
-    async def _detect_operating_system(self) -> OSType:
-        result = await self.run_manually("uname")
-        return OSType.LINUX if result.successful() else OSType.WINDOWS
+    async def restart(self, from_os: Optional[OSType] = None, to_os: Optional[OSType] = None,
+                      deadline: Optional[Deadline] = None) -> None:
+        """
+        Restart the computer, into `to_os` if given.
 
-    async def is_on(self, timeout: int = 1) -> bool:
-        proc = await asyncio.create_subprocess_exec(
-            "ping", "-c", "1", "-W", str(timeout), self.host,
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
-        )
-        await proc.communicate()
-        return proc.returncode == 0
+        Restarting from Linux to Windows sets the GRUB entry of Windows for the next boot only, in the same remote
+        invocation as the restart (which is not attempted if the entry could not be set). Linux being the default GRUB
+        entry, restarting to it needs nothing else.
 
-    async def start(self) -> None:
-        send_magic_packet(self.mac)
+        :raises ValueError:
+            If restarting to Windows from another OS than Linux (the entry can only be set from there), or the GRUB
+            entry could not be set.
+        """
+        if to_os == OSType.WINDOWS and self.operating_system is None:
+            await self._update_operating_system(deadline)  # A plain restart would boot the default entry, Linux
 
-    async def shutdown(self) -> None:
-        await self.run_action("shutdown")
+        if from_os is not None and self.operating_system is not None and from_os != self.operating_system:
+            LOGGER.warning(f"Restarting from {from_os.value} but {self.host} runs {self.operating_system.value}")
 
-    async def restart(self, from_os: Optional[OSType] = None, to_os: Optional[OSType] = None) -> None:
-        # TODO implement from/to os
-        await self.run_action("restart")
+        if to_os != OSType.WINDOWS:
+            await self.run_action("restart", deadline=deadline)
+            return
 
-    async def put_to_sleep(self) -> None:
+        if not self.is_linux():
+            running = self.operating_system.value if self.operating_system is not None else "an unknown OS"
+            raise ValueError(f"Cannot restart {self.host} to Windows from {running}, only from Linux")
+
+        result = await self.run_actions([
+            ("set_grub_entry", {"grub-entry": await self._windows_grub_entry(deadline)}),
+            ("restart", None),
+        ], deadline=deadline)
+        # The connection may drop before the restart step reports back, only the GRUB step is known to complete
+        if not result.steps or result.steps[0][1] != 0:
+            raise ValueError(f"Could not set the GRUB entry of {self.host}: {result.error or result.output}")
+
+    async def set_next_boot_to_windows(self, deadline: Optional[Deadline] = None) -> None:
+        """
+        Boot Windows the next time the computer (running Linux) restarts, only that time.
+
+        :raises ValueError:
+            If there is no Windows entry in the GRUB configuration or it could not be set.
+        """
+        result = await self.run_action("set_grub_entry", {"grub-entry": await self._windows_grub_entry(deadline)},
+                                       deadline=deadline)
+        if not result.successful():
+            raise ValueError(f"Could not set the GRUB entry of {self.host}: {result.error or result.output}")
+
+    async def _windows_grub_entry(self, deadline: Optional[Deadline]) -> str:
+        """Return the GRUB entry of Windows, quoted for the shell, reading it if not known yet."""
+        if not self.windows_entry_grub:
+            result = await self.run_action("get_windows_entry_grub", deadline=deadline)
+            self.windows_entry_grub = result.output.split('\n')[0] if result.successful() else None
+        if not self.windows_entry_grub:
+            raise ValueError(f"No Windows entry found in the GRUB configuration of {self.host}")
+
+        return shlex.quote(self.windows_entry_grub)
+
+    async def put_to_sleep(self, deadline: Optional[Deadline] = None) -> None:
         """Put the computer to sleep."""
-        await self.run_action("sleep")
+        await self.run_action("sleep", deadline=deadline)
 
-    async def set_monitors_config(self, monitors_config: Dict[str, Any]) -> None:
+    async def set_monitors_config(self, monitors_config: Dict[str, Any], deadline: Optional[Deadline] = None) -> None:
         """Set monitors configuration."""
         if self.is_linux() and self.desktop_environment == 'gnome':
-            args = format_gnome_monitors_args(monitors_config)
-            await self.run_action("set_monitors_config", params={"args": args})
+            args = format_gnome_monitors_args(monitors_config, self.monitors_config)
+            result = await self.run_actions([("set_monitors_config", {"args": args})], deadline=deadline)
+            self._log_failed_steps("monitors config", result)
 
     async def set_audio_config(self, volume: Optional[int] = None, mute: Optional[bool] = None,
-                               input_device: Optional[str] = None, output_device: Optional[str] = None) -> None:
+                               input_device: Optional[str] = None, output_device: Optional[str] = None,
+                               deadline: Optional[Deadline] = None) -> None:
         """Set audio configuration."""
         if self.is_linux() and self.desktop_environment == 'gnome':
             pactl_commands = format_pactl_commands(self.audio_config, volume, mute, input_device, output_device)
-            for command in pactl_commands:
-                await self.run_action("set_audio_config", params={"args": command})
+            if not pactl_commands:
+                return
+
+            # One change (e.g. sink, source, volume and mute) is a single round trip, a failed step does not stop
+            # the others
+            result = await self.run_actions([("set_audio_config", {"args": command}) for command in pactl_commands],
+                                            stop_on_error=False, deadline=deadline)
+            self._log_failed_steps("audio config", result)
+
+    async def apply_scene(self, name: str, deadline: Optional[Deadline] = None) -> CommandOutput:
+        """
+        Apply a scene (monitors, audio, Steam Big Picture) in a single remote invocation.
+
+        The scene is rendered on its first use and reused as long as the OS, the desktop environment, the monitors, the
+        audio devices and the fallback commands learned (see CommandMemory) it was rendered for did not change. A
+        failed step does not stop the others.
+
+        :raises ValueError:
+            If there is no such scene.
+        """
+        scene = self.scenes.get(name)
+        if scene is None:
+            raise ValueError(f"Unknown scene {name!r}, the scenes of {self.host} are: {', '.join(self.scenes)}")
+
+        if not self.operating_system:
+            self.operating_system = await self._detect_operating_system(deadline)
+            if not self.operating_system:
+                return CommandOutput.timeout("uname")
+
+        context = (self.operating_system, self.desktop_environment, self.monitors_config, self.audio_config,
+                   self.command_memory.version)
+        cached = self._scene_batches.get(name)
+        if cached is not None and cached[0] == context:
+            batch = cached[1]
+        else:
+            gnome = self.is_linux() and self.desktop_environment == 'gnome'
+            batch = self._build_batch(scene.actions(self.monitors_config, self.audio_config, gnome), False)
+            self._scene_batches[name] = (context, batch)
+
+        result = await self._run_batch(batch, deadline)
+        self._log_failed_steps(f"scene {name}", result)
+        return result
 
-    async def install_nircmd(self) -> None:
+    async def install_nircmd(self, deadline: Optional[Deadline] = None) -> None:
         """Install NirCmd tool (Windows specific)."""
         install_path = f"C:\\Users\\{self.username}\\AppData\\Local\\EasyComputerManager"
         await self.run_action("install_nircmd", params={
             "download_url": "https://www.nirsoft.net/utils/nircmd.zip",
             "install_path": install_path
-        })
+        }, deadline=deadline)
 
-    async def steam_big_picture(self, action: str) -> None:
+    async def steam_big_picture(self, action: str, deadline: Optional[Deadline] = None) -> None:
         """Start, stop, or exit Steam Big Picture mode."""
-        await self.run_action(f"{action}_steam_big_picture")
+        await self.run_action(f"{action}_steam_big_picture", deadline=deadline)
 
     async def run_action(self, id: str, params: Optional[Dict[str, Any]] = None,
-                         raise_on_error: bool = False) -> CommandOutput:
-        """Run a predefined action via SSH."""
+                         raise_on_error: Optional[bool] = None, use_cache: bool = True,
+                         deadline: Optional[Deadline] = None) -> CommandOutput:
+        """
+        Run a predefined action via SSH.
+
+        Reads return a recent successful result when there is one, identical concurrent reads share a single run.
+        Writes drop the cached results of the reads they make stale (see const.ACTION_INVALIDATES).
+
+        :param raise_on_error:
+            Raise ValueError as soon as a command fails instead of trying the next one, defaults to the option of the
+            action.
+        :param use_cache:
+            Run a read even if a recent result is cached (the new result is still cached).
+        :param deadline:
+            When the caller needs the result, narrowed to the budget of the action (its "timeout"). The command running
+            when it expires is stopped and a timed out result returned, the remaining fallbacks are not tried.
+        """
         params = params or {}
 
-        action = const.ACTIONS.get(id)
-        if not action:
+        if id not in INVENTORY_ACTIONS:
+            try:
+                return await self._run_action(id, params, raise_on_error, deadline)
+            finally:
+                self._invalidate_reads(id)
+
+        key = cache_key(self.host, id, params)
+        cached = self.read_cache.get(key) if use_cache else None
+        if cached is not None:
+            return cached
+
+        async def read() -> CommandOutput:
+            # A write invalidating this read while it runs makes its result stale before it is even cached
+            epoch = self.read_cache.epoch(key)
+            result = await self._run_action(id, params, raise_on_error, deadline)
+            self.read_cache.put(key, result, epoch)
+            return result
+
+        return await self._single_flight.run(("action", key, raise_on_error), read)
+
+    async def _run_action(self, id: str, params: Dict[str, Any], raise_on_error: Optional[bool],
+                          deadline: Optional[Deadline]) -> CommandOutput:
+        if id not in ACTION_REGISTRY:
             LOGGER.error(f"Action {id} not found.")
             return CommandOutput("", 1, "", "Action not found")
 
         if not self.operating_system:
-            self.operating_system = await self._detect_operating_system()
+            self.operating_system = await self._detect_operating_system(deadline)
+            if not self.operating_system:
+                return CommandOutput.timeout("uname")
 
-        os_commands = action.get(self.operating_system.lower())
-        if not os_commands:
+        plan = self._plan(id)
+        if plan is None:
             raise ValueError(f"Action {id} not supported for OS: {self.operating_system}")
 
-        commands = os_commands if isinstance(os_commands, list) else os_commands.get("commands",
-                                                                                     [os_commands.get("command")])
-        required_params = []
-        if "params" in os_commands:
-            required_params = os_commands.get("params", [])
-
-        # Validate parameters
-        if sorted(required_params) != sorted(params.keys()):
-            raise ValueError(f"Invalid/missing parameters for action: {id}")
+        commands = plan.render(params)  # Also validates the parameters
+        if id in INVENTORY_ACTIONS:
+            sources = commands = self._read_commands(id)  # With the JSON variant first
+        else:
+            order = self.command_memory.order(self.operating_system.value, id, plan.sources)
+            commands = [commands[index] for index in order]
+            sources = [plan.sources[index] for index in order]
+        if raise_on_error is None:
+            raise_on_error = plan.raise_on_error
+        deadline = narrow(deadline, plan.timeout)
 
         result = CommandOutput("", 1, "", "")
-        for command in commands:
-            for param, value in params.items():
-                command = command.replace(f"%{param}%", str(value))
-
-            result = await self.run_manually(command)
+        for command, source in zip(commands, sources):
+            result = await self.run_manually(command, read_only=id in INVENTORY_ACTIONS, deadline=deadline)
             if result.successful():
+                self._remember(id, True, source)
+                return result
+            if result.timed_out:
+                # Says nothing about whether the command works on this host, and there is no time left for the others
+                if raise_on_error:
+                    raise TimeoutError(f"Command timed out: {command}")
+                return result
+            if result.connection_lost:
+                # Says nothing about the command either, and the next ones would fail the same way
+                if raise_on_error:
+                    raise ConnectionError(f"Connection to {self.host} lost: {command}")
                 return result
             if raise_on_error:
+                self._remember(id, False)
                 raise ValueError(f"Command failed: {command}")
 
+        self._remember(id, False)
+        return result
+
+    async def run_actions(self, actions: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+                          stop_on_error: bool = True, deadline: Optional[Deadline] = None) -> CommandOutput:
+        """
+        Run several predefined write actions in order, in a single remote invocation on Linux.
+
+        Each action still tries its fallback commands until one succeeds. The steps of the returned CommandOutput are
+        the commands that ran with their exit code, its exit code is the one of the first failed step.
+
+        :param actions:
+            (action id, params) of each step.
+        :param stop_on_error:
+            Do not run the remaining steps once one failed.
+        :param deadline:
+            When the caller needs the result, narrowed to the sum of the budgets of the actions.
+        :raises ValueError:
+            If an action is unknown, not supported on the current OS or given invalid parameters (nothing is run).
+        """
+        if not self.operating_system:
+            self.operating_system = await self._detect_operating_system(deadline)
+            if not self.operating_system:
+                return CommandOutput.timeout("uname")
+
+        return await self._run_batch(self._build_batch(actions, stop_on_error), deadline)
+
+    def _build_batch(self, actions: Iterable[Tuple[str, Optional[Dict[str, Any]]]], stop_on_error: bool) -> Batch:
+        """Render the steps of run_actions for the current OS, their remembered fallback command first."""
+        steps = []
+        budget = 0.0
+        for id, params in actions:
+            plan = self._plan(id)
+            if plan is None:
+                raise ValueError(f"Action {id} not supported for OS: {self.operating_system}")
+
+            commands = plan.render(params or {})  # Also validates the parameters
+            order = self.command_memory.order(self.operating_system.value, id, plan.sources)
+            steps.append((id, tuple(commands[index] for index in order), tuple(plan.sources[index] for index in order)))
+            budget += plan.timeout
+
+        token = secrets.token_hex(8)
+        script = None
+        if self.is_linux() and steps:
+            script = build_batch_script([list(commands) for _, commands, _ in steps], token, stop_on_error)
+        return Batch(tuple(steps), budget, stop_on_error, token, script)
+
+    async def _run_batch(self, batch: Batch, deadline: Optional[Deadline]) -> CommandOutput:
+        if not batch.steps:
+            return CommandOutput("", 0, "", "")
+
+        deadline = narrow(deadline, batch.budget)
+        try:
+            if batch.script is None:
+                return await self._run_steps(batch.steps, batch.stop_on_error, deadline)
+
+            result = parse_batch_output(await self.run_manually(batch.script, deadline=deadline), batch.commands,
+                                        batch.token)
+        finally:
+            for id, _, _ in batch.steps:
+                self._invalidate_reads(id)
+
+        for (id, commands, sources), (command, return_code) in zip(batch.steps, result.steps):
+            self._remember(id, return_code == 0, sources[commands.index(command)] if command in commands else None)
+
         return result
 
-    async def run_manually(self, command: str) -> CommandOutput:
-        return await self._connection.execute_command(command)
+    async def _run_steps(self, steps: Sequence[Tuple[str, Sequence[str], Sequence[str]]], stop_on_error: bool,
+                         deadline: Optional[Deadline]) -> CommandOutput:
+        """Run the steps of run_actions one command at a time, for hosts without a POSIX shell."""
+        outputs, errors, results = [], [], []
+        return_code = 0
+
+        for id, commands, sources in steps:
+            result = CommandOutput("", 1, "", "")
+            for command, source in zip(commands, sources):
+                result = await self.run_manually(command, deadline=deadline)
+                if result.successful():
+                    self._remember(id, True, source)
+                    break
+                if result.timed_out or result.connection_lost:
+                    break
+            else:
+                self._remember(id, False)
+
+            outputs.append(result.output)
+            errors.append(result.error)
+            results.append((result.command, result.return_code))
+            if not result.successful():
+                return_code = return_code or result.return_code
+                if stop_on_error or result.timed_out or result.connection_lost:
+                    break
+
+        return CommandOutput(
+            " && ".join(" || ".join(commands) for _, commands, _ in steps),
+            return_code if len(results) == len(steps) or return_code else 1,
+            '\n'.join(output for output in outputs if output),
+            '\n'.join(error for error in errors if error),
+            results,
+            timed_out=any(return_code == TIMEOUT_RETURN_CODE for _, return_code in results),
+            connection_lost=result.connection_lost
+        )
+
+    @staticmethod
+    def _log_failed_steps(what: str, result: CommandOutput) -> None:
+        for command, return_code in result.steps:
+            if return_code != 0:
+                LOGGER.warning(f"Failed to apply the {what}, `{command}` exited with {return_code}")
+        if not result.successful() and all(return_code == 0 for _, return_code in result.steps):
+            LOGGER.warning(f"Failed to apply the {what}: {result.error or result.output}")
+
+    def _invalidate_reads(self, id: str) -> None:
+        """Drop the cached results made stale by running an action, even if it failed (it may have done part of it)."""
+        read_ids = ACTION_REGISTRY.invalidated_by(id)
+        if read_ids is None or read_ids:
+            self.read_cache.invalidate(read_ids)
+
+    def _remember(self, id: str, successful: bool, command: Optional[str] = None) -> None:
+        """Learn from the outcome of an action which of its fallback commands to try first next time."""
+        plan = self._plan(id)
+        if plan is None or len(plan.commands) < 2:
+            return
+
+        if not successful:
+            self.command_memory.failed(self.operating_system.value, id)
+        elif command in plan.sources:  # Not a JSON variant
+            self.command_memory.succeeded(self.operating_system.value, id, command, plan.sources)
+
+    def _plan(self, id: str) -> Optional[ActionPlan]:
+        """Return the compiled commands of an action for the current OS and desktop environment."""
+        return ACTION_REGISTRY.get(id, self.operating_system, self.desktop_environment)
+
+    def _supports_action(self, id: str) -> bool:
+        """Return whether the action is defined for the current OS."""
+        return self._plan(id) is not None
+
+    def _read_commands(self, action_id: str) -> List[str]:
+        """Return the fallback commands of a read action, its JSON variant first if the host might support it."""
+        sources = self._plan(action_id).sources
+        order = self.command_memory.order(self.operating_system.value, action_id, sources)
+        commands = [sources[index] for index in order]
+
+        json_action = const.JSON_ACTIONS.get(action_id)
+        if json_action is None or not self._supports_action(json_action) or self.json_support.get(action_id) is False:
+            return commands
+
+        json_commands = list(self._plan(json_action).render({}))
+        # Once known to work, the text commands are not even tried anymore
+        return json_commands if self.json_support.get(action_id) else json_commands + commands
+
+    async def run_manually(self, command: str, read_only: bool = False,
+                           deadline: Optional[Deadline] = None) -> CommandOutput:
+        """
+        Run a command via SSH.
+
+        Read-only commands go through the persistent shell when enabled (Linux only). Other commands always get their
+        own channel, they might outlive it (e.g. `steam &`) or kill it (shutdown). A command still running when the
+        deadline expires is stopped (its channel closed), none is sent once it expired.
+        """
+        timeout = None
+        if deadline is not None:
+            if deadline.expired():
+                return CommandOutput.timeout(command)
+            timeout = deadline.remaining()
+
+        if read_only and self.persistent_shell and self.is_linux():
+            return await self._connection.execute_in_shell(command, timeout)
+        return await self._connection.execute_command(command, timeout)
+
+    def stream_lines(self, command: str) -> AsyncIterator[str]:
+        """
+        Run a long-lived command via SSH in its own channel and yield its output line by line until it exits (see
+        EventStream). The channel is closed when the iteration stops.
+
+        :raises ConnectionError:
+            If the host cannot be reached or the channel fails.
+        """
+        return self._connection.stream_lines(command)
@@ -0,0 +1,200 @@
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+from custom_components.easy_computer_manager.computer.common import OSType
+from custom_components.easy_computer_manager.const import ACTIONS, ACTION_INVALIDATES, DEFAULT_ACTION_TIMEOUT
+
+# Keys a command definition may have, anything else is a typo
+DEFINITION_KEYS = frozenset({"command", "commands", "params", "raise_on_error", "timeout"})
+
+OS_TYPES = {os_type.value.lower(): os_type for os_type in OSType}
+
+
+class ActionDefinitionError(ValueError):
+    """Raised when an entry of const.ACTIONS cannot be compiled."""
+
+
+@dataclass(frozen=True, slots=True)
+class CommandTemplate:
+    """A command with its %param% placeholders split out, rendered with a single join."""
+
+    source: str
+    literals: Tuple[str, ...]  # One more than fields, surrounding them
+    fields: Tuple[str, ...]
+
+    @classmethod
+    def parse(cls, source: str, params: FrozenSet[str]) -> "CommandTemplate":
+        if not params:
+            return cls(source, (source,), ())
+
+        # Only the declared params are placeholders, other %...% are left alone (e.g. `%i` in Windows batch)
+        parts = re.split("%(" + "|".join(re.escape(param) for param in sorted(params)) + ")%", source)
+        return cls(source, tuple(parts[0::2]), tuple(parts[1::2]))
+
+    def render(self, values: Mapping[str, str]) -> str:
+        if not self.fields:
+            return self.source
+
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            parts.append(values[field])
+            parts.append(literal)
+        return "".join(parts)
+
+
+@dataclass(frozen=True, slots=True)
+class ActionPlan:
+    """The compiled commands of an action for one OS (and desktop environment), tried in order until one succeeds."""
+
+    action_id: str
+    operating_system: OSType
+    desktop_environment: Optional[str]  # None when the commands work on any desktop environment
+    commands: Tuple[CommandTemplate, ...]
+    params: FrozenSet[str]
+    raise_on_error: bool = False
+    timeout: float = DEFAULT_ACTION_TIMEOUT  # Seconds for the whole action, fallbacks included
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        """The commands as written in const.ACTIONS, with their placeholders."""
+        return tuple(command.source for command in self.commands)
+
+    def render(self, params: Mapping[str, Any]) -> Tuple[str, ...]:
+        """
+        Return the commands with the parameters filled in.
+
+        :raises ValueError:
+            If the parameters are not exactly the ones of the action.
+        """
+        if params.keys() != self.params:
+            raise ValueError(f"Invalid/missing parameters for action: {self.action_id}")
+
+        values = {param: str(value) for param, value in params.items()}
+        return tuple(command.render(values) for command in self.commands)
+
+
+class ActionRegistry:
+    """
+    The actions of const.ACTIONS, compiled once into an immutable plan per (action, OS, desktop environment).
+
+    An OS entry is either a command, a list of fallback commands, a definition ({"command(s)": ..., "params": [...],
+    "raise_on_error": bool, "timeout": seconds}), or a mapping of desktop environment to any of these. An empty
+    command means the action is not available on that OS. A malformed entry raises ActionDefinitionError when the
+    registry is built.
+
+    `invalidates` maps write actions to the read actions whose results they make stale, None meaning all of them.
+    """
+
+    def __init__(self, actions: Mapping[str, Mapping[str, Any]],
+                 invalidates: Optional[Mapping[str, Optional[Tuple[str, ...]]]] = None) -> None:
+        plans: Dict[Tuple[str, OSType, Optional[str]], ActionPlan] = {}
+
+        for action_id, definitions in actions.items():
+            if not isinstance(definitions, Mapping):
+                raise ActionDefinitionError(f"Action {action_id}: expected a mapping of OS to commands")
+
+            for os_name, definition in definitions.items():
+                os_type = OS_TYPES.get(os_name)
+                if os_type is None:
+                    raise ActionDefinitionError(f"Action {action_id}: unknown OS {os_name!r}")
+
+                if isinstance(definition, Mapping) and not DEFINITION_KEYS.intersection(definition):
+                    variants = definition.items()  # Per desktop environment
+                else:
+                    variants = [(None, definition)]
+
+                for desktop_environment, variant in variants:
+                    plan = self._compile(action_id, os_type, desktop_environment, variant)
+                    if plan is not None:
+                        plans[(action_id, os_type, desktop_environment)] = plan
+
+        self._action_ids = frozenset(actions)
+        self._plans = MappingProxyType(plans)
+        self._invalidates = MappingProxyType(self._compile_invalidates(invalidates or {}, self._action_ids))
+
+    @staticmethod
+    def _compile_invalidates(invalidates: Mapping[str, Optional[Tuple[str, ...]]],
+                             action_ids: FrozenSet[str]) -> Dict[str, Optional[FrozenSet[str]]]:
+        compiled = {}
+        for action_id, read_ids in invalidates.items():
+            if action_id not in action_ids:
+                raise ActionDefinitionError(f"Action {action_id}: declares invalidations but is not defined")
+            if read_ids is not None:
+                unknown = set(read_ids) - action_ids
+                if unknown:
+                    raise ActionDefinitionError(f"Action {action_id}: invalidates unknown actions {sorted(unknown)}")
+                read_ids = frozenset(read_ids)
+            compiled[action_id] = read_ids
+        return compiled
+
+    @staticmethod
+    def _compile(action_id: str, os_type: OSType, desktop_environment: Optional[str],
+                 definition: Any) -> Optional[ActionPlan]:
+        where = f"Action {action_id} ({os_type.value}{f', {desktop_environment}' if desktop_environment else ''})"
+        options: Mapping[str, Any] = {}
+
+        if isinstance(definition, str):
+            commands = [definition]
+        elif isinstance(definition, list):
+            commands = definition
+        elif isinstance(definition, Mapping):
+            unknown = set(definition) - DEFINITION_KEYS
+            if unknown:
+                raise ActionDefinitionError(f"{where}: unknown keys {sorted(unknown)}")
+            if ("command" in definition) == ("commands" in definition):
+                raise ActionDefinitionError(f"{where}: expected either 'command' or 'commands'")
+            commands = definition["commands"] if "commands" in definition else [definition["command"]]
+            options = definition
+        else:
+            raise ActionDefinitionError(f"{where}: unexpected definition {definition!r}")
+
+        if not isinstance(commands, list) or not all(isinstance(command, str) for command in commands):
+            raise ActionDefinitionError(f"{where}: commands must be strings")
+        commands = [command for command in commands if command]
+        if not commands:
+            return None  # Not available
+
+        params = options.get("params", [])
+        if not isinstance(params, list) or len(set(params)) != len(params):
+            raise ActionDefinitionError(f"{where}: params must be a list of unique names")
+        params = frozenset(params)
+
+        templates = tuple(CommandTemplate.parse(command, params) for command in commands)
+        unused = params - {field for template in templates for field in template.fields}
+        if unused:
+            raise ActionDefinitionError(f"{where}: params {sorted(unused)} are never used")
+
+        raise_on_error = options.get("raise_on_error", False)
+        if not isinstance(raise_on_error, bool):
+            raise ActionDefinitionError(f"{where}: raise_on_error must be a boolean")
+
+        timeout = options.get("timeout", DEFAULT_ACTION_TIMEOUT)
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ActionDefinitionError(f"{where}: timeout must be a positive number of seconds")
+
+        return ActionPlan(action_id, os_type, desktop_environment, templates, params, raise_on_error, float(timeout))
+
+    def __contains__(self, action_id: str) -> bool:
+        return action_id in self._action_ids
+
+    def get(self, action_id: str, operating_system: Optional[OSType],
+            desktop_environment: Optional[str] = None) -> Optional[ActionPlan]:
+        """Return the plan of an action, the one specific to the desktop environment first, None if not available."""
+        if desktop_environment is not None:
+            plan = self._plans.get((action_id, operating_system, desktop_environment))
+            if plan is not None:
+                return plan
+        return self._plans.get((action_id, operating_system, None))
+
+    def invalidated_by(self, action_id: str) -> Optional[FrozenSet[str]]:
+        """Return the read actions whose results the action makes stale, None for all of them."""
+        return self._invalidates.get(action_id, frozenset())
+
+    def plans(self) -> Tuple[ActionPlan, ...]:
+        return tuple(self._plans.values())
+
+
+# Compiled when the integration is loaded, a malformed action fails it right away
+ACTION_REGISTRY = ActionRegistry(ACTIONS, ACTION_INVALIDATES)
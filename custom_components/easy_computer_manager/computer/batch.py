@@ -0,0 +1,100 @@
+import shlex
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from custom_components.easy_computer_manager.computer.common import CommandOutput
+
+STEP_MARKER = "::ecm-step"
+
+
+@dataclass(frozen=True, slots=True)
+class Batch:
+    """Write steps rendered and ready to be sent, built once and run any number of times (see Computer.run_actions)."""
+
+    steps: Tuple[Tuple[str, Tuple[str, ...], Tuple[str, ...]], ...]  # (action id, commands, their sources) in order
+    budget: float  # Seconds, the sum of the budgets of the actions
+    stop_on_error: bool
+    token: str
+    script: Optional[str]  # None on hosts without a POSIX shell, the steps are then run one command at a time
+
+    @property
+    def commands(self) -> List[List[str]]:
+        return [list(commands) for _, commands, _ in self.steps]
+
+
+def build_batch_script(steps: List[List[str]], token: str, stop_on_error: bool = True) -> str:
+    """
+    Build a single POSIX shell invocation running write steps one after the other.
+
+    Each step tries its commands in order (like run_action does) until one succeeds, then prints a marker carrying the
+    step index, its exit code and the index of the command that ran. Unlike the inventory, the output and errors of
+    the commands are passed through.
+
+    :param steps:
+        The ordered fallback commands of each step.
+    :param token:
+        Random token embedded in the markers so remote output cannot be mistaken for a delimiter.
+    :param stop_on_error:
+        Stop at the first step that fails (e.g. do not reboot if the GRUB entry could not be set).
+
+    :returns: str
+        The command to execute over SSH.
+    """
+
+    lines = []
+
+    for step, commands in enumerate(steps):
+        for index, command in enumerate(commands):
+            # In a subshell (an `exit` cannot end the batch), closed on its own line (a trailing `&` stays valid)
+            run = f"( {command}\n) </dev/null; __ecm_rc=$?; __ecm_cmd={index}"
+            lines.append(run if index == 0 else f"[ \"$__ecm_rc\" -eq 0 ] || {{ {run}; }}")
+
+        lines.append(f"printf '\\n%s\\n' \"{STEP_MARKER}:{token}:{step}:$__ecm_rc:$__ecm_cmd\"")
+        if stop_on_error:
+            lines.append("[ \"$__ecm_rc\" -eq 0 ] || exit \"$__ecm_rc\"")
+
+    # Run through sh explicitly, the login shell of the user might not be POSIX compatible
+    return f"sh -c {shlex.quote(chr(10).join(lines))}"
+
+
+def parse_batch_output(result: CommandOutput, steps: List[List[str]], token: str) -> CommandOutput:
+    """
+    Split the step markers out of the output of a batch script.
+
+    The steps of the returned CommandOutput are the commands that ran with their exit code, the steps that did not run
+    (stopped on error, deadline expired, connection lost) are missing. Its exit code is the one of the first failed
+    step, or non-zero if some steps did not run.
+    """
+
+    marker = f"{STEP_MARKER}:{token}:"
+    output_lines = []
+    results = []
+
+    for line in result.output.split('\n'):
+        if not line.startswith(marker):
+            output_lines.append(line)
+            continue
+
+        step, _, rest = line[len(marker):].partition(':')
+        return_code, _, index = rest.partition(':')
+        if not step.isdigit() or int(step) >= len(steps):
+            continue
+
+        commands = steps[int(step)]
+        return_code = int(return_code) if return_code.lstrip('-').isdigit() else 1
+        command = commands[int(index)] if index.isdigit() and int(index) < len(commands) else " || ".join(commands)
+        results.append((command, return_code))
+
+    return_code = next((code for _, code in results if code != 0), 0)
+    if return_code == 0 and len(results) < len(steps):
+        return_code = result.return_code or 1
+
+    return CommandOutput(
+        " && ".join(" || ".join(commands) for commands in steps),
+        return_code,
+        '\n'.join(line for line in output_lines if line),
+        result.error,
+        results,
+        timed_out=result.timed_out,
+        connection_lost=result.connection_lost
+    )
@@ -0,0 +1,209 @@
+import asyncio
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from custom_components.easy_computer_manager import LOGGER
+from custom_components.easy_computer_manager.computer.common import OSType
+from custom_components.easy_computer_manager.computer.deadline import Deadline
+from custom_components.easy_computer_manager.const import BOOT_TO_WINDOWS_TIMEOUT, BOOT_PROBE_INTERVAL
+
+# Facts read once sshd is ready, enough to know which OS booted and how to reboot into Windows
+BOOT_FACTS = ("operating_system", "boot_id", "desktop_environment", "get_windows_entry_grub")
+
+
+class BootPhase(str, Enum):
+    MAGIC_PACKET_SENT = "magic_packet_sent"
+    NETWORK_UP = "network_up"
+    SSH_READY = "ssh_ready"
+    GRUB_ENTRY_SET = "grub_entry_set"
+    REBOOT_ISSUED = "reboot_issued"
+    WINDOWS_UP = "windows_up"
+
+
+class BootState(str, Enum):
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    TIMED_OUT = "timed_out"
+    CANCELLED = "cancelled"
+
+
+class BootToWindows:
+    """
+    Start a dual-boot computer into Windows, through Linux (the default GRUB entry).
+
+    The phases follow each other: magic packet sent, network up, SSH ready (sshd sends its banner), GRUB entry set,
+    reboot issued, then Windows up (Windows' sshd answers). The network and SSH readiness are probed every
+    `probe_interval` instead of waiting for the next poll. A computer that directly boots (or already runs) Windows
+    goes straight to the last phase.
+
+    The whole boot must complete within `timeout` seconds. The time each phase took is kept in `timings`.
+    """
+
+    def __init__(self, computer: 'Computer', timeout: float = BOOT_TO_WINDOWS_TIMEOUT,
+                 probe_interval: float = BOOT_PROBE_INTERVAL) -> None:
+        self.computer = computer
+        self.timeout = timeout
+        self.probe_interval = probe_interval
+
+        self.state = BootState.RUNNING
+        self.phase: Optional[BootPhase] = None  # The last phase reached
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}  # Seconds each reached phase took, since the previous one
+
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._phase_started_at: Optional[float] = None
+        self._deadline: Optional[Deadline] = None
+
+    async def run(self) -> BootState:
+        """Run the orchestration until Windows is up, it fails, times out or is cancelled."""
+        self._started_at = self._phase_started_at = time.monotonic()
+        self._deadline = Deadline.after(self.timeout)
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                await self._run()
+            self.state = BootState.SUCCEEDED
+        except TimeoutError:
+            self.state = BootState.TIMED_OUT
+            self.error = f"Not done after {self.timeout}s (last phase: {self.phase.value if self.phase else None})"
+        except asyncio.CancelledError:
+            self.state = BootState.CANCELLED
+            raise
+        except (ValueError, ConnectionError) as exc:
+            self.state = BootState.FAILED
+            self.error = str(exc)
+        finally:
+            self._finished_at = time.monotonic()
+            level = LOGGER.info if self.state in (BootState.SUCCEEDED, BootState.CANCELLED) else LOGGER.warning
+            level(f"Starting {self.computer.host} to Windows {self.state.value} after {self.elapsed:.1f}s: "
+                  f"{self.error or self.timings}")
+
+        return self.state
+
+    async def _run(self) -> None:
+        computer = self.computer
+
+        await computer.start()
+        self._reached(BootPhase.MAGIC_PACKET_SENT)
+
+        await self._wait_until(self._network_up)
+        self._reached(BootPhase.NETWORK_UP)
+
+        await self._wait_until(self._ssh_ready)
+        await self._read_operating_system()
+        self._reached(BootPhase.SSH_READY)
+
+        if computer.operating_system != OSType.WINDOWS:
+            await computer.set_next_boot_to_windows(self._deadline)
+            self._reached(BootPhase.GRUB_ENTRY_SET)
+
+            await computer.restart(deadline=self._deadline)
+            self._reached(BootPhase.REBOOT_ISSUED)
+
+            # Linux' sshd keeps answering for a moment, do not mistake it for Windows'
+            await self._wait_until(self._ssh_down)
+            await self._wait_until(self._ssh_ready)
+            await self._read_operating_system()
+
+            if computer.operating_system != OSType.WINDOWS:
+                booted = computer.operating_system.value if computer.operating_system else "an unknown OS"
+                raise ValueError(f"{computer.host} booted {booted} instead of Windows (GRUB entry not used?)")
+
+        self._reached(BootPhase.WINDOWS_UP)
+
+    async def _network_up(self) -> bool:
+        # Recorded like any presence probe, e.g. lets the next SSH connection through the circuit breaker
+        return self.computer.set_presence(await self.computer.presence.probe(self.probe_interval))
+
+    async def _ssh_ready(self) -> bool:
+        return await self.computer.presence.probe_ssh(self.probe_interval)
+
+    async def _ssh_down(self) -> bool:
+        return not await self._ssh_ready()
+
+    async def _read_operating_system(self) -> None:
+        """Read which OS runs (the computer just (re)booted, what was known is stale)."""
+        self.computer.operating_system = None
+        await self._wait_until(self._updated)
+
+    async def _updated(self) -> bool:
+        # sshd may answer before it accepts logins, or the circuit breaker hold back the first attempts
+        try:
+            return "operating_system" in await self.computer.update(True, actions=BOOT_FACTS, deadline=self._deadline)
+        except ConnectionError as exc:
+            LOGGER.debug(f"Waiting to connect to {self.computer.host}: {exc}")
+            return False
+
+    async def _wait_until(self, condition: Callable[[], Awaitable[bool]]) -> None:
+        while not await condition():
+            await asyncio.sleep(self.probe_interval)
+
+    def _reached(self, phase: BootPhase) -> None:
+        now = time.monotonic()
+        self.timings[phase.value] = round(now - self._phase_started_at, 3)
+        self._phase_started_at = now
+        self.phase = phase
+        LOGGER.debug(f"Starting {self.computer.host} to Windows: {phase.value} after {self.timings[phase.value]}s")
+
+    @property
+    def elapsed(self) -> float:
+        if self._started_at is None:
+            return 0.0
+        return (self._finished_at or time.monotonic()) - self._started_at
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "phase": self.phase.value if self.phase else None,
+            "timings": dict(self.timings),
+            "elapsed": round(self.elapsed, 3),
+            "error": self.error,
+        }
+
+
+class BootOrchestrator:
+    """
+    Run the boot orchestrations in the background, at most one per host.
+
+    Starting a host already being started returns the orchestration in progress. The last orchestration of each host
+    is kept (with its timings) until the next one starts.
+    """
+
+    def __init__(self, timeout: float = BOOT_TO_WINDOWS_TIMEOUT, probe_interval: float = BOOT_PROBE_INTERVAL) -> None:
+        self.timeout = timeout
+        self.probe_interval = probe_interval
+        self._runs: Dict[str, Tuple[BootToWindows, asyncio.Task]] = {}
+
+    def start_to_windows(self, computer: 'Computer') -> BootToWindows:
+        run = self._runs.get(computer.host)
+        if run is not None and not run[1].done():
+            LOGGER.debug(f"{computer.host} is already being started to Windows")
+            return run[0]
+
+        boot = BootToWindows(computer, self.timeout, self.probe_interval)
+        task = asyncio.get_running_loop().create_task(boot.run())
+        # Cancelled or not, the outcome is in the orchestration, do not let it be reported as never retrieved
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._runs[computer.host] = (boot, task)
+        return boot
+
+    def get(self, host: str) -> Optional[BootToWindows]:
+        run = self._runs.get(host)
+        return run[0] if run is not None else None
+
+    async def cancel(self, host: str) -> bool:
+        """Cancel the orchestration in progress for a host, return whether there was one."""
+        run = self._runs.get(host)
+        if run is None or run[1].done():
+            return False
+
+        run[1].cancel()
+        await asyncio.wait([run[1]])
+        return True
+
+    async def async_shutdown(self) -> None:
+        for host in list(self._runs):
+            await self.cancel(host)
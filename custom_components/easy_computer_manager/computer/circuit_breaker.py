@@ -0,0 +1,95 @@
+import random
+import time
+from enum import Enum
+from typing import Dict, Any
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of connecting to a host whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Stop trying to connect to a host that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and every attempt fails fast until the backoff
+    delay expires (exponential, with jitter). The circuit is then half-open: a single trial attempt is let through,
+    closing the circuit on success or re-opening it with a longer delay on failure.
+    """
+
+    def __init__(self, host: str, failure_threshold: int, base_delay: float, max_delay: float) -> None:
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._failures = 0
+        self._opened = 0  # Consecutive times the circuit opened, drives the backoff
+        self._open_until = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self._open_until is None:
+            return CircuitState.CLOSED
+        if time.monotonic() < self._open_until:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    def before_attempt(self) -> None:
+        """
+        Check whether the host may be tried now.
+
+        :raises CircuitOpenError:
+            If the circuit is open, or half-open with the trial attempt already running.
+        """
+
+        state = self.state
+
+        if state == CircuitState.OPEN:
+            raise CircuitOpenError(
+                f"{self.host} is unreachable, not retrying for {self._open_until - time.monotonic():.0f}s"
+            )
+
+        if state == CircuitState.HALF_OPEN:
+            if self._trial_in_progress:
+                raise CircuitOpenError(f"{self.host} is unreachable, a reconnection attempt is already running")
+            self._trial_in_progress = True
+
+    def record_success(self) -> None:
+        self.reset()
+
+    def record_failure(self) -> None:
+        was_half_open = self.state == CircuitState.HALF_OPEN
+        self._trial_in_progress = False
+        self._failures += 1
+
+        if was_half_open or self._failures >= self.failure_threshold:
+            self._opened += 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (self._opened - 1))
+            # Equal jitter: hosts that went down together do not all come back knocking at the same time
+            self._open_until = time.monotonic() + random.uniform(delay / 2, delay)
+
+    def reset(self) -> None:
+        """Close the circuit, e.g. when the host is known to be back."""
+        self._failures = 0
+        self._opened = 0
+        self._open_until = None
+        self._trial_in_progress = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == CircuitState.OPEN:
+            retry_in = round(self._open_until - time.monotonic(), 1)
+
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self._failures,
+            "retry_in": retry_in,
+        }
@@ -0,0 +1,85 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from custom_components.easy_computer_manager.const import FALLBACK_COMMAND_MAX_FAILURES
+
+
+class CommandMemory:
+    """
+    Remember which of the fallback commands of an action last worked on a host, to try it first next time.
+
+    Commands are remembered per OS, a dual-boot computer keeps what was learned for the other one. Everything learned
+    for an OS is forgotten when its version changes (upgrade, reinstall), and a remembered command is forgotten after
+    failing `max_failures` times in a row. `on_change` is called whenever what should be persisted changed.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None,
+                 max_failures: int = FALLBACK_COMMAND_MAX_FAILURES) -> None:
+        data = data or {}
+        self.max_failures = max_failures
+        self.on_change: Optional[Callable[[], None]] = None
+        # Bumped whenever the order of the commands of an action may have changed, e.g. to rebuild cached batches
+        self.version = 0
+
+        # {os: {action id: command}}, only for actions whose first command is not the one that works
+        self._commands: Dict[str, Dict[str, str]] = {
+            os_name: dict(commands) for os_name, commands in data.get("commands", {}).items()
+        }
+        self._versions: Dict[str, str] = dict(data.get("versions", {}))
+        self._failures: Dict[Tuple[str, str], int] = {}
+
+    def order(self, os_name: str, action_id: str, commands: Sequence[str]) -> List[int]:
+        """Return the indexes of the commands in the order to try them, the remembered one first."""
+        preferred = self._commands.get(os_name, {}).get(action_id)
+        if preferred is None or preferred not in commands:
+            return list(range(len(commands)))
+
+        first = commands.index(preferred)
+        return [first] + [index for index in range(len(commands)) if index != first]
+
+    def succeeded(self, os_name: str, action_id: str, command: str, commands: Sequence[str]) -> None:
+        """Record that `command`, one of the fallback `commands` of the action, worked."""
+        self._failures.pop((os_name, action_id), None)
+        learned = self._commands.setdefault(os_name, {})
+
+        if command == commands[0]:
+            # The default order is right, nothing to remember
+            if learned.pop(action_id, None) is not None:
+                self._changed()
+        elif learned.get(action_id) != command:
+            learned[action_id] = command
+            self._changed()
+
+    def failed(self, os_name: str, action_id: str) -> None:
+        """Record that every command of the action failed, forgetting the remembered one if it keeps failing."""
+        if action_id not in self._commands.get(os_name, {}):
+            return
+
+        failures = self._failures.get((os_name, action_id), 0) + 1
+        if failures < self.max_failures:
+            self._failures[(os_name, action_id)] = failures
+            return
+
+        del self._commands[os_name][action_id]
+        self._failures.pop((os_name, action_id), None)
+        self._changed()
+
+    def set_version(self, os_name: str, version: Optional[str]) -> None:
+        """Record the version of an OS, forgetting what was learned for it if it changed."""
+        if not version or self._versions.get(os_name) == version:
+            return
+
+        if self._versions.get(os_name) is not None and self._commands.pop(os_name, None):
+            self._failures = {key: count for key, count in self._failures.items() if key[0] != os_name}
+        self._versions[os_name] = version
+        self._changed()
+
+    def _changed(self) -> None:
+        self.version += 1
+        if self.on_change is not None:
+            self.on_change()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "commands": {os_name: dict(commands) for os_name, commands in self._commands.items() if commands},
+            "versions": dict(self._versions),
+        }
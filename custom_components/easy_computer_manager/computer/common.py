@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import List, Optional, Tuple
 
 
 class OSType(str, Enum):
@@ -7,12 +8,33 @@ class OSType(str, Enum):
     MACOS = "MacOS"
 
 
+# Exit code of a command that was stopped because its deadline expired (same as coreutils' timeout)
+TIMEOUT_RETURN_CODE = 124
+
+
 class CommandOutput:
-    def __init__(self, command: str, return_code: int, output: str, error: str) -> None:
+    def __init__(self, command: str, return_code: int, output: str, error: str,
+                 steps: Optional[List[Tuple[str, int]]] = None, timed_out: bool = False,
+                 connection_lost: bool = False) -> None:
         self.command = command
         self.return_code = return_code
         self.output = output.strip()
         self.error = error.strip()
+        # (command, exit code) of every step of a batch that ran, in order (see Computer.run_actions)
+        self.steps = steps or []
+        # The command was stopped (or never started) because its deadline expired, the output might be partial
+        self.timed_out = timed_out
+        # The command could not run (or complete) because there was no connection or it dropped, says nothing about
+        # whether it works on the host
+        self.connection_lost = connection_lost
+
+    @classmethod
+    def timeout(cls, command: str, output: str = "", error: str = "") -> "CommandOutput":
+        return cls(command, TIMEOUT_RETURN_CODE, output, error or "Deadline expired", timed_out=True)
+
+    @classmethod
+    def disconnected(cls, command: str, error: str) -> "CommandOutput":
+        return cls(command, -1, "", error, connection_lost=True)
 
     def successful(self) -> bool:
         return self.return_code == 0
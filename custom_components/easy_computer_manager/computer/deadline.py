@@ -0,0 +1,42 @@
+import time
+from typing import Optional
+
+
+class Deadline:
+    """
+    The point in time by which a remote call must be done.
+
+    A deadline is created once by the caller (a poll, a service call) and handed down to every action it runs, each
+    action only narrowing it to its own budget. The SSH clients get the time remaining when the command is sent.
+    """
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float) -> None:
+        self.expires_at = expires_at  # time.monotonic() timestamp
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def within(self, seconds: Optional[float]) -> "Deadline":
+        """Return the earliest of this deadline and `seconds` from now."""
+        if seconds is None:
+            return self
+        return Deadline(min(self.expires_at, time.monotonic() + seconds))
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+def narrow(deadline: Optional[Deadline], seconds: Optional[float]) -> Optional[Deadline]:
+    """Return the deadline of a call given the caller's deadline (if any) and the call's own budget (if any)."""
+    if deadline is None:
+        return Deadline.after(seconds) if seconds is not None else None
+    return deadline.within(seconds)
@@ -0,0 +1,148 @@
+import asyncio
+import re
+import shlex
+from typing import Callable, Optional, Set
+
+from custom_components.easy_computer_manager import LOGGER
+from custom_components.easy_computer_manager.computer.deadline import Deadline
+from custom_components.easy_computer_manager.const import EVENT_STREAM_COMMAND, EVENT_STREAM_DEBOUNCE, \
+    EVENT_STREAM_RETRY_DELAY, EVENT_STREAM_MIN_UPTIME, EVENT_STREAM_MAX_RETRY_DELAY, EVENT_STREAM_MAX_FAILURES, \
+    EVENT_STREAM_REFRESH_TIMEOUT
+
+# `pactl subscribe`: Event 'change' on sink #56 (server events are default sink/source changes)
+AUDIO_EVENT = re.compile(r"^Event '\w+' on (?:sink|source|server) #")
+# `dbus-monitor`: signal time=... path=/org/bluez/hci0/dev_XX; ... or `bluetoothctl`: [CHG] Device XX Connected: yes
+BLUETOOTH_EVENT = re.compile(r"^signal .*path=/org/bluez/|\[(?:CHG|NEW|DEL)\]\S* Device ")
+
+AUDIO_ACTIONS = ("get_speakers", "get_microphones")
+BLUETOOTH_ACTIONS = ("get_bluetooth_devices",)
+
+# Read actions kept up to date by the stream, they do not need to be polled while it runs
+STREAMED_ACTIONS = AUDIO_ACTIONS + BLUETOOTH_ACTIONS
+
+
+class EventStream:
+    """
+    Follow the audio and bluetooth changes of a Linux computer through a long-lived SSH channel.
+
+    The events do not carry the new state: each burst of events (debounced) refreshes only the audio configuration
+    and/or the bluetooth devices, then `on_change` is called. The stream is reopened after a delay when it ends, and
+    everything it follows is refreshed once it is back (changes were missed meanwhile).
+
+    A stream that ends right away (e.g. pactl is missing) is retried with an exponential backoff, without refreshing
+    anything. After `max_failures` such streams in a row, the stream gives up until stop() is called: while it is not
+    running, the coordinator polls the audio and bluetooth again.
+    """
+
+    def __init__(self, computer: 'Computer', on_change: Callable[[], None], debounce: float = EVENT_STREAM_DEBOUNCE,
+                 retry_delay: float = EVENT_STREAM_RETRY_DELAY, min_uptime: float = EVENT_STREAM_MIN_UPTIME,
+                 max_retry_delay: float = EVENT_STREAM_MAX_RETRY_DELAY,
+                 max_failures: int = EVENT_STREAM_MAX_FAILURES) -> None:
+        self.computer = computer
+        self.on_change = on_change
+        self.debounce = debounce
+        self.retry_delay = retry_delay
+        self.min_uptime = min_uptime
+        self.max_retry_delay = max_retry_delay
+        self.max_failures = max_failures
+
+        self.failures = 0  # Streams that failed in a row
+        self._gave_up = False
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pending: Set[str] = set()
+
+    @property
+    def running(self) -> bool:
+        """Return whether the stream follows the changes, i.e. it is not failing."""
+        return self._task is not None and not self._task.done() and self.failures == 0
+
+    def start(self) -> None:
+        if (self._task is None or self._task.done()) and not self._gave_up:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=f"ecm-events-{self.computer.host}")
+
+    async def stop(self) -> None:
+        for task in (self._task, self._flush_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        self._task = self._flush_task = None
+        self._pending.clear()
+        self.failures = 0
+        self._gave_up = False
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        command = f"sh -c {shlex.quote(EVENT_STREAM_COMMAND)}"
+        resync = False
+
+        while True:
+            # Anything that changed while the stream was down is unknown, refresh everything once it is reopened
+            if resync:
+                self._schedule(STREAMED_ACTIONS)
+
+            opened_at = loop.time()
+            received = False
+            # A stream still open after min_uptime runs, even if nothing happened yet
+            confirm = loop.call_later(self.min_uptime, self._mark_running)
+            try:
+                async for line in self.computer.stream_lines(command):
+                    if not received:
+                        received = True
+                        self._mark_running()
+                    if AUDIO_EVENT.match(line):
+                        self._schedule(AUDIO_ACTIONS)
+                    elif BLUETOOTH_EVENT.search(line):
+                        self._schedule(BLUETOOTH_ACTIONS)
+                LOGGER.debug(f"Event stream of {self.computer.host} ended")
+            except ConnectionError as exc:
+                LOGGER.debug(f"Event stream of {self.computer.host} failed: {exc}")
+            except Exception:  # noqa: BLE001 - counted as a failed stream, the task must not die silently
+                LOGGER.exception(f"Event stream of {self.computer.host} failed")
+            finally:
+                confirm.cancel()
+
+            # Only a stream that ran can have missed changes, and deserves to be reopened without backing off
+            resync = received or loop.time() - opened_at >= self.min_uptime
+            if resync:
+                delay = self.retry_delay
+            else:
+                self.failures += 1
+                if self.failures >= self.max_failures:
+                    LOGGER.warning(f"Event stream of {self.computer.host} keeps failing, polling the audio and "
+                                   f"bluetooth instead")
+                    self._gave_up = True
+                    return
+                delay = min(self.max_retry_delay, self.retry_delay * 2 ** (self.failures - 1))
+
+            await asyncio.sleep(delay)
+
+    def _mark_running(self) -> None:
+        self.failures = 0
+
+    def _schedule(self, actions) -> None:
+        self._pending.update(actions)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.debounce)
+            actions, self._pending = sorted(self._pending), set()
+
+            try:
+                updated = await self.computer.update(True, actions=actions,
+                                                     deadline=Deadline.after(EVENT_STREAM_REFRESH_TIMEOUT))
+            except ConnectionError as exc:
+                LOGGER.debug(f"Cannot refresh {self.computer.host} after an event: {exc}")
+                continue
+            except Exception:  # noqa: BLE001 - the next events must still be handled
+                LOGGER.exception(f"Cannot refresh {self.computer.host} after an event")
+                continue
+
+            if updated:
+                self.on_change()
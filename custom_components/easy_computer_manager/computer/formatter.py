@@ -1,10 +1,21 @@
-def format_gnome_monitors_args(monitors_config: dict):
+from typing import Optional
+
+from custom_components.easy_computer_manager.computer.models import AudioConfig, AudioDevices, Monitors
+
+
+def format_gnome_monitors_args(monitors_config: dict, current_monitors: Optional[Monitors] = None):
+    """Format the gnome-monitor-config arguments, monitors can be given by connector or by display name."""
     args = []
 
-    monitors_config = monitors_config.get('monitors_config', {})
+    # Either the settings of each monitor or the data of the change_monitors_config service wrapping them
+    monitors_config = monitors_config.get('monitors_config', monitors_config)
 
     for monitor, settings in monitors_config.items():
         if settings.get('enabled', False):
+            current_monitor = current_monitors.find(monitor) if current_monitors else None
+            if current_monitor is not None:
+                monitor = current_monitor.source
+
             args.extend(['-LpM' if settings.get('primary', False) else '-LM', monitor])
 
             if 'position' in settings:
@@ -22,17 +33,15 @@ def format_gnome_monitors_args(monitors_config: dict):
     return ' '.join(args)
 
 
-def format_pactl_commands(current_config: {}, volume: int, mute: bool, input_device: str = "@DEFAULT_SOURCE@",
+def format_pactl_commands(current_config: AudioConfig, volume: int, mute: bool, input_device: str = "@DEFAULT_SOURCE@",
                           output_device: str = "@DEFAULT_SINK@"):
     """Change audio configuration on the host system."""
 
     commands = []
 
-    def get_device_id(device_type, user_device):
-        for device in current_config[device_type]:
-            if device['description'] == user_device:
-                return device['name']
-        return user_device
+    def get_device_id(devices: AudioDevices, user_device):
+        device = devices.find(user_device, 'description')
+        return device.name if device is not None else user_device
 
     # Set default sink and source if not specified
     if not output_device:
@@ -42,12 +51,12 @@ def format_pactl_commands(current_config: {}, volume: int, mute: bool, input_dev
 
     # Set default sink if specified
     if output_device and output_device != "@DEFAULT_SINK@":
-        output_device = get_device_id('sinks', output_device)
+        output_device = get_device_id(current_config.speakers, output_device)
         commands.append(f"set-default-sink {output_device}")
 
     # Set default source if specified
     if input_device and input_device != "@DEFAULT_SOURCE@":
-        input_device = get_device_id('sources', input_device)
+        input_device = get_device_id(current_config.microphones, input_device)
         commands.append(f"set-default-source {input_device}")
 
     # Set sink volume if specified
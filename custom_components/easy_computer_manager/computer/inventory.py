@@ -0,0 +1,88 @@
+import shlex
+from typing import Dict, List
+
+from custom_components.easy_computer_manager.computer.common import CommandOutput
+
+# Read actions collected on every poll, in the order they appear in the inventory script.
+INVENTORY_ACTIONS = (
+    "operating_system",
+    "boot_id",
+    "operating_system_version",
+    "desktop_environment",
+    "get_windows_entry_grub",
+    "get_monitors_config",
+    "get_speakers",
+    "get_microphones",
+    "get_bluetooth_devices",
+)
+
+SECTION_MARKER = "::ecm"
+
+
+def build_inventory_script(sections: Dict[str, List[str]], token: str) -> str:
+    """
+    Build a single POSIX shell invocation running every section's commands.
+
+    Each section tries its commands in order (like run_action does) and stops at the first one that succeeds.
+    The output of every section is wrapped between begin/end markers carrying the section id, the exit code and the
+    index of the last command run.
+
+    :param sections:
+        Mapping of section id to the ordered list of fallback commands.
+    :param token:
+        Random token embedded in the markers so remote output cannot be mistaken for a delimiter.
+
+    :returns: str
+        The command to execute over SSH.
+    """
+
+    lines = []
+
+    for section, commands in sections.items():
+        lines.append(f"printf '%s\\n' '{SECTION_MARKER}:{token}:begin:{section}'")
+
+        for index, command in enumerate(commands):
+            capture = f"__ecm_out=$( {{ {command} ; }} 2>/dev/null ); __ecm_rc=$?; __ecm_cmd={index}"
+            lines.append(capture if index == 0 else f"[ \"$__ecm_rc\" -eq 0 ] || {{ {capture}; }}")
+
+        lines.append("[ -n \"$__ecm_out\" ] && printf '%s\\n' \"$__ecm_out\"")
+        lines.append(f"printf '%s\\n' \"{SECTION_MARKER}:{token}:end:$__ecm_rc:$__ecm_cmd\"")
+
+    # Run through sh explicitly, the login shell of the user might not be POSIX compatible
+    return f"sh -c {shlex.quote(chr(10).join(lines))}"
+
+
+def parse_inventory_output(output: str, sections: Dict[str, List[str]], token: str) -> Dict[str, CommandOutput]:
+    """
+    Split the output of an inventory script back into one CommandOutput per section.
+
+    Sections missing from the output (e.g. the script was interrupted) are not included in the result. The command of
+    a successful section's output is the one that succeeded, the whole fallback chain otherwise.
+    """
+
+    begin = f"{SECTION_MARKER}:{token}:begin:"
+    end = f"{SECTION_MARKER}:{token}:end:"
+
+    results = {}
+    current_section = None
+    current_lines = []
+
+    for line in output.split('\n'):
+        if line.startswith(begin):
+            current_section = line[len(begin):]
+            current_lines = []
+        elif current_section is not None and line.startswith(end):
+            return_code, _, index = line[len(end):].strip().partition(':')
+            return_code = int(return_code) if return_code.lstrip('-').isdigit() else 1
+            commands = sections.get(current_section, [])
+
+            command = " || ".join(commands)
+            if return_code == 0 and index.isdigit() and int(index) < len(commands):
+                command = commands[int(index)]
+
+            results[current_section] = CommandOutput(command, return_code, '\n'.join(current_lines), "")
+            current_section = None
+        elif current_section is not None:
+            current_lines.append(line)
+
+    return results
@@ -0,0 +1,32 @@
+import time
+from typing import Optional
+
+
+class Liveness:
+    """
+    Track when an SSH connection was last known to be working.
+
+    The SSH clients mark the connection as alive every time the remote host answered (command executed, probe
+    answered) and rely on transport-level keepalives to notice a dead peer in between. Checking the state is O(1)
+    and never touches the network, an active probe is only needed once the last answer is older than the
+    freshness window.
+    """
+
+    def __init__(self, freshness: float) -> None:
+        self.freshness = freshness
+        self._last_seen: Optional[float] = None
+
+    @property
+    def last_seen(self) -> Optional[float]:
+        """Monotonic timestamp of the last answer from the remote host, None if never/dead."""
+        return self._last_seen
+
+    def mark_alive(self) -> None:
+        self._last_seen = time.monotonic()
+
+    def mark_dead(self) -> None:
+        self._last_seen = None
+
+    def is_fresh(self) -> bool:
+        """Return whether the remote host answered within the freshness window."""
+        return self._last_seen is not None and time.monotonic() - self._last_seen < self.freshness
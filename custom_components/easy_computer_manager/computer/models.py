@@ -0,0 +1,110 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class Monitor:
+    source: str  # Connector, e.g. DP-1
+    status: str  # ON or OFF
+    names: List[str] = field(default_factory=list)
+    resolutions: List[str] = field(default_factory=list)  # e.g. 2560x1440@143.912
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class AudioDevice:
+    id: int
+    name: Optional[str] = None
+    state: Optional[str] = None
+    description: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class BluetoothDevice:
+    address: str
+    name: Optional[str] = None
+    connected: Optional[bool] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class DeviceList(Generic[T]):
+    """
+    Immutable list of devices, indexed by the fields in `indexed_fields` for constant-time lookups.
+
+    A field holding a list (e.g. the names of a monitor) indexes the device under each of its values. When several
+    devices share a value, the first one is returned, as a linear scan would.
+    """
+
+    __slots__ = ("_devices", "_indexes")
+
+    indexed_fields: Tuple[str, ...] = ()
+
+    def __init__(self, devices: Iterable[T] = ()) -> None:
+        self._devices: Tuple[T, ...] = tuple(devices)
+        self._indexes: Dict[str, Dict[Any, T]] = {name: {} for name in self.indexed_fields}
+
+        for device in self._devices:
+            for name, index in self._indexes.items():
+                values = getattr(device, name)
+                for value in values if isinstance(values, list) else (values,):
+                    if value is not None:
+                        index.setdefault(value, device)
+
+    def find(self, value: Any, *fields: str) -> Optional[T]:
+        """Return the device having `value` in one of `fields` (all the indexed fields by default), or None."""
+        for name in fields or self.indexed_fields:
+            device = self._indexes[name].get(value)
+            if device is not None:
+                return device
+        return None
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._devices)
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def __getitem__(self, index: int) -> T:
+        return self._devices[index]
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, DeviceList) and self._devices == other._devices
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self._devices)!r})"
+
+    def as_list(self) -> List[Dict[str, Any]]:
+        return [device.as_dict() for device in self._devices]
+
+
+class Monitors(DeviceList[Monitor]):
+    __slots__ = ()
+    indexed_fields = ("source", "names")
+
+
+class AudioDevices(DeviceList[AudioDevice]):
+    __slots__ = ()
+    indexed_fields = ("name", "description")
+
+
+class BluetoothDevices(DeviceList[BluetoothDevice]):
+    __slots__ = ()
+    indexed_fields = ("address", "name")
+
+
+@dataclass(slots=True)
+class AudioConfig:
+    speakers: AudioDevices = field(default_factory=AudioDevices)
+    microphones: AudioDevices = field(default_factory=AudioDevices)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"speakers": self.speakers.as_list(), "microphones": self.microphones.as_list()}
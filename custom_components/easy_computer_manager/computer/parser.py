@@ -1,117 +1,203 @@
+import json
 import re
+from typing import Iterable, Optional, Union
 
 from custom_components.easy_computer_manager import LOGGER
 from custom_components.easy_computer_manager.computer import CommandOutput
+from custom_components.easy_computer_manager.computer.models import AudioConfig, AudioDevice, AudioDevices, \
+    BluetoothDevice, BluetoothDevices, Monitor, Monitors
 
 
-def parse_gnome_monitors_output(config: str) -> list:
+# gnome-monitor-config list
+MONITOR_HEADER = re.compile(r'^Monitor \[ (.+?) \] (ON|OFF)$')
+MONITOR_RESOLUTION = re.compile(r'\s+((\d+)x\d+)@(\d+(?:\.\d+)?)')
+# Mode ids of org.gnome.Mutter.DisplayConfig (what gnome-monitor-config lists)
+MUTTER_MODE_ID = re.compile(r'((\d+)x\d+)@(\d+(?:\.\d+)?)')
+MONITOR_DISPLAY_NAME = "display-name: "
+MONITOR_MIN_WIDTH = 1280
+
+# pactl list sinks/sources
+PACTL_FIELDS = {"Name": "name", "State": "state", "Description": "description"}
+PACTL_FIELD_PREFIXES = tuple(f"\t{field}:" for field in PACTL_FIELDS)
+
+
+def _lines(config: Union[str, Iterable[str]]) -> Iterable[str]:
+    """Return the lines of a command output given as a string or as an iterable of lines (e.g. a stream)."""
+    if isinstance(config, str):
+        return config.split('\n')
+    return (line.rstrip('\n') for line in config)
+
+
+def parse_gnome_monitors_output(config: Union[str, Iterable[str]]) -> Monitors:
     """
     Parse the GNOME monitors configuration.
 
+    Resolutions under 1280 pixels wide are skipped, and so are the framerates less than 1Hz below the last one kept
+    for the same resolution.
+
     :param config:
-        The output of the gnome-monitor-config list command.
+        The output of the gnome-monitor-config list command, as a string or an iterable of lines.
 
-    :type config: str
+    :type config: str | Iterable[str]
 
-    :returns: list
+    :returns: Monitors
         The parsed monitors configuration.
     """
 
     monitors = []
     current_monitor = None
-
-    for line in config.split('\n'):
-        monitor_match = re.match(r'^Monitor \[ (.+?) \] (ON|OFF)$', line)
-        if monitor_match:
-            if current_monitor:
+    last_size = last_framerate = None  # Last resolution kept for the current monitor
+
+    for line in _lines(config):
+        if line.startswith('Monitor ['):
+            monitor_match = MONITOR_HEADER.match(line)
+            if monitor_match:
+                source, status = monitor_match.groups()
+                current_monitor = Monitor(source, status)
                 monitors.append(current_monitor)
-            source, status = monitor_match.groups()
-            current_monitor = {'source': source, 'status': status, 'names': [], 'resolutions': []}
-        elif current_monitor:
-            display_name_match = re.match(r'^\s+display-name: (.+)$', line)
-            resolution_match = re.match(r'^\s+(\d+x\d+@\d+(?:\.\d+)?).*$', line)
-            if display_name_match:
-                current_monitor['names'].append(display_name_match.group(1).replace('"', ''))
-            elif resolution_match:
-                # Don't include resolutions under 1280x720
-                if int(resolution_match.group(1).split('@')[0].split('x')[0]) >= 1280:
-
-                    # If there are already resolutions in the list, check if the framerate between the last is >1
-                    if len(current_monitor['resolutions']) > 0:
-                        last_resolution = current_monitor['resolutions'][-1]
-                        last_resolution_size = last_resolution.split('@')[0]
-                        this_resolution_size = resolution_match.group(1).split('@')[0]
-
-                        # Only truncate some framerates if the resolution are the same
-                        if last_resolution_size == this_resolution_size:
-                            last_resolution_framerate = float(last_resolution.split('@')[1])
-                            this_resolution_framerate = float(resolution_match.group(1).split('@')[1])
-
-                            # If the difference between the last resolution framerate and this one is >1, ignore it
-                            if last_resolution_framerate - 1 > this_resolution_framerate:
-                                current_monitor['resolutions'].append(resolution_match.group(1))
-                        else:
-                            # If the resolution is different, this adds the new resolution
-                            # to the list without truncating
-                            current_monitor['resolutions'].append(resolution_match.group(1))
-                    else:
-                        # This is the first resolution, add it to the list
-                        current_monitor['resolutions'].append(resolution_match.group(1))
-
-    if current_monitor:
-        monitors.append(current_monitor)
-
-    return monitors
-
-
-def parse_pactl_output(config_speakers: str, config_microphones: str) -> dict[str, list]:
+                last_size = last_framerate = None
+                continue
+
+        if current_monitor is None or not line[:1].isspace():
+            continue
+
+        stripped = line.lstrip()
+        if stripped.startswith(MONITOR_DISPLAY_NAME):
+            if len(stripped) > len(MONITOR_DISPLAY_NAME):
+                current_monitor.names.append(stripped[len(MONITOR_DISPLAY_NAME):].replace('"', ''))
+            continue
+
+        resolution_match = MONITOR_RESOLUTION.match(line)
+        if resolution_match is None:
+            continue
+
+        size, width, framerate = resolution_match.groups()
+        framerate_value = float(framerate)
+        if _keep_resolution(size, int(width), framerate_value, last_size, last_framerate):
+            current_monitor.resolutions.append(f"{size}@{framerate}")
+            last_size, last_framerate = size, framerate_value
+
+    return Monitors(monitors)
+
+
+def _keep_resolution(size: str, width: int, framerate: float, last_size: Optional[str],
+                     last_framerate: Optional[float]) -> bool:
+    """Skip resolutions under 1280 pixels wide, and framerates less than 1Hz below the last one kept for the size."""
+    if width < MONITOR_MIN_WIDTH:
+        return False
+    return size != last_size or last_framerate - 1 > framerate
+
+
+def parse_mutter_display_config(config: str) -> Monitors:
+    """
+    Parse the GNOME monitors configuration from the GetCurrentState method of org.gnome.Mutter.DisplayConfig.
+
+    :param config:
+        The output of `busctl --json=short call ... GetCurrentState`.
+
+    :type config: str
+
+    :returns: Monitors
+        The parsed monitors configuration, like parse_gnome_monitors_output().
+
+    :raises ValueError:
+        If the output is not the expected JSON.
+    """
+
+    try:
+        _, physical_monitors, logical_monitors, _ = json.loads(config)['data']
+
+        # A monitor is on when it is part of a logical monitor
+        enabled = {monitor[0] for logical_monitor in logical_monitors for monitor in logical_monitor[5]}
+
+        monitors = []
+        for (connector, _, _, _), modes, properties in physical_monitors:
+            monitor = Monitor(connector, 'ON' if connector in enabled else 'OFF')
+
+            display_name = properties.get('display-name', {}).get('data')
+            if display_name:
+                monitor.names.append(display_name.replace('"', ''))
+
+            last_size = last_framerate = None
+            for mode in modes:
+                mode_match = MUTTER_MODE_ID.fullmatch(mode[0])
+                if mode_match is None:
+                    continue
+
+                size, width, framerate = mode_match.groups()
+                framerate_value = float(framerate)
+                if _keep_resolution(size, int(width), framerate_value, last_size, last_framerate):
+                    monitor.resolutions.append(f"{size}@{framerate}")
+                    last_size, last_framerate = size, framerate_value
+
+            monitors.append(monitor)
+
+    except (KeyError, TypeError, IndexError, AttributeError) as exc:
+        raise ValueError(f"Unexpected DisplayConfig state: {exc}") from exc
+
+    return Monitors(monitors)
+
+
+def parse_pactl_output(config_speakers: Union[str, Iterable[str]],
+                       config_microphones: Union[str, Iterable[str]]) -> AudioConfig:
     """
     Parse the pactl audio configuration.
 
+    Monitor devices (the loopback source of every sink) are skipped.
+
     :param config_speakers:
-        The output of the pactl list sinks command.
+        The output of the pactl list sinks command, as a string or an iterable of lines.
     :param config_microphones:
-        The output of the pactl list sources command.
+        The output of the pactl list sources command, as a string or an iterable of lines.
 
-    :type config_speakers: str
-    :type config_microphones: str
+    :type config_speakers: str | Iterable[str]
+    :type config_microphones: str | Iterable[str]
 
-    :returns: dict
+    :returns: AudioConfig
         The parsed audio configuration.
 
     """
 
-    config = {'speakers': [], 'microphones': []}
+    return AudioConfig(parse_pactl_devices(config_speakers, 'Sink'), parse_pactl_devices(config_microphones, 'Source'))
 
-    def parse_device_info(lines, device_type):
-        devices = []
-        current_device = {}
 
-        for line in lines:
-            if line.startswith(f"{device_type} #"):
-                if current_device and "Monitor" not in current_device['description']:
-                    devices.append(current_device)
-                current_device = {'id': int(re.search(r'#(\d+)', line).group(1))}
-            elif line.startswith("	Name:"):
-                current_device['name'] = line.split(":")[1].strip()
-            elif line.startswith("	State:"):
-                current_device['state'] = line.split(":")[1].strip()
-            elif line.startswith("	Description:"):
-                current_device['description'] = line.split(":")[1].strip()
+def parse_pactl_devices(config: Union[str, Iterable[str]], device_type: str) -> AudioDevices:
+    """Parse the output of pactl list sinks (`device_type` 'Sink') or sources ('Source'), skipping monitors."""
+    header = f"{device_type} #"
+    devices = []
 
-        if current_device:
-            devices.append(current_device)
+    for line in _lines(config):
+        if line.startswith(header):
+            devices.append(AudioDevice(int(line[len(header):])))
+        elif line.startswith(PACTL_FIELD_PREFIXES) and devices:
+            key, _, value = line[1:].partition(':')
+            setattr(devices[-1], PACTL_FIELDS[key], value.split(':', 1)[0].strip())
 
-        return devices
+    return AudioDevices(device for device in devices if "Monitor" not in (device.description or ''))
+
+
+def parse_pactl_json_devices(config: str) -> AudioDevices:
+    """
+    Parse the output of pactl -f json list sinks/sources, like parse_pactl_devices().
 
-    config['speakers'] = parse_device_info(config_speakers.split('\n'), 'Sink')
-    config['microphones'] = parse_device_info(config_microphones.split('\n'), 'Source')
+    :raises ValueError:
+        If the output is not the expected JSON.
+    """
 
-    return config
+    try:
+        return AudioDevices(
+            AudioDevice(device['index'], device.get('name'), device.get('state'), device.get('description'))
+            for device in json.loads(config)
+            if "Monitor" not in (device.get('description') or '')
+            and device.get('monitor_of_sink') in (None, 'n/a')
+            and device.get('properties', {}).get('device.class') != 'monitor'
+        )
+    except (KeyError, TypeError, AttributeError) as exc:
+        raise ValueError(f"Unexpected pactl output: {exc}") from exc
 
 
 def parse_bluetoothctl(command: CommandOutput, connected_devices_only: bool = True,
-                       return_as_string: bool = False) -> list | str:
+                       return_as_string: bool = False) -> BluetoothDevices | str:
     """Parse the bluetoothctl info command.
 
     :param command:
@@ -123,17 +209,17 @@ def parse_bluetoothctl(command: CommandOutput, connected_devices_only: bool = Tr
     :type command: :class: CommandOutput
     :type connected_devices_only: bool
 
-    :returns: str | list
+    :returns: str | BluetoothDevices
         The parsed bluetooth devices.
 
     """
 
     if not command.successful():
         if command.output.__contains__("Missing device address argument"):  # Means no devices are connected
-            return "" if return_as_string else []
+            return "" if return_as_string else BluetoothDevices()
         else:
             LOGGER.warning(f"Cannot retrieve bluetooth devices, make sure bluetoothctl is installed")
-            return "" if return_as_string else []
+            return "" if return_as_string else BluetoothDevices()
 
     devices = []
     current_device = None
@@ -141,11 +227,7 @@ def parse_bluetoothctl(command: CommandOutput, connected_devices_only: bool = Tr
     for line in command.output.split('\n'):
         if line.startswith('Device'):
             if current_device is not None:
-                devices.append({
-                    "address": current_device,
-                    "name": current_name,
-                    "connected": current_connected
-                })
+                devices.append(BluetoothDevice(current_device, current_name, current_connected))
             current_device = line.split()[1]
             current_name = None
             current_connected = None
@@ -156,13 +238,43 @@ def parse_bluetoothctl(command: CommandOutput, connected_devices_only: bool = Tr
 
     # Add the last device if any
     if current_device is not None:
-        devices.append({
-            "address": current_device,
-            "name": current_name,
-            "connected": current_connected
-        })
+        devices.append(BluetoothDevice(current_device, current_name, current_connected))
+
+    if connected_devices_only:
+        devices = [device for device in devices if device.connected == True]
+
+    return BluetoothDevices(devices)
+
+
+def parse_bluez_objects(config: str, connected_devices_only: bool = True) -> BluetoothDevices:
+    """
+    Parse the bluetooth devices from the GetManagedObjects method of BlueZ's object manager, like parse_bluetoothctl().
+
+    :param config:
+        The output of `busctl --json=short call org.bluez / org.freedesktop.DBus.ObjectManager GetManagedObjects`.
+
+    :raises ValueError:
+        If the output is not the expected JSON.
+    """
+
+    try:
+        objects = json.loads(config)['data'][0]
+
+        devices = []
+        for interfaces in objects.values():
+            device = interfaces.get('org.bluez.Device1')
+            if device is None:
+                continue
+
+            devices.append(BluetoothDevice(
+                device['Address']['data'],
+                device.get('Name', {}).get('data'),
+                device.get('Connected', {}).get('data', False),
+            ))
+    except (KeyError, TypeError, IndexError, AttributeError) as exc:
+        raise ValueError(f"Unexpected BlueZ objects: {exc}") from exc
 
     if connected_devices_only:
-        devices = [device for device in devices if device["connected"] == True]
+        devices = [device for device in devices if device.connected]
 
-    return devices
+    return BluetoothDevices(devices)
@@ -0,0 +1,177 @@
+import asyncio
+import ipaddress
+import itertools
+import socket
+import struct
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from custom_components.easy_computer_manager import LOGGER
+from custom_components.easy_computer_manager.const import PRESENCE_PROBE_ICMP, PRESENCE_PROBE_TCP, \
+    PRESENCE_PROBE_ARP, PRESENCE_DNS_TTL
+
+ARP_TABLE = "/proc/net/arp"
+ARP_FLAG_COMPLETE = 0x2
+# Port the datagram making the kernel resolve a neighbor is sent to (discard), nothing needs to answer it
+ARP_PROBE_PORT = 9
+# Seconds between two reads of the neighbor table while waiting for the entry to complete
+ARP_POLL_INTERVAL = 0.05
+
+ICMP_ECHO_REQUEST = {socket.AF_INET: 8, socket.AF_INET6: 128}
+ICMP_ECHO_REPLY = {socket.AF_INET: 0, socket.AF_INET6: 129}
+ICMP_PROTOCOL = {socket.AF_INET: socket.IPPROTO_ICMP, socket.AF_INET6: socket.IPPROTO_ICMPV6}
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    reachable: bool
+    latency: Optional[float] = None  # Seconds, None if not measured
+    method: Optional[str] = None
+
+
+class PresenceProbe:
+    """
+    Check whether a computer is on, without spawning any process.
+
+    Strategies:
+     - tcp: connect to the SSH port, an answer (even a refused connection) means the host is up.
+     - icmp: echo request through an unprivileged ICMP datagram socket (needs `net.ipv4.ping_group_range` to include
+       our group), falls back to tcp when such sockets are not allowed.
+     - arp: send a datagram to the computer, then wait for a complete entry with its MAC in the kernel's neighbor
+       table (IPv4 on the same network only). The datagram makes the kernel resolve an entry that aged out, and
+       re-check a stale one: the entry of a computer that went off is dropped a few seconds after the first probe.
+
+    The host name is resolved once and cached for `dns_ttl` seconds, or until a probe fails.
+    """
+
+    _sequence = itertools.count(1)
+
+    def __init__(self, host: str, port: int = 22, mac: Optional[str] = None, method: str = PRESENCE_PROBE_ICMP,
+                 dns_ttl: float = PRESENCE_DNS_TTL) -> None:
+        self.host = host
+        self.port = port
+        self.mac = mac.lower().replace("-", ":") if mac else None
+        self.method = method
+        self.dns_ttl = dns_ttl
+
+        self._address: Optional[Tuple[int, str]] = None  # (family, address)
+        self._resolved_at = 0.0
+        self._icmp_allowed = True
+
+    async def probe(self, timeout: float = 1) -> ProbeResult:
+        try:
+            family, address = await self._resolve()
+        except OSError as exc:
+            LOGGER.debug(f"Cannot resolve {self.host}: {exc}")
+            return ProbeResult(False, method=self.method)
+
+        method = self.method
+        if method == PRESENCE_PROBE_ICMP and not self._icmp_allowed:
+            method = PRESENCE_PROBE_TCP
+
+        start = time.perf_counter()
+        try:
+            if method == PRESENCE_PROBE_ARP:
+                reachable = await asyncio.wait_for(self._probe_arp(family, address), timeout)
+            elif method == PRESENCE_PROBE_ICMP:
+                try:
+                    reachable = await asyncio.wait_for(self._probe_icmp(family, address), timeout)
+                except PermissionError:
+                    LOGGER.warning(f"Unprivileged ICMP sockets are not allowed, checking {self.host} with TCP instead")
+                    self._icmp_allowed = False
+                    return await self.probe(timeout)
+            else:
+                reachable = await asyncio.wait_for(self._probe_tcp(address), timeout)
+        except (asyncio.TimeoutError, OSError):
+            reachable = False
+        latency = time.perf_counter() - start
+
+        if not reachable:
+            self._address = None  # The computer might have a new address, resolve it again next time
+            return ProbeResult(False, method=method)
+
+        return ProbeResult(True, latency if method != PRESENCE_PROBE_ARP else None, method)
+
+    async def probe_ssh(self, timeout: float = 1) -> bool:
+        """Return whether sshd is ready, i.e. it sends its banner (the host being up is not enough)."""
+        try:
+            _, address = await self._resolve()
+            async with asyncio.timeout(timeout):
+                reader, writer = await asyncio.open_connection(address, self.port)
+                try:
+                    banner = await reader.readline()
+                finally:
+                    writer.close()
+        except (TimeoutError, OSError):
+            return False
+
+        return banner.startswith(b"SSH-")
+
+    async def _resolve(self) -> Tuple[int, str]:
+        if self._address is not None and time.monotonic() - self._resolved_at < self.dns_ttl:
+            return self._address
+
+        try:
+            ip = ipaddress.ip_address(self.host)
+            self._address = (socket.AF_INET6 if ip.version == 6 else socket.AF_INET, str(ip))
+        except ValueError:
+            infos = await asyncio.get_running_loop().getaddrinfo(self.host, None, type=socket.SOCK_STREAM)
+            family, _, _, _, sockaddr = infos[0]
+            self._address = (family, sockaddr[0])
+
+        self._resolved_at = time.monotonic()
+        return self._address
+
+    async def _probe_tcp(self, address: str) -> bool:
+        try:
+            _, writer = await asyncio.open_connection(address, self.port)
+        except ConnectionRefusedError:
+            return True  # Something answered, the host is up even if sshd is not
+
+        writer.close()
+        return True
+
+    @staticmethod
+    async def _probe_icmp(family: int, address: str) -> bool:
+        loop = asyncio.get_running_loop()
+        sequence = next(PresenceProbe._sequence) & 0xFFFF
+
+        # The kernel sets the identifier and checksum of datagram ICMP sockets, and only gives back our replies
+        with socket.socket(family, socket.SOCK_DGRAM, ICMP_PROTOCOL[family]) as sock:
+            sock.setblocking(False)
+            await loop.sock_sendto(sock, struct.pack("!BBHHH", ICMP_ECHO_REQUEST[family], 0, 0, 0, sequence),
+                                   (address, 0))
+
+            while True:
+                reply = await loop.sock_recv(sock, 1024)
+                if len(reply) >= 8:
+                    reply_type, _, _, _, reply_sequence = struct.unpack("!BBHHH", reply[:8])
+                    if reply_type == ICMP_ECHO_REPLY[family] and reply_sequence == sequence:
+                        return True
+
+    async def _probe_arp(self, family: int, address: str) -> bool:
+        loop = asyncio.get_running_loop()
+
+        # Without traffic to the computer, the kernel neither resolves nor re-checks its entry
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            await loop.sock_sendto(sock, b"", (address, ARP_PROBE_PORT))
+
+        while True:
+            entry = (await loop.run_in_executor(None, self._read_arp_table)).get(address)
+            if entry is not None:
+                flags, mac = entry
+                if flags & ARP_FLAG_COMPLETE and (self.mac is None or mac == self.mac):
+                    return True
+            await asyncio.sleep(ARP_POLL_INTERVAL)
+
+    @staticmethod
+    def _read_arp_table() -> Dict[str, Tuple[int, str]]:
+        """Return the neighbor table as {ip: (flags, mac)}."""
+        with open(ARP_TABLE) as table:
+            next(table)  # Header
+            return {
+                fields[0]: (int(fields[2], 16), fields[3].lower())
+                for fields in (line.split() for line in table) if len(fields) >= 4
+            }
@@ -0,0 +1,83 @@
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from custom_components.easy_computer_manager.computer.common import CommandOutput
+
+# Key of a cached result: (host, action id, sorted params)
+CacheKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+def cache_key(host: str, action_id: str, params: Optional[Dict[str, Any]] = None) -> CacheKey:
+    return host, action_id, tuple(sorted((param, str(value)) for param, value in (params or {}).items()))
+
+
+class ResultCache:
+    """
+    Keep the successful results of read actions for `ttl` seconds.
+
+    Entries are dropped before they expire when a write invalidates the action that produced them (see
+    const.ACTION_INVALIDATES). Failed results are never kept, the next caller tries again.
+
+    A read that was running while a write invalidated its action must not put its (pre-write) result back: the reader
+    takes the epoch() of its key before running and hands it to put(), which drops the result if it changed.
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[CacheKey, Tuple[float, CommandOutput]] = {}
+        # Bumped by every invalidation, of everything and of each action
+        self._epoch = 0
+        self._action_epochs: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0  # Entries dropped by a write before they expired
+
+    def get(self, key: CacheKey) -> Optional[CommandOutput]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > self._clock():
+            self.hits += 1
+            return entry[1]
+
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def epoch(self, key: CacheKey) -> Tuple[int, int]:
+        """Return the invalidation epoch of a key, it changes whenever the key is invalidated."""
+        return self._epoch, self._action_epochs.get(key[1], 0)
+
+    def put(self, key: CacheKey, result: CommandOutput, epoch: Optional[Tuple[int, int]] = None) -> None:
+        """Keep a result, unless its key was invalidated since `epoch` (taken before running the read)."""
+        if epoch is not None and epoch != self.epoch(key):
+            return
+        if self.ttl > 0 and result.successful():
+            self._entries[key] = (self._clock() + self.ttl, result)
+
+    def invalidate(self, action_ids: Optional[Iterable[str]] = None) -> None:
+        """Drop the results of the given actions, of every action if None."""
+        if action_ids is None:
+            self._epoch += 1
+            dropped = list(self._entries)
+        else:
+            action_ids = set(action_ids)
+            for action_id in action_ids:
+                self._action_epochs[action_id] = self._action_epochs.get(action_id, 0) + 1
+            dropped = [key for key in self._entries if key[1] in action_ids]
+
+        for key in dropped:
+            del self._entries[key]
+        self.invalidations += len(dropped)
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from custom_components.easy_computer_manager.computer.formatter import format_gnome_monitors_args, \
+    format_pactl_commands
+from custom_components.easy_computer_manager.computer.models import AudioConfig, Monitors
+
+SCENE_KEYS = frozenset({"monitors", "audio", "steam_big_picture"})
+AUDIO_KEYS = frozenset({"volume", "mute", "input_device", "output_device"})
+STEAM_BIG_PICTURE_ACTIONS = ("start", "stop", "exit")
+
+
+@dataclass(frozen=True, slots=True)
+class Scene:
+    """
+    A named setup of the computer (monitors, audio, Steam Big Picture) applied at once.
+
+    The settings have the format of the matching services: `monitors` is the monitors_config of
+    change_monitors_config, `audio` takes the fields of change_audio_config and `steam_big_picture` an action.
+    """
+
+    name: str
+    monitors: Optional[Mapping[str, Any]] = None
+    volume: Optional[int] = None
+    mute: Optional[bool] = None
+    input_device: Optional[str] = None
+    output_device: Optional[str] = None
+    steam_big_picture: Optional[str] = None
+
+    @property
+    def has_audio(self) -> bool:
+        return any(value is not None for value in (self.volume, self.mute, self.input_device, self.output_device))
+
+    def actions(self, monitors: Monitors, audio_config: AudioConfig,
+                gnome: bool) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Return the (action id, params) to run, in order, to apply the scene.
+
+        Display names and audio device descriptions are resolved with the current monitors and audio configuration,
+        monitors and audio can only be set on GNOME.
+        """
+        actions = []
+
+        if gnome and self.monitors:
+            actions.append(("set_monitors_config", {"args": format_gnome_monitors_args(self.monitors, monitors)}))
+
+        if gnome and self.has_audio:
+            actions.extend(
+                ("set_audio_config", {"args": command})
+                for command in format_pactl_commands(audio_config, self.volume, self.mute, self.input_device,
+                                                     self.output_device)
+            )
+
+        if self.steam_big_picture is not None:
+            actions.append((f"{self.steam_big_picture}_steam_big_picture", None))
+
+        return actions
+
+
+def parse_scenes(definitions: Optional[Mapping[str, Any]]) -> Dict[str, Scene]:
+    """
+    Parse the scenes of the config entry options ({name: {"monitors": ..., "audio": ..., "steam_big_picture": ...}}).
+
+    :raises ValueError:
+        If a scene is malformed, with the name of the scene in the message.
+    """
+    scenes = {}
+
+    for name, definition in (definitions or {}).items():
+        if not isinstance(definition, Mapping):
+            raise ValueError(f"Scene {name}: expected a mapping")
+        unknown = set(definition) - SCENE_KEYS
+        if unknown:
+            raise ValueError(f"Scene {name}: unknown keys {sorted(unknown)}")
+
+        monitors = definition.get("monitors")
+        if monitors is not None and not (isinstance(monitors, Mapping)
+                                         and all(isinstance(settings, Mapping) for settings in monitors.values())):
+            raise ValueError(f"Scene {name}: monitors must map each monitor to its settings")
+
+        audio = definition.get("audio") or {}
+        if not isinstance(audio, Mapping) or set(audio) - AUDIO_KEYS:
+            raise ValueError(f"Scene {name}: audio only takes {sorted(AUDIO_KEYS)}")
+        volume = audio.get("volume")
+        if volume is not None and (isinstance(volume, bool) or not isinstance(volume, int) or not 0 <= volume <= 100):
+            raise ValueError(f"Scene {name}: volume must be between 0 and 100")
+        if audio.get("mute") is not None and not isinstance(audio["mute"], bool):
+            raise ValueError(f"Scene {name}: mute must be a boolean")
+
+        steam_big_picture = definition.get("steam_big_picture")
+        if steam_big_picture is not None and steam_big_picture not in STEAM_BIG_PICTURE_ACTIONS:
+            raise ValueError(f"Scene {name}: steam_big_picture must be one of {list(STEAM_BIG_PICTURE_ACTIONS)}")
+
+        scenes[str(name)] = Scene(
+            str(name), dict(monitors) if monitors else None, volume, audio.get("mute"),
+            audio.get("input_device"), audio.get("output_device"), steam_big_picture
+        )
+
+    return scenes
@@ -0,0 +1,72 @@
+import shlex
+
+from custom_components.easy_computer_manager.computer.common import CommandOutput
+
+# Command started in the long-lived channel, no pty so nothing is echoed back and no prompt is printed
+SHELL_COMMAND = "sh"
+# First line sent to the shell, keeps a handle on the channel's stdout for the framed commands
+SHELL_SETUP = "exec 3>&1\n"
+
+FRAME_MARKER = "::ecm-shell"
+
+
+def build_shell_command(command: str, token: str) -> str:
+    """
+    Frame a command to be written to the persistent shell.
+
+    The command is evaluated in a subshell (an `exit` or a syntax error cannot kill the shell) with stdin closed (it
+    cannot eat the next framed commands). Its stdout goes straight to the channel, its stderr is captured and printed
+    after a marker carrying the exit code, a final marker closes the frame. Everything comes back on stdout so a
+    single stream has to be read.
+    """
+
+    return (
+        f"__ecm_err=$( ( eval {shlex.quote(command)} ) 2>&1 1>&3 </dev/null ); __ecm_rc=$?; "
+        f"printf '\\n%s\\n' \"{FRAME_MARKER}:{token}:rc:$__ecm_rc\"; "
+        f"[ -n \"$__ecm_err\" ] && printf '%s\\n' \"$__ecm_err\"; "
+        f"printf '%s\\n' '{FRAME_MARKER}:{token}:end'\n"
+    )
+
+
+class ShellFrame:
+    """Incrementally parse the output of a command framed with build_shell_command."""
+
+    def __init__(self, command: str, token: str) -> None:
+        self.command = command
+        self._rc_marker = f"{FRAME_MARKER}:{token}:rc:"
+        self._end_marker = f"{FRAME_MARKER}:{token}:end"
+        self._return_code = None
+        self._output = []
+        self._error = []
+
+    def feed(self, line: str) -> bool:
+        """
+        Feed the next line read from the shell.
+
+        :returns: bool
+            True once the frame is complete.
+
+        :raises EOFError:
+            If the shell exited before the frame was complete.
+        """
+
+        if not line:
+            raise EOFError("Persistent shell exited")
+
+        line = line.rstrip('\n')
+
+        if self._return_code is None:
+            if line.startswith(self._rc_marker):
+                return_code = line[len(self._rc_marker):]
+                self._return_code = int(return_code) if return_code.lstrip('-').isdigit() else 1
+            else:
+                self._output.append(line)
+        elif line == self._end_marker:
+            return True
+        else:
+            self._error.append(line)
+
+        return False
+
+    def result(self) -> CommandOutput:
+        return CommandOutput(self.command, self._return_code, '\n'.join(self._output), '\n'.join(self._error))
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time, concurrent callers asking for the same key share its result.
+
+    The call runs in its own task: a caller being cancelled does not cancel it for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0  # Callers that joined a call already in flight
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+
+        if task is None:
+            task = asyncio.get_running_loop().create_task(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        self._calls.pop(key, None)
+        # Every caller might have been cancelled, do not let the exception be reported as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "in_flight": [str(key) for key in self._calls],
+            "coalesced": self.coalesced,
+        }
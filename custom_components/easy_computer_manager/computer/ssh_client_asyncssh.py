@@ -1,33 +1,80 @@
-from typing import Optional
+import asyncio
+import secrets
+from typing import Optional, Dict, AsyncIterator
 
 import asyncssh
 
 from custom_components.easy_computer_manager import LOGGER
 from custom_components.easy_computer_manager.computer import CommandOutput
+from custom_components.easy_computer_manager.computer.circuit_breaker import CircuitBreaker
+from custom_components.easy_computer_manager.computer.liveness import Liveness
+from custom_components.easy_computer_manager.computer.shell import SHELL_COMMAND, SHELL_SETUP, ShellFrame, \
+    build_shell_command
+from custom_components.easy_computer_manager.const import DEFAULT_LIVENESS_FRESHNESS, SSH_KEEPALIVE_INTERVAL, \
+    SSH_KEEPALIVE_COUNT_MAX, SSH_MAX_CHANNELS, SSH_SHELL_COMMAND_TIMEOUT, \
+    SSH_CONNECT_TIMEOUT, SSH_CIRCUIT_FAILURE_THRESHOLD, SSH_CIRCUIT_BASE_DELAY, SSH_CIRCUIT_MAX_DELAY
 
 
 class SSHClient:
-    def __init__(self, host: str, username: str, password: Optional[str] = None, port: int = 22):
+    def __init__(self, host: str, username: str, password: Optional[str] = None, port: int = 22,
+                 liveness_freshness: float = DEFAULT_LIVENESS_FRESHNESS, max_channels: int = SSH_MAX_CHANNELS):
         self.host = host
         self.username = username
         self._password = password
         self.port = port
         self._connection: Optional[asyncssh.SSHClientConnection] = None
-        self._session: Optional[asyncssh.SSHClientSession] = None
+        self.liveness = Liveness(liveness_freshness)
+        self.circuit_breaker = CircuitBreaker(host, SSH_CIRCUIT_FAILURE_THRESHOLD, SSH_CIRCUIT_BASE_DELAY,
+                                              SSH_CIRCUIT_MAX_DELAY)
+
+        # Concurrent commands run as parallel channels on the same connection, capped to stay under sshd's MaxSessions
+        self._max_channels = max_channels
+        self._channel_slots = asyncio.Semaphore(max_channels)
+        self._open_channels = 0
+        self._connect_lock = asyncio.Lock()
+
+        # Long-lived shell channel used by execute_in_shell(), one framed command at a time (not counted in the cap)
+        self._shell: Optional[asyncssh.SSHClientProcess] = None
+        self._shell_lock = asyncio.Lock()
 
     async def __aenter__(self):
         await self.connect()
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def connected(self) -> bool:
+        """Return whether the SSH connection is open (it might still be stale, see is_connection_alive())."""
+        return self._transport_active()
+
+    async def close(self) -> None:
+        """Close the SSH connection, the client cannot be used afterward."""
         await self.disconnect()
 
-    async def connect(self, retried: bool = False, computer: Optional['Computer'] = None) -> None:
+    @property
+    def channel_stats(self) -> Dict[str, int]:
+        """Return the maximum and current number of open channels."""
+        return {
+            "max_channels": self._max_channels,
+            "open_channels": self._open_channels,
+        }
+
+    async def connect(self, computer: Optional['Computer'] = None) -> None:
         """Open an SSH connection using AsyncSSH."""
-        if self.is_connection_alive():
+        # Concurrent callers wait for the connection in progress instead of opening their own
+        async with self._connect_lock:
+            await self._connect(computer)
+
+    async def _connect(self, computer: Optional['Computer'] = None) -> None:
+        if await self.check_connection_alive():
             LOGGER.debug(f"Connection to {self.host} is already active.")
             return
 
+        # Fail fast while the host is known to be unreachable
+        self.circuit_breaker.before_attempt()
+
         await self.disconnect()  # Ensure any previous connection is closed
 
         try:
@@ -36,44 +83,228 @@ class SSHClient:
                 username=self.username,
                 password=self._password,
                 port=self.port,
-                known_hosts=None  # Automatically accept unknown host keys
+                known_hosts=None,  # Automatically accept unknown host keys
+                # Connection is closed if keepalives stay unanswered, see check_connection_alive()
+                keepalive_interval=SSH_KEEPALIVE_INTERVAL,
+                keepalive_count_max=SSH_KEEPALIVE_COUNT_MAX,
+                connect_timeout=SSH_CONNECT_TIMEOUT
             )
-            self._session = await self._connection.create_session(asyncssh.SSHClientSession)
+            self.liveness.mark_alive()
+            self.circuit_breaker.record_success()
             LOGGER.debug(f"Connected to {self.host}")
+
         except (OSError, asyncssh.Error) as exc:
+            # No immediate retry, the circuit breaker decides when the host is tried again
             LOGGER.debug(f"Failed to connect to {self.host}: {exc}")
-            if not retried:
-                LOGGER.debug(f"Retrying connection to {self.host}...")
-                await self.connect(retried=True)  # Retry only once
+            self.circuit_breaker.record_failure()
+
+        except asyncio.CancelledError:
+            self.circuit_breaker.record_failure()
+            raise
+
         finally:
             if computer is not None and hasattr(computer, "initialized"):
                 computer.initialized = True
 
     async def disconnect(self) -> None:
         """Close the SSH connection."""
-        if self._session:
-            self._session.close()
-            await self._session.wait_closed()
+        self._close_shell()
         if self._connection:
             self._connection.close()
             await self._connection.wait_closed()
             LOGGER.debug(f"Disconnected from {self.host}")
         self._connection = None
-        self._session = None
+        self.liveness.mark_dead()
+
+    async def execute_command(self, command: str, timeout: Optional[float] = None) -> CommandOutput:
+        """
+        Execute a command on the SSH server asynchronously, in its own channel of the shared connection.
+
+        :param timeout:
+            Seconds after which the channel is closed and a timed out result returned, waiting for a channel slot
+            included.
+        """
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + timeout if timeout is not None else None
 
-    async def execute_command(self, command: str) -> CommandOutput:
-        """Execute a command on the SSH server asynchronously using a persistent session."""
-        if not self.is_connection_alive():
+        # No need to probe the remote host, running the command is a probe in itself
+        if not self._transport_active():
             LOGGER.debug(f"Connection to {self.host} is not alive. Reconnecting...")
             await self.connect()
 
+        if self._connection is None:
+            return CommandOutput.disconnected(command, f"Not connected to {self.host}")
+
         try:
-            result = await self._connection.run(command, check=False)
+            result = await self._run(command, expires_at)
+            if result.exit_status is None:
+                raise asyncssh.ConnectionLost("Channel closed without an exit status")
+            self.liveness.mark_alive()
             return CommandOutput(command, result.exit_status, result.stdout, result.stderr)
-        except (asyncssh.ProcessError, asyncssh.Error) as exc:
+        except asyncssh.TimeoutError as exc:
+            LOGGER.warning(f"Command timed out on {self.host} after {timeout}s: {command}")
+            return CommandOutput.timeout(command, exc.stdout or "", exc.stderr or "")
+        except (asyncssh.Error, OSError) as exc:
+            # e.g. the connection was dropped or closed by a concurrent reconnection, the next command reconnects
             LOGGER.error(f"Failed to execute command on {self.host}: {exc}")
-            return CommandOutput(command, -1, "", "")
+            self.liveness.mark_dead()
+            return CommandOutput.disconnected(command, str(exc))
+
+    async def _run(self, command: str, expires_at: Optional[float] = None) -> asyncssh.SSHCompletedProcess:
+        """
+        Run a command in a new channel once a channel slot is available.
+
+        :param expires_at:
+            Event loop time at which the channel is closed.
+        :raises asyncssh.TimeoutError:
+            If the command (or waiting for a slot, or opening its channel) did not complete in time.
+        :raises ConnectionError:
+            If there is no connection, or it was closed while waiting for a slot.
+        """
+        loop = asyncio.get_running_loop()
+
+        # A concurrent reconnection may replace (or drop) the connection, stick to the one checked here
+        connection = self._connection
+        if connection is None:
+            raise ConnectionError(f"Not connected to {self.host}")
+
+        try:
+            # Opening the channel is bounded too, a frozen host never answers the request
+            async with asyncio.timeout_at(expires_at):
+                await self._channel_slots.acquire()
+                self._open_channels += 1
+                process = None
+                try:
+                    if connection.is_closed():
+                        raise ConnectionError(f"Connection to {self.host} closed")
+
+                    process = await connection.create_process(command)
+                    return await process.wait(False, None if expires_at is None else max(0.0, expires_at - loop.time()))
+                finally:
+                    # On expiry (or cancellation) the channel is closed, the remote command gets no more input/output
+                    if process is not None:
+                        process.close()
+                    self._open_channels -= 1
+                    self._channel_slots.release()
+        except asyncssh.TimeoutError:
+            raise  # Expired in process.wait(), with the partial output
+        except TimeoutError:
+            raise asyncssh.TimeoutError(None, command, None, None, None, None, "", "") from None
+
+    async def stream_lines(self, command: str) -> AsyncIterator[str]:
+        """
+        Run a long-lived command in its own channel and yield its output line by line until it exits.
+
+        The channel stays open as long as the stream is consumed and is not counted in the cap.
+
+        :raises ConnectionError:
+            If the host cannot be reached or the channel fails.
+        """
+        if not self._transport_active():
+            LOGGER.debug(f"Connection to {self.host} is not alive. Reconnecting...")
+            await self.connect()
+
+        if self._connection is None:
+            raise ConnectionError(f"Not connected to {self.host}")
+
+        process = None
+        try:
+            async with asyncio.timeout(SSH_CONNECT_TIMEOUT):
+                process = await self._connection.create_process(command, encoding="utf-8", stderr=asyncssh.DEVNULL)
+            async for line in process.stdout:
+                self.liveness.mark_alive()
+                yield line.rstrip("\n")
+        except (asyncssh.Error, OSError) as exc:
+            raise ConnectionError(f"Stream from {self.host} failed: {exc}") from exc
+        finally:
+            if process is not None:
+                process.close()
+
+    async def execute_in_shell(self, command: str, timeout: Optional[float] = None) -> CommandOutput:
+        """
+        Execute a command in the persistent shell of this host (POSIX hosts only).
+
+        This saves opening a channel and starting a new shell on the remote host for every command. The shell is
+        (re)started when needed, and the command falls back to execute_command() if the shell keeps failing. A command
+        that does not complete within `timeout` (SSH_SHELL_COMMAND_TIMEOUT at most) kills the shell.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = min(timeout, SSH_SHELL_COMMAND_TIMEOUT) if timeout is not None else SSH_SHELL_COMMAND_TIMEOUT
+        expires_at = loop.time() + timeout
+
+        if not self._transport_active():
+            LOGGER.debug(f"Connection to {self.host} is not alive. Reconnecting...")
+            await self.connect()
+
+        async with self._shell_lock:
+            # A concurrent reconnection may replace (or drop) the connection, stick to the one checked here
+            connection = self._connection
+            if connection is None:
+                return CommandOutput.disconnected(command, f"Not connected to {self.host}")
+
+            for _ in range(2):  # A shell that died since the last command is restarted once
+                try:
+                    async with asyncio.timeout_at(expires_at):
+                        shell = self._shell
+                        if shell is None:
+                            shell = self._shell = await connection.create_process(SHELL_COMMAND, encoding="utf-8")
+                            shell.stdin.write(SHELL_SETUP)
+
+                        result = await self._shell_execute(shell, command)
+                    self.liveness.mark_alive()
+                    return result
+
+                except TimeoutError:
+                    LOGGER.warning(f"Command timed out in the persistent shell of {self.host}: {command}")
+                    self._close_shell()
+                    return CommandOutput.timeout(command)
+
+                except (asyncssh.Error, EOFError, OSError) as exc:
+                    LOGGER.debug(f"Persistent shell of {self.host} failed, restarting it: {exc}")
+                    self._close_shell()
+
+        return await self.execute_command(command, max(0.0, expires_at - loop.time()))
+
+    @staticmethod
+    async def _shell_execute(shell: asyncssh.SSHClientProcess, command: str) -> CommandOutput:
+        """Write a framed command to the persistent shell and read its output back."""
+        token = secrets.token_hex(8)
+        shell.stdin.write(build_shell_command(command, token))
+
+        frame = ShellFrame(command, token)
+        while not frame.feed(await shell.stdout.readline()):
+            pass
+
+        return frame.result()
+
+    def _close_shell(self) -> None:
+        if self._shell is not None:
+            self._shell.close()
+        self._shell = None
 
     def is_connection_alive(self) -> bool:
-        """Check if the SSH connection is still alive."""
+        """
+        Check if the SSH connection is still alive.
+
+        This only looks at the cached state (connection not closed and remote host answered recently), it never
+        sends anything over the network. Use check_connection_alive() to actively probe a stale connection.
+        """
+        return self._transport_active() and self.liveness.is_fresh()
+
+    async def check_connection_alive(self) -> bool:
+        """
+        Check if the SSH connection is still alive, without opening a channel or sending anything.
+
+        The connection sends a keepalive global request on its own whenever it has been idle for the keepalive
+        interval, and closes itself once SSH_KEEPALIVE_COUNT_MAX of them in a row stayed unanswered (see connect()).
+        A connection that is still open has therefore heard from the remote host recently enough.
+        """
+        if not self._transport_active():
+            self.liveness.mark_dead()
+            return False
+
+        self.liveness.mark_alive()
+        return True
+
+    def _transport_active(self) -> bool:
         return self._connection is not None and not self._connection.is_closed()
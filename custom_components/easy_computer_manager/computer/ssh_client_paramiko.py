@@ -1,36 +1,173 @@
 import asyncio
-from typing import Optional
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, Any, Dict, List, Tuple, AsyncIterator
 
 import paramiko
 
 from custom_components.easy_computer_manager import LOGGER
 from custom_components.easy_computer_manager.computer import CommandOutput
+from custom_components.easy_computer_manager.computer.circuit_breaker import CircuitBreaker
+from custom_components.easy_computer_manager.computer.liveness import Liveness
+from custom_components.easy_computer_manager.computer.shell import SHELL_COMMAND, SHELL_SETUP, ShellFrame, \
+    build_shell_command
+from custom_components.easy_computer_manager.const import DEFAULT_LIVENESS_FRESHNESS, SSH_KEEPALIVE_INTERVAL, \
+    SSH_PROBE_TIMEOUT, SSH_EXECUTOR_MAX_WORKERS, SSH_SHELL_COMMAND_TIMEOUT, \
+    SSH_CONNECT_TIMEOUT, SSH_CIRCUIT_FAILURE_THRESHOLD, SSH_CIRCUIT_BASE_DELAY, SSH_CIRCUIT_MAX_DELAY
+
+
+class ChannelExpiry:
+    """
+    Close the channels of a blocking call once its deadline expired, which makes the call return early.
+
+    The blocking call registers its channels with watch(), expire() is called from the event loop. Either of them sees
+    what the other did: a channel watched after the expiry is closed right away.
+    """
+
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        self.expired = threading.Event()
+        self._expires_at = time.monotonic() + timeout if timeout is not None else None
+        self._channels: List[paramiko.Channel] = []
+
+    def remaining(self) -> Optional[float]:
+        """Return the seconds left before the expiry (None without a timeout), to bound the waits a close cannot end."""
+        return max(0.0, self._expires_at - time.monotonic()) if self._expires_at is not None else None
+
+    def watch(self, channel: paramiko.Channel) -> None:
+        self._channels.append(channel)
+        if self.expired.is_set():
+            channel.close()
+
+    def check(self) -> None:
+        """:raises TimeoutError: If expired, e.g. before a queued job sends anything."""
+        if self.expired.is_set():
+            raise TimeoutError
+
+    def expire(self) -> None:
+        self.expired.set()
+        for channel in list(self._channels):
+            channel.close()
 
 
 class SSHClient:
-    def __init__(self, host: str, username: str, password: Optional[str] = None, port: int = 22):
+    def __init__(self, host: str, username: str, password: Optional[str] = None, port: int = 22,
+                 liveness_freshness: float = DEFAULT_LIVENESS_FRESHNESS,
+                 max_workers: int = SSH_EXECUTOR_MAX_WORKERS):
         self.host = host
         self.username = username
         self._password = password
         self.port = port
         self._connection: Optional[paramiko.SSHClient] = None
+        self.liveness = Liveness(liveness_freshness)
+        self.circuit_breaker = CircuitBreaker(host, SSH_CIRCUIT_FAILURE_THRESHOLD, SSH_CIRCUIT_BASE_DELAY,
+                                              SSH_CIRCUIT_MAX_DELAY)
+
+        # Long-lived shell channel used by execute_in_shell(), one framed command at a time
+        self._shell: Optional[Tuple[paramiko.Channel, paramiko.ChannelFile]] = None
+        self._shell_lock = asyncio.Lock()
+        self._connect_lock = asyncio.Lock()
+
+        # Every blocking paramiko call runs in this host's own pool, a slow host cannot starve HA's default executor
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"ecm-ssh-{host}")
+        self._executor_lock = threading.Lock()
+        self._queued_jobs = 0
+        self._running_jobs = 0
 
     async def __aenter__(self):
         await self.connect()
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
-        self.disconnect()
+        await self.close()
+
+    @property
+    def connected(self) -> bool:
+        """Return whether the SSH transport is open (it might still be stale, see is_connection_alive())."""
+        return self._transport_active()
+
+    async def close(self) -> None:
+        """Close the SSH connection and release the worker threads, the client cannot be used afterward."""
+        await self.disconnect()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def executor_stats(self) -> Dict[str, int]:
+        """Return the size of the worker pool and how many jobs are running/waiting for a worker."""
+        with self._executor_lock:
+            return {
+                "pool_size": self._max_workers,
+                "running": self._running_jobs,
+                "queued": self._queued_jobs,
+            }
+
+    async def _run_blocking(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking paramiko call in the worker pool of this host."""
+
+        def job() -> Any:
+            with self._executor_lock:
+                self._queued_jobs -= 1
+                self._running_jobs += 1
+            try:
+                return func(*args)
+            finally:
+                with self._executor_lock:
+                    self._running_jobs -= 1
+
+        with self._executor_lock:
+            self._queued_jobs += 1
+
+        def on_done(done_future) -> None:
+            if done_future.cancelled():  # Cancelled before a worker picked it up, job() never ran
+                with self._executor_lock:
+                    self._queued_jobs -= 1
+
+        future = self._executor.submit(job)
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    async def _run_blocking_until(self, timeout: Optional[float], func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking paramiko call taking a ChannelExpiry as last argument, closing its channels after `timeout`.
+
+        The caller stops waiting after `timeout` even if the call is stuck before having a channel to close (e.g. while
+        opening it on a frozen host, which the call bounds with ChannelExpiry.remaining()). The channels are also closed
+        when the caller is cancelled, the worker is not held by an abandoned call.
+
+        :raises TimeoutError:
+            If the timeout expired.
+        """
+        expiry = ChannelExpiry(timeout)
 
-    async def connect(self, retried: bool = False, computer: Optional['Computer'] = None) -> None:
+        try:
+            async with asyncio.timeout(timeout):
+                return await self._run_blocking(func, *args, expiry)
+        except (asyncio.CancelledError, TimeoutError):
+            expiry.expire()
+            raise
+        except (paramiko.SSHException, EOFError, OSError):
+            if expiry.expired.is_set():
+                raise TimeoutError from None  # Failed because its channel was closed
+            raise
+
+    async def connect(self, computer: Optional['Computer'] = None) -> None:
         """Open an SSH connection using Paramiko asynchronously."""
-        if self.is_connection_alive():
+        # Concurrent callers wait for the connection in progress instead of opening their own
+        async with self._connect_lock:
+            await self._connect(computer)
+
+    async def _connect(self, computer: Optional['Computer'] = None) -> None:
+        if await self.check_connection_alive():
             LOGGER.debug(f"Connection to {self.host} is already active.")
             return
 
-        self.disconnect()  # Ensure any previous connection is closed
+        # Fail fast while the host is known to be unreachable
+        self.circuit_breaker.before_attempt()
+
+        await self.disconnect()  # Ensure any previous connection is closed
 
-        loop = asyncio.get_running_loop()
         client = paramiko.SSHClient()
 
         # Set missing host key policy to automatically accept unknown host keys
@@ -38,26 +175,35 @@ class SSHClient:
 
         try:
             # Offload the blocking connect call to a thread
-            await loop.run_in_executor(None, self._blocking_connect, client)
+            await self._run_blocking(self._blocking_connect, client)
             self._connection = client
+            self.liveness.mark_alive()
+            self.circuit_breaker.record_success()
             LOGGER.debug(f"Connected to {self.host}")
 
         except (OSError, paramiko.SSHException) as exc:
+            # No immediate retry, the circuit breaker decides when the host is tried again
             LOGGER.debug(f"Failed to connect to {self.host}: {exc}")
-            if not retried:
-                LOGGER.debug(f"Retrying connection to {self.host}...")
-                await self.connect(retried=True)  # Retry only once
+            client.close()  # Might have got as far as opening the transport
+            self.circuit_breaker.record_failure()
+
+        except asyncio.CancelledError:
+            client.close()
+            self.circuit_breaker.record_failure()
+            raise
 
         finally:
             if computer is not None and hasattr(computer, "initialized"):
                 computer.initialized = True
 
-    def disconnect(self) -> None:
+    async def disconnect(self) -> None:
         """Close the SSH connection."""
+        self._close_shell()
         if self._connection:
             self._connection.close()
             LOGGER.debug(f"Disconnected from {self.host}")
         self._connection = None
+        self.liveness.mark_dead()
 
     def _blocking_connect(self, client: paramiko.SSHClient):
         """Perform the blocking SSH connection using Paramiko."""
@@ -67,38 +213,255 @@ class SSHClient:
             password=self._password,
             port=self.port,
             look_for_keys=False,  # Set this to True if using private keys
-            allow_agent=False
+            allow_agent=False,
+            timeout=SSH_CONNECT_TIMEOUT,
+            banner_timeout=SSH_CONNECT_TIMEOUT,
+            auth_timeout=SSH_CONNECT_TIMEOUT
         )
 
-    async def execute_command(self, command: str) -> CommandOutput:
-        """Execute a command on the SSH server asynchronously."""
-        if not self.is_connection_alive():
+        # Let the transport detect a dead peer on its own instead of probing it on every check
+        client.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
+
+    @staticmethod
+    def _open_session(connection: paramiko.SSHClient, expiry: ChannelExpiry) -> paramiko.Channel:
+        """
+        Open a channel on the transport of a connection, giving up when `expiry` does (paramiko would wait an hour).
+
+        :raises paramiko.SSHException:
+            If the connection was closed meanwhile (e.g. by a concurrent reconnection), or the channel was not opened in
+            time.
+        """
+        expiry.check()
+        transport = connection.get_transport()
+        if transport is None or not transport.is_active():
+            raise paramiko.SSHException("Connection closed")
+        channel = transport.open_session(timeout=expiry.remaining())
+        expiry.watch(channel)
+        return channel
+
+    @staticmethod
+    def _blocking_execute(connection: paramiko.SSHClient, command: str,
+                          expiry: ChannelExpiry) -> tuple[int, str, str]:
+        """Run a command and wait for it to complete using Paramiko."""
+        channel = SSHClient._open_session(connection, expiry)
+        channel.exec_command(command)
+        channel.shutdown_write()  # No input, like closing stdin
+
+        # Drain the output before waiting for the exit status, a full channel window would block the remote command
+        output = channel.makefile('r').read().decode()
+        error = channel.makefile_stderr('r').read().decode()
+        exit_status = channel.recv_exit_status()
+        if exit_status == -1:
+            raise EOFError("Channel closed without an exit status")
+        return exit_status, output, error
+
+    async def execute_command(self, command: str, timeout: Optional[float] = None) -> CommandOutput:
+        """
+        Execute a command on the SSH server asynchronously.
+
+        :param timeout:
+            Seconds after which the channel is closed and a timed out result returned, waiting for a worker included.
+        """
+        # No need to probe the remote host, running the command is a probe in itself
+        if not self._transport_active():
             LOGGER.debug(f"Connection to {self.host} is not alive. Reconnecting...")
             await self.connect()
 
+        # A concurrent reconnection may replace (or drop) the connection, stick to the one checked here
+        connection = self._connection
+        if connection is None:
+            return CommandOutput.disconnected(command, f"Not connected to {self.host}")
+
         try:
-            # Offload command execution to avoid blocking
-            loop = asyncio.get_running_loop()
-            stdin, stdout, stderr = await loop.run_in_executor(None, self._connection.exec_command, command)
+            # The whole command lifecycle blocks (channel open, output drain, exit status), keep it off the loop
+            exit_status, stdout, stderr = await self._run_blocking_until(
+                timeout, self._blocking_execute, connection, command
+            )
+            self.liveness.mark_alive()
+            return CommandOutput(command, exit_status, stdout, stderr)
 
-            exit_status = stdout.channel.recv_exit_status()
-            return CommandOutput(command, exit_status, stdout.read().decode(), stderr.read().decode())
+        except TimeoutError:
+            LOGGER.warning(f"Command timed out on {self.host} after {timeout}s: {command}")
+            return CommandOutput.timeout(command)
 
-        except (paramiko.SSHException, EOFError) as exc:
+        except (paramiko.SSHException, EOFError, OSError) as exc:
+            # e.g. the connection was reset by the peer, the next command reconnects
             LOGGER.error(f"Failed to execute command on {self.host}: {exc}")
-            return CommandOutput(command, -1, "", "")
+            self.liveness.mark_dead()
+            return CommandOutput.disconnected(command, str(exc))
+
+    async def stream_lines(self, command: str) -> AsyncIterator[str]:
+        """
+        Run a long-lived command in its own channel and yield its output line by line until it exits.
+
+        The channel is read by a dedicated thread rather than the worker pool, a stream would hold a worker forever.
+
+        :raises ConnectionError:
+            If the host cannot be reached or the channel fails.
+        """
+        if not self._transport_active():
+            LOGGER.debug(f"Connection to {self.host} is not alive. Reconnecting...")
+            await self.connect()
 
-    def is_connection_alive(self) -> bool:
-        """Check if the SSH connection is still alive."""
         if self._connection is None:
-            return False
+            raise ConnectionError(f"Not connected to {self.host}")
 
         try:
-            transport = self._connection.get_transport()
-            transport.send_ignore()
+            channel = await self._run_blocking_until(SSH_CONNECT_TIMEOUT, self._blocking_open_stream, self._connection,
+                                                     command)
+        except (paramiko.SSHException, OSError) as exc:
+            raise ConnectionError(f"Stream from {self.host} failed: {exc}") from exc
 
-            self._connection.exec_command('ls', timeout=1)
+        loop = asyncio.get_running_loop()
+        lines: asyncio.Queue = asyncio.Queue()
+
+        def reader() -> None:
+            try:
+                for line in channel.makefile('r'):
+                    loop.call_soon_threadsafe(lines.put_nowait, line)
+            except (paramiko.SSHException, OSError, EOFError) as exc:
+                LOGGER.debug(f"Stream from {self.host} interrupted: {exc}")
+            finally:
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(lines.put_nowait, None)
+
+        threading.Thread(target=reader, name=f"ecm-stream-{self.host}", daemon=True).start()
+
+        try:
+            while (line := await lines.get()) is not None:
+                self.liveness.mark_alive()
+                yield line.rstrip("\n")
+        finally:
+            channel.close()  # Also ends the reader thread
+
+    @staticmethod
+    def _blocking_open_stream(connection: paramiko.SSHClient, command: str, expiry: ChannelExpiry) -> paramiko.Channel:
+        """Open a channel running a long-lived command using Paramiko."""
+        channel = SSHClient._open_session(connection, expiry)
+        channel.exec_command(command)
+        return channel
+
+    async def execute_in_shell(self, command: str, timeout: Optional[float] = None) -> CommandOutput:
+        """
+        Execute a command in the persistent shell of this host (POSIX hosts only).
+
+        This saves opening a channel and starting a new shell on the remote host for every command. The shell is
+        (re)started when needed, and the command falls back to execute_command() if the shell keeps failing. A command
+        that does not complete within `timeout` (SSH_SHELL_COMMAND_TIMEOUT at most) kills the shell.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = min(timeout, SSH_SHELL_COMMAND_TIMEOUT) if timeout is not None else SSH_SHELL_COMMAND_TIMEOUT
+        expires_at = loop.time() + timeout
+
+        if not self._transport_active():
+            LOGGER.debug(f"Connection to {self.host} is not alive. Reconnecting...")
+            await self.connect()
+
+        async with self._shell_lock:
+            # A concurrent reconnection may replace (or drop) the connection, stick to the one checked here
+            connection = self._connection
+            if connection is None:
+                return CommandOutput.disconnected(command, f"Not connected to {self.host}")
+
+            for _ in range(2):  # A shell that died since the last command is restarted once
+                try:
+                    shell = self._shell
+                    if shell is None:
+                        shell = self._shell = await self._run_blocking_until(max(0.0, expires_at - loop.time()),
+                                                                             self._blocking_open_shell, connection)
+
+                    result = await self._run_blocking_until(max(0.0, expires_at - loop.time()),
+                                                            self._blocking_shell_execute, shell, command)
+                    self.liveness.mark_alive()
+                    return result
+
+                except TimeoutError:
+                    LOGGER.warning(f"Command timed out in the persistent shell of {self.host}: {command}")
+                    self._close_shell()
+                    return CommandOutput.timeout(command)
+
+                except (paramiko.SSHException, EOFError, OSError) as exc:
+                    LOGGER.debug(f"Persistent shell of {self.host} failed, restarting it: {exc}")
+                    self._close_shell()
+
+        return await self.execute_command(command, max(0.0, expires_at - loop.time()))
+
+    @staticmethod
+    def _blocking_open_shell(connection: paramiko.SSHClient,
+                             expiry: ChannelExpiry) -> Tuple[paramiko.Channel, paramiko.ChannelFile]:
+        """Open the persistent shell channel using Paramiko."""
+        channel = SSHClient._open_session(connection, expiry)
+        channel.settimeout(SSH_SHELL_COMMAND_TIMEOUT)
+        channel.exec_command(SHELL_COMMAND)
+        channel.sendall(SHELL_SETUP.encode())
+        return channel, channel.makefile('r')
+
+    @staticmethod
+    def _blocking_shell_execute(shell: Tuple[paramiko.Channel, paramiko.ChannelFile], command: str,
+                                expiry: ChannelExpiry) -> CommandOutput:
+        """Write a framed command to the persistent shell and read its output back using Paramiko."""
+        channel, stdout = shell
+        expiry.check()
+        expiry.watch(channel)
+        token = secrets.token_hex(8)
+        channel.sendall(build_shell_command(command, token).encode())
+
+        frame = ShellFrame(command, token)
+        while not frame.feed(stdout.readline()):
+            pass
+
+        return frame.result()
+
+    def _close_shell(self) -> None:
+        if self._shell is not None:
+            self._shell[0].close()
+        self._shell = None
+
+    def is_connection_alive(self) -> bool:
+        """
+        Check if the SSH connection is still alive.
+
+        This only looks at the cached state (transport still active and remote host answered recently), it never
+        sends anything over the network. Use check_connection_alive() to actively probe a stale connection.
+        """
+        return self._transport_active() and self.liveness.is_fresh()
+
+    async def check_connection_alive(self) -> bool:
+        """Check if the SSH connection is still alive, probing the remote host only if the cached state is stale."""
+        if not self._transport_active():
+            return False
+
+        if self.liveness.is_fresh():
             return True
 
-        except Exception as e:
+        transport = self._connection.get_transport()
+
+        try:
+            # A global request is answered by sshd without opening a channel or spawning a process
+            await asyncio.wait_for(
+                self._run_blocking(transport.global_request, "keepalive@openssh.com", None, True),
+                SSH_PROBE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            LOGGER.debug(f"Liveness probe to {self.host} timed out")
+            await self.disconnect()  # Closing the transport also releases the thread waiting for the answer
+            return False
+        except (paramiko.SSHException, EOFError, OSError) as exc:
+            LOGGER.debug(f"Liveness probe to {self.host} failed: {exc}")
+            self.liveness.mark_dead()
+            return False
+
+        # The request is denied by most servers, any answer while the transport is still up proves liveness
+        if not transport.is_active():
+            self.liveness.mark_dead()
             return False
+
+        self.liveness.mark_alive()
+        return True
+
+    def _transport_active(self) -> bool:
+        if self._connection is None:
+            return False
+
+        transport = self._connection.get_transport()
+        return transport is not None and transport.is_active()
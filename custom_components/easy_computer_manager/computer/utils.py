@@ -14,17 +14,26 @@ async def format_debug_information(computer: 'Computer'):  # importing Computer
             'port': computer.port,
             'dualboot': computer.dualboot,
             'is_on': await computer.is_on(),
-            'is_connected': computer._connection.is_connection_alive()
+            'presence_probe': computer.presence.method,
+            'latency': computer.latency,
+            'is_connected': computer._connection.is_connection_alive(),
+            'ssh_backend': computer.ssh_backend,
+            'executor': getattr(computer._connection, 'executor_stats', None),
+            'channels': getattr(computer._connection, 'channel_stats', None),
+            'circuit_breaker': computer._connection.circuit_breaker.as_dict(),
+            'single_flight': computer._single_flight.as_dict(),
+            'command_memory': computer.command_memory.as_dict(),
+            'read_cache': computer.read_cache.as_dict()
         },
         'grub': {
             'windows_entry': computer.windows_entry_grub
         },
         'audio': {
-            'speakers': computer.audio_config.get('speakers'),
-            'microphones': computer.audio_config.get('microphones')
+            'speakers': computer.audio_config.speakers.as_list(),
+            'microphones': computer.audio_config.microphones.as_list()
         },
-        'monitors': computer.monitors_config,
-        'bluetooth_devices': computer.bluetooth_devices
+        'monitors': computer.monitors_config.as_list(),
+        'bluetooth_devices': computer.bluetooth_devices.as_list()
     }
 
     return data
@@ -37,4 +46,4 @@ def get_bluetooth_devices_as_str(computer: 'Computer') -> str:
     if not devices:
         return ""
 
-    return "; ".join([f"{device['name']} ({device['address']})" for device in devices])
+    return "; ".join([f"{device.name} ({device.address})" for device in devices])
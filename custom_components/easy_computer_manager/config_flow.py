@@ -6,10 +6,15 @@ from typing import Any
 
 import voluptuous as vol
 from homeassistant import config_entries, exceptions
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.selector import ObjectSelector
 
-from .computer import Computer
-from .const import DOMAIN
+from .const import DOMAIN, CONF_SSH_BACKEND, DEFAULT_SSH_BACKEND, SSH_BACKENDS, CONF_PERSISTENT_SHELL, \
+    DEFAULT_PERSISTENT_SHELL, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL, CONF_STATIC_REFRESH_INTERVAL, \
+    DEFAULT_STATIC_REFRESH_INTERVAL, CONF_MEDIUM_REFRESH_INTERVAL, DEFAULT_MEDIUM_REFRESH_INTERVAL, CONF_EVENT_STREAM, \
+    DEFAULT_EVENT_STREAM, CONF_PRESENCE_PROBE, DEFAULT_PRESENCE_PROBE, PRESENCE_PROBES, \
+    CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL, CONF_SCENES, CONF_LIVENESS_FRESHNESS, \
+    DEFAULT_LIVENESS_FRESHNESS
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,6 +27,7 @@ DATA_SCHEMA = vol.Schema(
         vol.Required("username"): str,
         vol.Required("password"): str,
         vol.Optional("port", default=22): int,
+        vol.Optional(CONF_SSH_BACKEND, default=DEFAULT_SSH_BACKEND): vol.In(SSH_BACKENDS),
     }
 )
 
@@ -39,8 +45,6 @@ class Hub:
         self._name = host
         self._id = host.lower()
 
-        self.computer = Computer(host, "", username, password, port)
-
     @property
     def hub_id(self) -> str:
         """ID for dummy."""
@@ -93,6 +97,67 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         return self.async_show_form(step_id="user", data_schema=DATA_SCHEMA, errors=errors)
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> OptionsFlow:
+        return OptionsFlow(config_entry)
+
+
+class OptionsFlow(config_entries.OptionsFlow):
+    """Handle the options of an existing computer"""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        self._entry = config_entry
+
+    def _get_option(self, key: str, default: Any) -> Any:
+        """Return the current value of an option, falling back to what was set when the entry was created."""
+        return self._entry.options.get(key, self._entry.data.get(key, default))
+
+    async def async_step_init(self, user_input=None):
+        errors = {}
+        if user_input is not None:
+            # Imported here, the computer package imports LOGGER from the integration
+            from .computer.scenes import parse_scenes
+
+            try:
+                parse_scenes(user_input.get(CONF_SCENES))
+            except ValueError as exc:
+                _LOGGER.warning("Invalid scenes: %s", exc)
+                errors[CONF_SCENES] = "invalid_scenes"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options_schema = vol.Schema(
+            {
+                vol.Required(CONF_SSH_BACKEND, default=self._get_option(CONF_SSH_BACKEND, DEFAULT_SSH_BACKEND)):
+                    vol.In(SSH_BACKENDS),
+                vol.Required(CONF_PERSISTENT_SHELL,
+                             default=self._get_option(CONF_PERSISTENT_SHELL, DEFAULT_PERSISTENT_SHELL)): bool,
+                vol.Required(CONF_LIVENESS_FRESHNESS,
+                             default=self._get_option(CONF_LIVENESS_FRESHNESS, DEFAULT_LIVENESS_FRESHNESS)):
+                    vol.All(int, vol.Range(min=0)),
+                vol.Required(CONF_PRESENCE_PROBE,
+                             default=self._get_option(CONF_PRESENCE_PROBE, DEFAULT_PRESENCE_PROBE)):
+                    vol.In(PRESENCE_PROBES),
+                vol.Required(CONF_SCAN_INTERVAL, default=self._get_option(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)):
+                    vol.All(int, vol.Range(min=5)),
+                vol.Required(CONF_FAST_SCAN_INTERVAL,
+                             default=self._get_option(CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL)):
+                    vol.All(int, vol.Range(min=1)),
+                vol.Required(CONF_MEDIUM_REFRESH_INTERVAL,
+                             default=self._get_option(CONF_MEDIUM_REFRESH_INTERVAL, DEFAULT_MEDIUM_REFRESH_INTERVAL)):
+                    vol.All(int, vol.Range(min=0)),
+                vol.Required(CONF_STATIC_REFRESH_INTERVAL,
+                             default=self._get_option(CONF_STATIC_REFRESH_INTERVAL, DEFAULT_STATIC_REFRESH_INTERVAL)):
+                    vol.All(int, vol.Range(min=0)),
+                vol.Required(CONF_EVENT_STREAM, default=self._get_option(CONF_EVENT_STREAM, DEFAULT_EVENT_STREAM)):
+                    bool,
+                vol.Optional(CONF_SCENES, default=self._get_option(CONF_SCENES, {})): ObjectSelector(),
+            }
+        )
+
+        return self.async_show_form(step_id="init", data_schema=options_schema, errors=errors)
+
 
 class CannotConnect(exceptions.HomeAssistantError):
     """Error to indicate we cannot connect."""
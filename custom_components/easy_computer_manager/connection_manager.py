@@ -0,0 +1,143 @@
+"""Shared SSH connections for the Easy Computer Manager integration."""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .computer import SSH_CLIENTS
+from .const import (
+    DEFAULT_LIVENESS_FRESHNESS, DEFAULT_SSH_BACKEND, SSH_IDLE_SWEEP_INTERVAL, SSH_IDLE_TIMEOUT, SSH_MAX_CONNECTIONS
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# (host, port, username, password, SSH backend)
+ConnectionKey = Tuple[str, int, str, str, str]
+
+
+class ConnectionLimitError(ConnectionError):
+    """Raised by ConnectionManager.acquire() when a new client is needed but every client allowed is in use."""
+
+
+@dataclass
+class SharedConnection:
+    """An SSH client and the number of computers using it."""
+
+    client: object
+    references: int = 0
+    released_at: Optional[float] = None
+
+
+class ConnectionManager:
+    """
+    Hand out SSH clients shared by every computer using the same host, port, credentials and SSH backend.
+
+    A computer whose backend (or password) changed gets a client of its own, the one it used before is released.
+
+    Clients are reference counted, a client nobody uses anymore is kept for the idle timeout (an entry reload reuses
+    the warm connection) and closed afterward. The number of clients (each holding at most one connection) is capped
+    when a new one is created: the clients nobody uses are closed first, least recently released first. A client in use
+    is never closed, however quiet its connection (e.g. only carrying an event stream), the new client is refused
+    instead.
+    """
+
+    def __init__(self, hass: HomeAssistant, max_connections: int = SSH_MAX_CONNECTIONS,
+                 idle_timeout: float = SSH_IDLE_TIMEOUT) -> None:
+        self._hass = hass
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self._connections: Dict[ConnectionKey, SharedConnection] = {}
+
+        self._unsub_sweep = async_track_time_interval(
+            hass, self._async_sweep, timedelta(seconds=SSH_IDLE_SWEEP_INTERVAL)
+        )
+
+    @callback
+    def acquire(self, host: str, username: str, password: str, port: int = 22,
+                ssh_backend: str = DEFAULT_SSH_BACKEND,
+                liveness_freshness: float = DEFAULT_LIVENESS_FRESHNESS):
+        """
+        Return the shared SSH client of a host, creating it if needed. Must be released with release().
+
+        The client is shared whatever the `liveness_freshness` of each computer, the one acquiring it last sets it (e.g.
+        an entry reloaded after its options changed).
+
+        :raises ConnectionLimitError:
+            If a new client is needed while `max_connections` clients are in use.
+        """
+        key = (host, port, username, password, ssh_backend)
+
+        shared = self._connections.get(key)
+        if shared is None:
+            self._make_room()
+            client = SSH_CLIENTS[ssh_backend](host, username, password, port, liveness_freshness)
+            shared = self._connections[key] = SharedConnection(client)
+        else:
+            shared.client.liveness.freshness = liveness_freshness
+
+        shared.references += 1
+        shared.released_at = None
+        return shared.client
+
+    @callback
+    def release(self, client) -> None:
+        """Give back a client obtained with acquire()."""
+        for shared in self._connections.values():
+            if shared.client is client:
+                shared.references = max(shared.references - 1, 0)
+                if shared.references == 0:
+                    shared.released_at = time.monotonic()
+                return
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return how many clients are known, used and connected."""
+        return {
+            "clients": len(self._connections),
+            "in_use": sum(1 for shared in self._connections.values() if shared.references),
+            "connected": sum(1 for shared in self._connections.values() if shared.client.connected),
+            "max_connections": self.max_connections,
+        }
+
+    @callback
+    def _make_room(self) -> None:
+        """
+        Close released clients, least recently released first, until there is room for a new one.
+
+        :raises ConnectionLimitError:
+            If there is still no room, every client is in use.
+        """
+        released = sorted((shared.released_at, key) for key, shared in self._connections.items()
+                          if shared.references == 0)
+        excess = len(self._connections) + 1 - self.max_connections
+
+        for _, key in released[:max(excess, 0)]:
+            _LOGGER.debug("Too many SSH clients, closing the unused client of %s", key[0])
+            self._hass.async_create_task(self._connections.pop(key).client.close())
+
+        if len(self._connections) >= self.max_connections:
+            raise ConnectionLimitError(f"All {len(self._connections)} SSH clients allowed are in use")
+
+    async def _async_sweep(self, now: Optional[datetime] = None) -> None:
+        """Close the clients released for longer than the idle timeout."""
+        current_time = time.monotonic()
+
+        for key, shared in list(self._connections.items()):
+            if shared.references == 0 and current_time - shared.released_at >= self.idle_timeout:
+                _LOGGER.debug("Closing unused SSH client of %s", key[0])
+                del self._connections[key]
+                await shared.client.close()
+
+    async def async_shutdown(self) -> None:
+        """Close every client, the manager cannot be used afterward."""
+        self._unsub_sweep()
+
+        connections, self._connections = self._connections, {}
+        for shared in connections.values():
+            await shared.client.close()
@@ -6,11 +6,167 @@ SERVICE_RESTART_TO_WINDOWS_FROM_LINUX = "restart_to_windows_from_linux"
 SERVICE_RESTART_TO_LINUX_FROM_WINDOWS = "restart_to_linux_from_windows"
 SERVICE_PUT_COMPUTER_TO_SLEEP = "put_computer_to_sleep"
 SERVICE_START_COMPUTER_TO_WINDOWS = "start_computer_to_windows"
+SERVICE_CANCEL_START_COMPUTER_TO_WINDOWS = "cancel_start_computer_to_windows"
 SERVICE_RESTART_COMPUTER = "restart_computer"
 SERVICE_CHANGE_MONITORS_CONFIG = "change_monitors_config"
 SERVICE_STEAM_BIG_PICTURE = "steam_big_picture"
 SERVICE_CHANGE_AUDIO_CONFIG = "change_audio_config"
 SERVICE_DEBUG_INFO = "debug_info"
+SERVICE_APPLY_SCENE = "apply_scene"
+
+# Seconds between two updates of a computer when nothing happens (slowest pace of the adaptive schedule)
+CONF_SCAN_INTERVAL = "scan_interval"
+DEFAULT_SCAN_INTERVAL = 60
+# Seconds between two updates right after a power action or a state change (fastest pace)
+CONF_FAST_SCAN_INTERVAL = "fast_scan_interval"
+DEFAULT_FAST_SCAN_INTERVAL = 5
+# Factor the interval grows by after each uneventful update, until it is back to the slow pace
+ADAPTIVE_SCAN_DECAY = 2
+# Seconds the fast pace is held after a power action (booting/shutting down takes a while)
+ADAPTIVE_SCAN_HOLD = 120
+# Seconds between two refreshes of the rarely changing facts (OS version, desktop environment...), 0 is once per boot
+CONF_STATIC_REFRESH_INTERVAL = "static_refresh_interval"
+DEFAULT_STATIC_REFRESH_INTERVAL = 0
+# Seconds between two refreshes of the monitors and audio configuration
+CONF_MEDIUM_REFRESH_INTERVAL = "medium_refresh_interval"
+DEFAULT_MEDIUM_REFRESH_INTERVAL = 300
+
+# Facts are refreshed in tiers: fast ones on every update, the others on their own interval (see the options)
+TIER_FAST = "fast"
+TIER_MEDIUM = "medium"
+TIER_STATIC = "static"
+REFRESH_TIERS = {
+    TIER_FAST: ("operating_system", "boot_id", "get_bluetooth_devices"),
+    TIER_MEDIUM: ("get_monitors_config", "get_speakers", "get_microphones"),
+    TIER_STATIC: ("operating_system_version", "desktop_environment", "get_windows_entry_grub"),
+}
+
+# Named setups (monitors, audio, Steam Big Picture) applied with the apply_scene service, see computer/scenes.py
+CONF_SCENES = "scenes"
+
+# Follow audio/bluetooth changes through a long-lived SSH channel instead of polling them (Linux)
+CONF_EVENT_STREAM = "event_stream"
+DEFAULT_EVENT_STREAM = False
+# Run remotely through sh: audio events from PulseAudio/PipeWire, bluetooth signals from BlueZ (bluetoothctl as a
+# fallback). Everything is killed when the channel closes (stdin reaches EOF).
+EVENT_STREAM_COMMAND = (
+    "LANG=en_US.UTF-8 pactl subscribe &\n"
+    "{ dbus-monitor --system \"type='signal',sender='org.bluez'\" 2>/dev/null "
+    "|| tail -f /dev/null | bluetoothctl; } &\n"
+    "read _; kill 0"
+)
+# Seconds to wait for a burst of events to settle before refreshing what changed
+EVENT_STREAM_DEBOUNCE = 0.5
+# Seconds to wait before reopening a stream that ended after running
+EVENT_STREAM_RETRY_DELAY = 30
+# Seconds a stream must stay open (unless it delivered events) not to count as failing, e.g. missing pactl
+EVENT_STREAM_MIN_UPTIME = 10
+# The delay doubles after each stream failing in a row, up to this many seconds
+EVENT_STREAM_MAX_RETRY_DELAY = 300
+# Streams failing in a row after which the audio and bluetooth are polled again, until the computer goes off
+EVENT_STREAM_MAX_FAILURES = 5
+# Seconds a refresh triggered by events may take, the reads still running then are retried on the next event/resync
+EVENT_STREAM_REFRESH_TIMEOUT = 10
+
+# How to check whether a computer is on (see PresenceProbe)
+CONF_PRESENCE_PROBE = "presence_probe"
+PRESENCE_PROBE_ICMP = "icmp"
+PRESENCE_PROBE_TCP = "tcp"
+PRESENCE_PROBE_ARP = "arp"
+PRESENCE_PROBES = [PRESENCE_PROBE_ICMP, PRESENCE_PROBE_TCP, PRESENCE_PROBE_ARP]
+DEFAULT_PRESENCE_PROBE = PRESENCE_PROBE_ICMP
+# Seconds during which the resolved address of a computer is reused
+PRESENCE_DNS_TTL = 300
+
+# Seconds between two presence sweeps of all the computers
+PRESENCE_SCAN_INTERVAL = 10
+# Hosts probed at the same time during a sweep
+PRESENCE_SCAN_MAX_CONCURRENT = 16
+# Seconds to wait for a host to answer a presence probe
+PRESENCE_PROBE_TIMEOUT = 1
+
+# Read actions with a JSON variant (locale independent, cheaper to parse), tried first on hosts that might support it
+JSON_ACTIONS = {
+    "get_monitors_config": "get_monitors_config_json",
+    "get_speakers": "get_speakers_json",
+    "get_microphones": "get_microphones_json",
+    "get_bluetooth_devices": "get_bluetooth_devices_json",
+}
+
+# Seconds during which the successful result of a read action is reused instead of running it again
+READ_CACHE_TTL = 10
+# Read actions whose cached results each write action makes stale, None for all of them (e.g. the OS may change)
+ACTION_INVALIDATES = {
+    "set_audio_config": ("get_speakers", "get_microphones"),
+    "set_monitors_config": ("get_monitors_config",),
+    "set_grub_entry": ("get_windows_entry_grub",),
+    "shutdown": None,
+    "restart": None,
+    "sleep": None,
+}
+
+# Keys of hass.data[DOMAIN]
+DATA_CONNECTION_MANAGER = "connection_manager"
+DATA_PRESENCE_SCANNER = "presence_scanner"
+DATA_BOOT_ORCHESTRATOR = "boot_orchestrator"
+
+CONF_SSH_BACKEND = "ssh_backend"
+SSH_BACKEND_PARAMIKO = "paramiko"
+SSH_BACKEND_ASYNCSSH = "asyncssh"
+SSH_BACKENDS = [SSH_BACKEND_PARAMIKO, SSH_BACKEND_ASYNCSSH]
+DEFAULT_SSH_BACKEND = SSH_BACKEND_PARAMIKO
+
+CONF_PERSISTENT_SHELL = "persistent_shell"
+DEFAULT_PERSISTENT_SHELL = True
+
+# Seconds to wait for the TCP connection, the SSH banner and the authentication
+SSH_CONNECT_TIMEOUT = 10
+# Consecutive connection failures after which a host is not tried anymore until the backoff delay expires
+SSH_CIRCUIT_FAILURE_THRESHOLD = 2
+# Backoff delay (seconds) after the circuit opens for the first time, doubled each time it re-opens
+SSH_CIRCUIT_BASE_DELAY = 10
+SSH_CIRCUIT_MAX_DELAY = 300
+# Seconds between SSH transport keepalives, a dead peer is detected without opening any channel
+SSH_KEEPALIVE_INTERVAL = 10
+# Unanswered keepalives in a row after which the connection is closed (asyncssh backend), within the freshness window
+SSH_KEEPALIVE_COUNT_MAX = 2
+# Seconds during which a connection that answered is considered alive without probing it again
+CONF_LIVENESS_FRESHNESS = "liveness_freshness"
+DEFAULT_LIVENESS_FRESHNESS = 30
+# Seconds to wait for the remote host to answer an active liveness probe
+SSH_PROBE_TIMEOUT = 2
+# Worker threads dedicated to each host's blocking SSH calls (paramiko backend)
+SSH_EXECUTOR_MAX_WORKERS = 4
+# Channels open at the same time on each host's connection (asyncssh backend), sshd's MaxSessions defaults to 10
+SSH_MAX_CHANNELS = 4
+# Seconds a command run in the persistent shell may take before the shell is considered hung and restarted
+SSH_SHELL_COMMAND_TIMEOUT = 30
+# SSH clients (one connection each) across all the computers, unused ones are closed to make room for new ones
+SSH_MAX_CONNECTIONS = 32
+# Seconds after which a client no computer uses anymore is closed
+SSH_IDLE_TIMEOUT = 300
+# Seconds between two checks for idle connections
+SSH_IDLE_SWEEP_INTERVAL = 60
+# Seconds an action may take (all of its fallback commands included) when its definition has no "timeout"
+DEFAULT_ACTION_TIMEOUT = 10
+# Seconds the inventory script of a poll may take
+INVENTORY_TIMEOUT = 20
+# Seconds a whole poll may take (presence check, connection, reads), whatever hangs on the remote host
+UPDATE_TIMEOUT = 30
+# Seconds a service call may take, all of its actions included
+SERVICE_TIMEOUT = 60
+# Seconds starting a computer to Windows may take, from the magic packet to Windows' sshd answering
+BOOT_TO_WINDOWS_TIMEOUT = 300
+# Seconds between two probes while waiting for the next boot phase (each probe times out after as long)
+BOOT_PROBE_INTERVAL = 1
+# Consecutive failures of a remembered fallback command after which the actions' default order is used again
+FALLBACK_COMMAND_MAX_FAILURES = 2
+
+# Storage of the fallback commands learned for each computer (one store per config entry)
+STORAGE_VERSION = 1
+STORAGE_KEY_COMMANDS = f"{DOMAIN}.commands"
+# Seconds to wait before saving what was learned, changes happening meanwhile are saved at once
+STORAGE_SAVE_DELAY = 10
 
 
 ACTIONS = {
@@ -21,6 +177,10 @@ ACTIONS = {
         "windows": ['for /f "tokens=1 delims=|" %i in (\'wmic os get Name ^| findstr /B /C:"Microsoft"\') do @echo %i'],
         "linux": ["awk -F'=' '/^NAME=|^VERSION=/{gsub(/\"/, \"\", $2); printf $2\" \"}\' /etc/os-release && echo", "lsb_release -a | awk '/Description/ {print $2, $3, $4}'"]
     },
+    "boot_id": {
+        "linux": ["cat /proc/sys/kernel/random/boot_id"],
+        "windows": ["wmic os get LastBootUpTime /value"]
+    },
     "desktop_environment": {
         "linux": ["for session in $(ls /usr/bin/*session 2>/dev/null); do basename $session | sed 's/-session//'; done | grep -E 'gnome|kde|xfce|mate|lxde|cinnamon|budgie|unity' | head -n 1"],
         "windows": ["echo Windows"]
@@ -74,12 +234,27 @@ ACTIONS = {
         "linux": {
             "command": "bluetoothctl info",
             "raise_on_error": False,
+            "timeout": 5,  # Hangs when bluetoothd is stuck
         }
     },
-    "install_nirmcd": {
+    "get_monitors_config_json": {
+        "linux": ["busctl --user --json=short call org.gnome.Mutter.DisplayConfig /org/gnome/Mutter/DisplayConfig "
+                  "org.gnome.Mutter.DisplayConfig GetCurrentState"]
+    },
+    "get_speakers_json": {
+        "linux": ["pactl -f json list sinks"]
+    },
+    "get_microphones_json": {
+        "linux": ["pactl -f json list sources"]
+    },
+    "get_bluetooth_devices_json": {
+        "linux": ["busctl --system --json=short call org.bluez / org.freedesktop.DBus.ObjectManager GetManagedObjects"]
+    },
+    "install_nircmd": {
         "windows": {
             "command": "powershell -Command \"Invoke-WebRequest -Uri %download_url% -OutFile %install_path%\\nircmd.zip -UseBasicParsing; Expand-Archive %install_path%\\nircmd.zip -DestinationPath %install_path%; Remove-Item %install_path%\\nircmd.zip\"",
-            "params": ["download_url", "install_path"]
+            "params": ["download_url", "install_path"],
+            "timeout": 120,  # Downloads NirCmd
         }
     },
     "start_steam_big_picture": {
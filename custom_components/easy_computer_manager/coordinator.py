@@ -0,0 +1,150 @@
+"""Update coordinator for the Easy Computer Manager integration."""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .computer import Computer
+from .computer.deadline import Deadline
+from .computer.event_stream import STREAMED_ACTIONS, EventStream
+from .const import DOMAIN, REFRESH_TIERS, TIER_FAST, UPDATE_TIMEOUT
+from .presence_scanner import PresenceScanner
+from .schedule import AdaptiveSchedule
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ComputerUpdateCoordinator(DataUpdateCoordinator[Dict[str, Any]]):
+    """
+    Poll a computer, refreshing each group of facts at its own pace.
+
+    Every update checks whether the computer is on and refreshes the fast tier. The other tiers are only refreshed
+    once their interval expired, an interval of 0 meaning once per boot. Every tier is invalidated when the computer
+    (re)boots: when it comes back on or when its boot id changes.
+
+    With `event_stream`, the audio configuration and bluetooth devices of a Linux computer are not polled anymore but
+    refreshed as soon as they change (see EventStream), and the entities are updated right away.
+
+    Every update must complete within UPDATE_TIMEOUT, the commands still running then are stopped and the facts they
+    did not refresh keep their previous value.
+
+    Updates are scheduled adaptively between `fast_scan_interval` and `scan_interval` (see AdaptiveSchedule).
+
+    With a `presence_scanner`, whether the computer is on is looked up in the scanner's table instead of being probed,
+    and a refresh is requested as soon as the scanner sees the computer go on or off.
+    """
+
+    def __init__(self, hass: HomeAssistant, computer: Computer, scan_interval: float,
+                 tier_intervals: Dict[str, float], event_stream: bool = False,
+                 presence_scanner: Optional[PresenceScanner] = None,
+                 fast_scan_interval: Optional[float] = None) -> None:
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {computer.host}",
+            update_interval=timedelta(seconds=scan_interval),
+        )
+        self.computer = computer
+        self.tier_intervals = tier_intervals
+
+        self._refreshed_at: Dict[str, float] = {}
+        self._was_on = False
+        self.event_stream = EventStream(computer, self._handle_event) if event_stream else None
+        self.presence_scanner = presence_scanner
+        self.schedule = AdaptiveSchedule(fast_scan_interval or scan_interval, scan_interval)
+
+    async def async_boost(self) -> None:
+        """Poll fast for a while and refresh soon, e.g. after a power action."""
+        self.schedule.boost()
+        self.update_interval = timedelta(seconds=self.schedule.interval)
+        await self.async_request_refresh()
+
+    def invalidate(self, tier: Optional[str] = None) -> None:
+        """Force a tier (all tiers if None) to be refreshed on the next update."""
+        if tier is None:
+            self._refreshed_at.clear()
+        else:
+            self._refreshed_at.pop(tier, None)
+
+    def _due_tiers(self) -> List[str]:
+        now = time.monotonic()
+        due = [TIER_FAST]
+
+        for tier, interval in self.tier_intervals.items():
+            refreshed_at = self._refreshed_at.get(tier)
+            if refreshed_at is None or (interval and now - refreshed_at >= interval):
+                due.append(tier)
+
+        return due
+
+    async def _async_refresh_tiers(self, tiers: List[str], deadline: Deadline) -> None:
+        actions = [action for tier in tiers for action in REFRESH_TIERS[tier]]
+        if self.event_stream is not None and self.event_stream.running:
+            actions = [action for action in actions if action not in STREAMED_ACTIONS]
+
+        try:
+            refreshed = await self.computer.update(True, actions=actions, deadline=deadline)
+        except ConnectionError as exc:
+            raise UpdateFailed(f"Cannot update {self.computer.host}: {exc}") from exc
+
+        # A tier with a read that timed out or lost the connection stays due, e.g. a once per boot tier is retried
+        missing = set(actions) - refreshed
+        now = time.monotonic()
+        for tier in tiers:
+            if not missing.intersection(REFRESH_TIERS[tier]):
+                self._refreshed_at[tier] = now
+
+    async def _async_update_data(self) -> Dict[str, Any]:
+        deadline = Deadline.after(UPDATE_TIMEOUT)
+
+        if self.presence_scanner is not None:
+            is_on = await self.presence_scanner.async_is_on(self.computer)
+        else:
+            is_on = await self.computer.is_on()
+
+        changed = is_on != self._was_on
+
+        if is_on:
+            if not self._was_on:
+                self.invalidate()  # Booted since the last update, nothing we know can be trusted
+
+            boot_id = self.computer.boot_id
+            await self._async_refresh_tiers(self._due_tiers(), deadline)
+
+            # Rebooted between two updates (e.g. restart to another OS), refresh what was skipped right away
+            if boot_id is not None and self.computer.boot_id != boot_id:
+                _LOGGER.debug("%s rebooted, refreshing all facts", self.computer.host)
+                self.invalidate()
+                await self._async_refresh_tiers(self._due_tiers(), deadline)
+                changed = True
+
+            if self.event_stream is not None and self.computer.is_linux():
+                self.event_stream.start()
+
+        elif self.event_stream is not None:
+            await self.event_stream.stop()
+
+        self._was_on = is_on
+        self.update_interval = timedelta(seconds=self.schedule.next_interval(changed))
+        return {"is_on": is_on}
+
+    @callback
+    def handle_presence_change(self, is_on: bool) -> None:
+        """Refresh right away when the presence scanner sees the computer go on or off."""
+        self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def _handle_event(self) -> None:
+        # Not async_set_updated_data(), a chatty computer would keep postponing the next poll
+        self.async_update_listeners()
+
+    async def async_shutdown(self) -> None:
+        """Stop the event stream along with the coordinator."""
+        await super().async_shutdown()
+        if self.event_stream is not None:
+            await self.event_stream.stop()
@@ -0,0 +1,113 @@
+"""Presence scanner shared by every computer of the Easy Computer Manager integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .computer import Computer
+from .computer.presence import ProbeResult
+from .const import PRESENCE_PROBE_TIMEOUT, PRESENCE_SCAN_INTERVAL, PRESENCE_SCAN_MAX_CONCURRENT
+
+_LOGGER = logging.getLogger(__name__)
+
+PresenceListener = Callable[[bool], None]
+
+
+class PresenceScanner:
+    """
+    Check whether the computers are on, all of them in one sweep per interval.
+
+    Each host is probed once per sweep (computers sharing a host share the result) and no more than `max_concurrent`
+    hosts are probed at the same time. The results are kept in a table the coordinators read instead of probing on
+    their own, and the listeners of a computer are called as soon as it goes on or off.
+    """
+
+    def __init__(self, hass: HomeAssistant, interval: float = PRESENCE_SCAN_INTERVAL,
+                 max_concurrent: int = PRESENCE_SCAN_MAX_CONCURRENT) -> None:
+        self._hass = hass
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+
+        self._computers: Dict[str, List[Tuple[Computer, PresenceListener]]] = {}
+        self._results: Dict[str, ProbeResult] = {}
+        self._sweep_lock = asyncio.Lock()
+        self._last_sweep_duration: Optional[float] = None
+
+        self._unsub_sweep = async_track_time_interval(hass, self._async_sweep, timedelta(seconds=interval))
+
+    @callback
+    def register(self, computer: Computer, listener: PresenceListener) -> CALLBACK_TYPE:
+        """Include a computer in the sweeps, `listener` is called with its new state when it goes on or off."""
+        registration = (computer, listener)
+        self._computers.setdefault(computer.host, []).append(registration)
+
+        @callback
+        def unregister() -> None:
+            registrations = self._computers.get(computer.host, [])
+            if registration in registrations:
+                registrations.remove(registration)
+            if not registrations:
+                self._computers.pop(computer.host, None)
+                self._results.pop(computer.host, None)
+
+        return unregister
+
+    async def async_is_on(self, computer: Computer) -> bool:
+        """Return whether a computer is on from the last sweep, probing it right away if it was never swept."""
+        result = self._results.get(computer.host)
+        if result is None:
+            return await self._async_probe_host(computer.host)
+
+        return result.reachable
+
+    @property
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {
+            "hosts": len(self._computers),
+            "online": sum(1 for result in self._results.values() if result.reachable),
+            "last_sweep_duration": self._last_sweep_duration,
+        }
+
+    async def _async_sweep(self, now: Optional[datetime] = None) -> None:
+        # A sweep slower than the interval (many unreachable hosts) is not stacked with the next one
+        if self._sweep_lock.locked():
+            _LOGGER.debug("Previous presence sweep still running, skipping this one")
+            return
+
+        async with self._sweep_lock:
+            start = self._hass.loop.time()
+            slots = asyncio.Semaphore(self.max_concurrent)
+
+            async def probe(host: str) -> None:
+                async with slots:
+                    await self._async_probe_host(host)
+
+            await asyncio.gather(*(probe(host) for host in list(self._computers)))
+            self._last_sweep_duration = round(self._hass.loop.time() - start, 3)
+
+    async def _async_probe_host(self, host: str) -> bool:
+        registrations = self._computers.get(host)
+        if not registrations:
+            return False
+
+        result = await registrations[0][0].presence.probe(PRESENCE_PROBE_TIMEOUT)
+        previous = self._results.get(host)
+        self._results[host] = result
+
+        for computer, listener in list(registrations):
+            computer.set_presence(result)
+            if previous is not None and previous.reachable != result.reachable:
+                listener(result.reachable)
+
+        return result.reachable
+
+    async def async_shutdown(self) -> None:
+        """Stop the sweeps, the scanner cannot be used afterward."""
+        self._unsub_sweep()
+        self._computers.clear()
+        self._results.clear()
@@ -0,0 +1,40 @@
+"""Adaptive polling schedule for the Easy Computer Manager integration."""
+from __future__ import annotations
+
+import time
+
+from .const import ADAPTIVE_SCAN_DECAY, ADAPTIVE_SCAN_HOLD
+
+
+class AdaptiveSchedule:
+    """
+    Decide how long to wait before the next update of a computer.
+
+    Updates are fast (`fast_interval`) right after something happened: the computer went on/off or rebooted, or the
+    user sent a power action, in which case the fast pace is held for `hold` seconds (the computer takes a while to
+    boot or shut down). The interval then grows by `decay` after every uneventful update, up to `slow_interval`.
+    """
+
+    def __init__(self, fast_interval: float, slow_interval: float, decay: float = ADAPTIVE_SCAN_DECAY,
+                 hold: float = ADAPTIVE_SCAN_HOLD) -> None:
+        self.fast_interval = min(fast_interval, slow_interval)
+        self.slow_interval = slow_interval
+        self.decay = decay
+        self.hold = hold
+
+        self.interval = slow_interval
+        self._fast_until = 0.0
+
+    def boost(self) -> None:
+        """Poll fast for a while, e.g. after a power action."""
+        self.interval = self.fast_interval
+        self._fast_until = time.monotonic() + self.hold
+
+    def next_interval(self, changed: bool) -> float:
+        """Return the interval until the next update, given whether this update saw a change."""
+        if changed or time.monotonic() < self._fast_until:
+            self.interval = self.fast_interval
+        else:
+            self.interval = min(self.slow_interval, self.interval * self.decay)
+
+        return self.interval
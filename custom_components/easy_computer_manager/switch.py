@@ -1,28 +1,30 @@
 from __future__ import annotations
 
-import asyncio
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import voluptuous as vol
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import (
-    CONF_HOST, CONF_MAC, CONF_NAME, CONF_PASSWORD, CONF_PORT, CONF_USERNAME,
-)
-from homeassistant.core import HomeAssistant, ServiceResponse, SupportsResponse
+from homeassistant.const import CONF_NAME
+from homeassistant.core import HomeAssistant, ServiceResponse, SupportsResponse, callback
 from homeassistant.helpers import entity_platform, device_registry as dr
 from homeassistant.helpers.config_validation import make_entity_service_schema
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .computer import OSType, Computer
+from .computer import OSType
+from .computer.boot import BootOrchestrator
+from .computer.deadline import Deadline
 from .computer.utils import format_debug_information, get_bluetooth_devices_as_str
 from .const import (
     DOMAIN, SERVICE_RESTART_TO_WINDOWS_FROM_LINUX, SERVICE_PUT_COMPUTER_TO_SLEEP,
     SERVICE_START_COMPUTER_TO_WINDOWS, SERVICE_RESTART_COMPUTER,
     SERVICE_RESTART_TO_LINUX_FROM_WINDOWS, SERVICE_CHANGE_MONITORS_CONFIG,
-    SERVICE_STEAM_BIG_PICTURE, SERVICE_CHANGE_AUDIO_CONFIG, SERVICE_DEBUG_INFO
+    SERVICE_STEAM_BIG_PICTURE, SERVICE_CHANGE_AUDIO_CONFIG, SERVICE_DEBUG_INFO, TIER_MEDIUM, SERVICE_TIMEOUT,
+    SERVICE_APPLY_SCENE, SERVICE_CANCEL_START_COMPUTER_TO_WINDOWS, DATA_BOOT_ORCHESTRATOR
 )
+from .coordinator import ComputerUpdateCoordinator
 
 
 async def async_setup_entry(
@@ -31,18 +33,10 @@ async def async_setup_entry(
         async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up the computer switch from a config entry."""
-    mac_address = config.data[CONF_MAC]
-    host = config.data[CONF_HOST]
+    coordinator = hass.data[DOMAIN][config.entry_id]
     name = config.data[CONF_NAME]
-    dualboot = config.data.get("dualboot", False)
-    username = config.data[CONF_USERNAME]
-    password = config.data[CONF_PASSWORD]
-    port = config.data.get(CONF_PORT)
 
-    async_add_entities(
-        [ComputerSwitch(hass, name, host, mac_address, dualboot, username, password, port)],
-        True
-    )
+    async_add_entities([ComputerSwitch(coordinator, name)])
 
     platform = entity_platform.async_get_current_platform()
 
@@ -52,6 +46,7 @@ async def async_setup_entry(
         (SERVICE_RESTART_TO_LINUX_FROM_WINDOWS, {}, SupportsResponse.NONE),
         (SERVICE_PUT_COMPUTER_TO_SLEEP, {}, SupportsResponse.NONE),
         (SERVICE_START_COMPUTER_TO_WINDOWS, {}, SupportsResponse.NONE),
+        (SERVICE_CANCEL_START_COMPUTER_TO_WINDOWS, {}, SupportsResponse.NONE),
         (SERVICE_RESTART_COMPUTER, {}, SupportsResponse.NONE),
         (SERVICE_CHANGE_MONITORS_CONFIG, {vol.Required("monitors_config"): dict}, SupportsResponse.NONE),
         (SERVICE_STEAM_BIG_PICTURE, {vol.Required("action"): str}, SupportsResponse.NONE),
@@ -61,6 +56,7 @@ async def async_setup_entry(
             vol.Optional("input_device"): str,
             vol.Optional("output_device"): str
         }, SupportsResponse.NONE),
+        (SERVICE_APPLY_SCENE, {vol.Required("scene"): str}, SupportsResponse.NONE),
         (SERVICE_DEBUG_INFO, {}, SupportsResponse.ONLY),
     ]
 
@@ -74,29 +70,19 @@ async def async_setup_entry(
         )
 
 
-class ComputerSwitch(SwitchEntity):
+class ComputerSwitch(CoordinatorEntity[ComputerUpdateCoordinator], SwitchEntity):
     """Representation of a computer switch entity."""
 
-    def __init__(
-            self,
-            hass: HomeAssistant,
-            name: str,
-            host: str | None,
-            mac_address: str,
-            dualboot: bool,
-            username: str,
-            password: str,
-            port: int | None,
-    ) -> None:
+    def __init__(self, coordinator: ComputerUpdateCoordinator, name: str) -> None:
         """Initialize the computer switch entity."""
-        self.hass = hass
+        super().__init__(coordinator)
+        self.computer = coordinator.computer
         self._attr_name = name
-        self._attr_unique_id = dr.format_mac(mac_address)
+        self._attr_unique_id = dr.format_mac(self.computer.mac)
         self._state = False
-        self._attr_should_poll = not self._attr_assumed_state
         self._attr_extra_state_attributes = {}
-
-        self.computer = Computer(host, mac_address, username, password, port, dualboot)
+        self._last_available: Optional[bool] = None
+        self._update_from_computer()
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -122,6 +108,7 @@ class ComputerSwitch(SwitchEntity):
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn the computer on using Wake-on-LAN."""
         await self.computer.start()
+        await self.coordinator.async_boost()
 
         if self._attr_assumed_state:
             self._state = True
@@ -129,23 +116,30 @@ class ComputerSwitch(SwitchEntity):
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn the computer off via shutdown command."""
-        await self.computer.shutdown()
+        # Do not let a boot in progress turn it back on (or restart it) right after
+        await self._boot_orchestrator.cancel(self.computer.host)
+        await self.computer.shutdown(deadline=Deadline.after(SERVICE_TIMEOUT))
+        await self.coordinator.async_boost()
 
         if self._attr_assumed_state:
             self._state = False
             self.async_write_ha_state()
 
-    async def async_update(self) -> None:
-        """Update the state by checking if the computer is on."""
-        is_on = await self.computer.is_on()
-        if self.is_on != is_on:
-            self._state = is_on
-            # self.async_write_ha_state()
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update the state from the latest data of the coordinator, only written if something changed."""
+        if self._update_from_computer():
+            super()._handle_coordinator_update()
 
-        # If the computer is on, update its attributes
-        if is_on:
-            await self.computer.update(is_on)
+    def _update_from_computer(self) -> bool:
+        """Update the state and attributes from the computer, return whether any of them changed."""
+        previous = (self._state, self._attr_extra_state_attributes, self._last_available)
+
+        self._state = bool(self.coordinator.data and self.coordinator.data["is_on"])
+        self._last_available = self.available
 
+        # If the computer is on, update its attributes
+        if self._state:
             self._attr_extra_state_attributes = {
                 "operating_system": self.computer.operating_system,
                 "operating_system_version": self.computer.operating_system_version,
@@ -154,50 +148,71 @@ class ComputerSwitch(SwitchEntity):
                 "connected_devices": get_bluetooth_devices_as_str(self.computer),
             }
 
+        return previous != (self._state, self._attr_extra_state_attributes, self._last_available)
+
     # Service methods for various functionalities
     async def restart_to_windows_from_linux(self) -> None:
         """Restart the computer from Linux to Windows."""
-        await self.computer.restart(OSType.LINUX, OSType.WINDOWS)
+        await self.computer.restart(OSType.LINUX, OSType.WINDOWS, Deadline.after(SERVICE_TIMEOUT))
+        await self.coordinator.async_boost()
 
     async def restart_to_linux_from_windows(self) -> None:
         """Restart the computer from Windows to Linux."""
-        await self.computer.restart(OSType.WINDOWS, OSType.LINUX)
+        await self.computer.restart(OSType.WINDOWS, OSType.LINUX, Deadline.after(SERVICE_TIMEOUT))
+        await self.coordinator.async_boost()
 
     async def put_computer_to_sleep(self) -> None:
         """Put the computer to sleep."""
-        await self.computer.put_to_sleep()
+        await self.computer.put_to_sleep(Deadline.after(SERVICE_TIMEOUT))
+        await self.coordinator.async_boost()
 
     async def start_computer_to_windows(self) -> None:
-        """Start the computer to Windows after booting into Linux first."""
-        await self.computer.start()
-
-        async def wait_and_reboot() -> None:
-            """Wait until the computer is on, then restart to Windows."""
-            while not await self.computer.is_on():
-                await asyncio.sleep(3)
-            await self.computer.restart(OSType.LINUX, OSType.WINDOWS)
+        """Start the computer to Windows after booting into Linux first (in the background, see debug_info)."""
+        self._boot_orchestrator.start_to_windows(self.computer)
+        await self.coordinator.async_boost()
 
-        self.hass.loop.create_task(wait_and_reboot())
+    async def cancel_start_computer_to_windows(self) -> None:
+        """Stop starting the computer to Windows, the computer is left as it is."""
+        await self._boot_orchestrator.cancel(self.computer.host)
 
     async def restart_computer(self) -> None:
         """Restart the computer."""
-        await self.computer.restart()
+        await self.computer.restart(deadline=Deadline.after(SERVICE_TIMEOUT))
+        await self.coordinator.async_boost()
 
     async def change_monitors_config(self, monitors_config: Dict[str, Any]) -> None:
         """Change the monitor configuration."""
-        await self.computer.set_monitors_config(monitors_config)
+        await self.computer.set_monitors_config(monitors_config, Deadline.after(SERVICE_TIMEOUT))
+        self.coordinator.invalidate(TIER_MEDIUM)
+        await self.coordinator.async_request_refresh()
 
     async def steam_big_picture(self, action: str) -> None:
         """Control Steam Big Picture mode."""
-        await self.computer.steam_big_picture(action)
+        await self.computer.steam_big_picture(action, Deadline.after(SERVICE_TIMEOUT))
 
     async def change_audio_config(
             self, volume: int | None = None, mute: bool | None = None,
             input_device: str | None = None, output_device: str | None = None
     ) -> None:
         """Change the audio configuration."""
-        await self.computer.set_audio_config(volume, mute, input_device, output_device)
+        await self.computer.set_audio_config(volume, mute, input_device, output_device,
+                                             Deadline.after(SERVICE_TIMEOUT))
+        self.coordinator.invalidate(TIER_MEDIUM)
+        await self.coordinator.async_request_refresh()
+
+    async def apply_scene(self, scene: str) -> None:
+        """Apply one of the scenes set in the options (monitors, audio, Steam Big Picture) at once."""
+        await self.computer.apply_scene(scene, Deadline.after(SERVICE_TIMEOUT))
+        self.coordinator.invalidate(TIER_MEDIUM)
+        await self.coordinator.async_request_refresh()
 
     async def debug_info(self) -> ServiceResponse:
         """Return debug information."""
-        return await format_debug_information(self.computer)
+        data = await format_debug_information(self.computer)
+        boot = self._boot_orchestrator.get(self.computer.host)
+        data["boot"] = boot.as_dict() if boot is not None else None
+        return data
+
+    @property
+    def _boot_orchestrator(self) -> BootOrchestrator:
+        return self.hass.data[DOMAIN][DATA_BOOT_ORCHESTRATOR]
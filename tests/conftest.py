@@ -0,0 +1,9 @@
+"""
+Run from the repository root with `python -m pytest tests`, with homeassistant and the requirements of manifest.json
+installed. The SSH tests talk to the fake hosts of the benchmarks (benchmarks/fake_host.py), started in a subprocess.
+"""
+import os
+import sys
+
+# The integration and the benchmarks' fake hosts are imported from the repository root, like benchmarks/load.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+import pytest
+
+from custom_components.easy_computer_manager.computer.actions import ACTION_REGISTRY, ActionDefinitionError, \
+    ActionRegistry
+from custom_components.easy_computer_manager.computer.common import OSType
+
+
+def test_definitions_per_os_and_desktop_environment():
+    registry = ActionRegistry({
+        "set_volume": {
+            "linux": {
+                "gnome": {"commands": ["pactl set-sink-volume @DEFAULT_SINK@ %volume%%", "amixer set Master %volume%%"],
+                          "params": ["volume"], "timeout": 5},
+                "kde": "qdbus org.kde.kglobalaccel /component/kmix invokeShortcut increase_volume",
+            },
+            "windows": "",
+        },
+        "restart": {"windows": {"command": "shutdown /r /t 0", "raise_on_error": True}},
+    })
+
+    gnome = registry.get("set_volume", OSType.LINUX, "gnome")
+    assert gnome.render({"volume": 40}) == ("pactl set-sink-volume @DEFAULT_SINK@ 40%", "amixer set Master 40%")
+    assert gnome.timeout == 5
+    assert registry.get("set_volume", OSType.LINUX, "xfce") is None  # No generic variant
+    assert registry.get("set_volume", OSType.WINDOWS) is None  # Empty command, not available
+    assert "set_volume" in registry
+
+    restart = registry.get("restart", OSType.WINDOWS, "gnome")  # Falls back to the generic variant
+    assert restart.raise_on_error and restart.render({}) == ("shutdown /r /t 0",)
+
+
+def test_undeclared_placeholders_are_left_alone():
+    registry = ActionRegistry({"list": {"windows": {"command": "for %i in (%dir%\\*) do echo %i", "params": ["dir"]}}})
+
+    assert registry.get("list", OSType.WINDOWS).render({"dir": "C:"}) == ("for %i in (C:\\*) do echo %i",)
+    with pytest.raises(ValueError):
+        registry.get("list", OSType.WINDOWS).render({})
+
+
+@pytest.mark.parametrize("definition, message", [
+    ({"command": "shutdown -h now", "timout": 5}, "unknown keys"),
+    ({"command": "sleep %seconds%", "params": ["seconds", "unit"]}, "never used"),
+    ({"command": "sleep %seconds%", "params": ["seconds", "seconds"]}, "unique names"),
+    ({"command": "sleep %seconds%", "params": "seconds"}, "unique names"),
+    ({"command": "shutdown -h now", "commands": ["poweroff"]}, "either 'command' or 'commands'"),
+    ({"params": []}, "either 'command' or 'commands'"),
+    ({"commands": ["poweroff", 1]}, "must be strings"),
+    ({"command": "poweroff", "raise_on_error": "yes"}, "raise_on_error"),
+    ({"command": "poweroff", "timeout": 0}, "timeout"),
+    ({"command": "poweroff", "timeout": True}, "timeout"),
+    (42, "unexpected definition"),
+])
+def test_malformed_definitions_are_rejected(definition, message):
+    with pytest.raises(ActionDefinitionError, match=message):
+        ActionRegistry({"action": {"linux": definition}})
+
+
+def test_malformed_actions_are_rejected():
+    with pytest.raises(ActionDefinitionError, match="unknown OS"):
+        ActionRegistry({"action": {"freebsd": "poweroff"}})
+    with pytest.raises(ActionDefinitionError, match="mapping of OS"):
+        ActionRegistry({"action": ["poweroff"]})
+    with pytest.raises(ActionDefinitionError, match="not defined"):
+        ActionRegistry({"action": {"linux": "poweroff"}}, {"other": None})
+    with pytest.raises(ActionDefinitionError, match="unknown actions"):
+        ActionRegistry({"action": {"linux": "poweroff"}}, {"action": ("get_speakers",)})
+
+
+def test_shipped_actions_compile():
+    assert ACTION_REGISTRY.get("get_speakers", OSType.LINUX) is not None
+    assert ACTION_REGISTRY.invalidated_by("get_speakers") == frozenset()
@@ -0,0 +1,79 @@
+import subprocess
+from typing import List
+
+from custom_components.easy_computer_manager.computer.batch import STEP_MARKER, build_batch_script, \
+    parse_batch_output
+from custom_components.easy_computer_manager.computer.common import CommandOutput
+
+TOKEN = "0123456789abcdef"
+
+
+def run_batch(steps: List[List[str]], stop_on_error: bool = True) -> CommandOutput:
+    """Run a batch script in a local POSIX shell, as the remote login shell would, and parse its output."""
+    script = build_batch_script(steps, TOKEN, stop_on_error)
+    process = subprocess.run(script, shell=True, capture_output=True, text=True, timeout=10)
+    return parse_batch_output(CommandOutput(script, process.returncode, process.stdout, process.stderr), steps, TOKEN)
+
+
+def test_steps_run_in_order_with_their_fallbacks():
+    steps = [["false", "echo 'Windows Boot Manager'"], ["exit 0"], ["echo done"]]
+
+    result = run_batch(steps)
+
+    assert result.successful()
+    assert result.steps == [("echo 'Windows Boot Manager'", 0), ("exit 0", 0), ("echo done", 0)]
+    assert result.output == "Windows Boot Manager\ndone"  # The markers are stripped
+    assert result.command == "false || echo 'Windows Boot Manager' && exit 0 && echo done"
+
+
+def test_stops_at_the_first_failed_step():
+    steps = [["echo 'error: no such entry' >&2; exit 2", "exit 3"], ["echo rebooting"]]
+
+    result = run_batch(steps)
+
+    assert result.return_code == 3
+    assert result.steps == [("exit 3", 3)]  # The last command tried
+    assert result.error == "error: no such entry"
+    assert "rebooting" not in result.output
+
+
+def test_keeps_going_without_stop_on_error():
+    result = run_batch([["exit 4"], ["echo still running"]], stop_on_error=False)
+
+    assert result.return_code == 4
+    assert result.steps == [("exit 4", 4), ("echo still running", 0)]
+    assert result.output == "still running"
+
+
+def test_background_commands_and_forged_markers():
+    forged = f"{STEP_MARKER}:ffffffffffffffff:1:0:0"
+    steps = [["sleep 0 &"], [f"echo '{forged}'"]]
+
+    result = run_batch(steps)
+
+    assert result.successful()
+    assert len(result.steps) == 2
+    assert result.output == forged
+
+
+def test_steps_that_did_not_run_fail_the_batch():
+    steps = [["grub-reboot 'Windows Boot Manager'"], ["reboot"]]
+    output = f"\n{STEP_MARKER}:{TOKEN}:0:0:0\n"
+
+    timed_out = parse_batch_output(CommandOutput.timeout("sh -c ...", output), steps, TOKEN)
+    assert timed_out.timed_out and not timed_out.successful()
+    assert timed_out.steps == [("grub-reboot 'Windows Boot Manager'", 0)]
+
+    # Cut short without an exit code of its own, e.g. the connection dropped
+    lost = parse_batch_output(CommandOutput("sh -c ...", 0, output, ""), steps, TOKEN)
+    assert lost.return_code == 1
+
+
+def test_malformed_markers():
+    steps = [["poweroff"]]
+    output = f"{STEP_MARKER}:{TOKEN}:7:0:0\n{STEP_MARKER}:{TOKEN}:0:oops:x\n"
+
+    result = parse_batch_output(CommandOutput("sh -c ...", 0, output, ""), steps, TOKEN)
+
+    assert result.steps == [("poweroff", 1)]  # Unknown step ignored, unreadable exit code counts as a failure
+    assert result.output == ""
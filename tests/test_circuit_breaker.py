@@ -0,0 +1,92 @@
+import pytest
+
+from custom_components.easy_computer_manager.computer import circuit_breaker
+from custom_components.easy_computer_manager.computer.circuit_breaker import CircuitBreaker, CircuitOpenError, \
+    CircuitState
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze the time seen by the circuit breaker, and take the longest delay of the jitter range."""
+
+    class Clock:
+        now = 1000.0
+
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: Clock.now)
+    monkeypatch.setattr(circuit_breaker.random, "uniform", lambda low, high: high)
+    return Clock
+
+
+def test_opens_after_the_failure_threshold(clock):
+    breaker = CircuitBreaker("host", failure_threshold=2, base_delay=10, max_delay=300)
+
+    breaker.before_attempt()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.before_attempt()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_attempt()
+
+
+def test_half_open_lets_a_single_trial_through(clock):
+    breaker = CircuitBreaker("host", failure_threshold=1, base_delay=10, max_delay=300)
+    breaker.record_failure()
+
+    clock.now += 10
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    breaker.before_attempt()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_attempt()  # The trial is still running
+
+
+def test_failed_trial_reopens_with_a_longer_delay(clock):
+    breaker = CircuitBreaker("host", failure_threshold=1, base_delay=10, max_delay=300)
+    breaker.record_failure()
+
+    clock.now += 10
+    breaker.before_attempt()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.as_dict()["retry_in"] == 20
+
+    clock.now += 19
+    assert breaker.state == CircuitState.OPEN
+    clock.now += 1
+    assert breaker.state == CircuitState.HALF_OPEN
+
+
+def test_delay_is_capped(clock):
+    breaker = CircuitBreaker("host", failure_threshold=1, base_delay=10, max_delay=30)
+
+    for _ in range(5):
+        breaker.record_failure()
+        clock.now += 1000
+
+    breaker.record_failure()
+    assert breaker.as_dict()["retry_in"] == 30
+
+
+def test_successful_trial_closes_the_circuit(clock):
+    breaker = CircuitBreaker("host", failure_threshold=1, base_delay=10, max_delay=300)
+    breaker.record_failure()
+
+    clock.now += 10
+    breaker.before_attempt()
+    breaker.record_success()
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.as_dict() == {"state": "closed", "consecutive_failures": 0, "retry_in": None}
+    breaker.before_attempt()
+
+
+def test_reset_closes_an_open_circuit(clock):
+    breaker = CircuitBreaker("host", failure_threshold=1, base_delay=10, max_delay=300)
+    breaker.record_failure()
+
+    breaker.reset()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.before_attempt()
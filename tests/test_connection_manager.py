@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from homeassistant.core import HomeAssistant
+
+from custom_components.easy_computer_manager.connection_manager import ConnectionLimitError, ConnectionManager
+
+
+def test_cap_is_enforced_when_every_client_is_in_use(tmp_path):
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        manager = ConnectionManager(hass, max_connections=2)
+        try:
+            first = manager.acquire("192.0.2.10", "test", "test")
+            manager.acquire("192.0.2.11", "test", "test")
+            assert manager.acquire("192.0.2.10", "test", "test") is first  # Shared, no new client needed
+
+            with pytest.raises(ConnectionLimitError):
+                manager.acquire("192.0.2.12", "test", "test")
+            assert manager.stats["clients"] == 2
+
+            manager.release(first)
+            manager.release(first)
+            manager.acquire("192.0.2.12", "test", "test")  # The released client makes room
+            assert manager.stats == {"clients": 2, "in_use": 2, "connected": 0, "max_connections": 2}
+        finally:
+            await manager.async_shutdown()
+            await hass.async_block_till_done()
+
+    asyncio.run(run())
+
+
+def test_acquiring_again_updates_the_liveness_freshness(tmp_path):
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        manager = ConnectionManager(hass)
+        try:
+            client = manager.acquire("192.0.2.10", "test", "test", liveness_freshness=30)
+            manager.release(client)
+            assert manager.acquire("192.0.2.10", "test", "test", liveness_freshness=5) is client
+            assert client.liveness.freshness == 5
+        finally:
+            await manager.async_shutdown()
+
+    asyncio.run(run())
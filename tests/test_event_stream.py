@@ -0,0 +1,132 @@
+import asyncio
+from typing import List, Optional
+
+from custom_components.easy_computer_manager.computer.event_stream import EventStream, STREAMED_ACTIONS
+
+
+class StreamConnection:
+    """Serves a scripted stream each time one is opened: None fails right away, a list yields its lines then stays
+    open until closed."""
+
+    def __init__(self, streams: List[Optional[List[str]]]) -> None:
+        self.streams = streams
+        self.opened = 0
+        self.close = asyncio.Event()
+
+    async def stream_lines(self, command: str):
+        stream = self.streams[min(self.opened, len(self.streams) - 1)]
+        self.opened += 1
+        if stream is None:
+            raise ConnectionError("stream failed")
+        for line in stream:
+            yield line
+        await self.close.wait()
+
+
+class FakeComputer:
+    host = "host"
+
+    def __init__(self, connection: StreamConnection) -> None:
+        self.connection = connection
+        self.updates: List[List[str]] = []
+        self.deadlines = []
+
+    def stream_lines(self, command: str):
+        return self.connection.stream_lines(command)
+
+    async def update(self, state=None, actions=(), deadline=None):
+        self.updates.append(list(actions))
+        self.deadlines.append(deadline)
+        return frozenset(actions)
+
+
+def make_stream(computer: FakeComputer, **options) -> EventStream:
+    options = {"debounce": 0, "retry_delay": 0.01, "min_uptime": 0.05, "max_retry_delay": 0.04, "max_failures": 4,
+               **options}
+    return EventStream(computer, lambda: None, **options)
+
+
+def test_failing_stream_gives_up_without_refreshing():
+    async def run():
+        computer = FakeComputer(StreamConnection([None]))
+        stream = make_stream(computer)
+
+        stream.start()
+        await asyncio.sleep(0.3)
+
+        assert computer.connection.opened == 4
+        assert computer.updates == []
+        assert not stream.running
+
+        stream.start()  # Polling from now on, until the computer goes off
+        await asyncio.sleep(0.05)
+        assert computer.connection.opened == 4
+
+        await stream.stop()
+        stream.start()
+        await asyncio.sleep(0)
+        assert computer.connection.opened == 5
+        await stream.stop()
+
+    asyncio.run(run())
+
+
+def test_not_running_while_failing():
+    async def run():
+        computer = FakeComputer(StreamConnection([None, []]))
+        stream = make_stream(computer, retry_delay=0.05)
+
+        stream.start()
+        await asyncio.sleep(0.02)
+        assert not stream.running  # Backing off, the coordinator polls meanwhile
+
+        await asyncio.sleep(0.15)
+        assert stream.running  # Reopened and stayed open past min_uptime
+        await stream.stop()
+
+    asyncio.run(run())
+
+
+def test_resyncs_after_a_stream_that_ran():
+    async def run():
+        connection = StreamConnection([["Event 'change' on sink #56"]])
+        computer = FakeComputer(connection)
+        stream = make_stream(computer)
+
+        stream.start()
+        await asyncio.sleep(0.02)
+        assert computer.updates == [["get_microphones", "get_speakers"]]
+        assert computer.deadlines[0] is not None and not computer.deadlines[0].expired()
+
+        connection.close.set()  # The stream ends, it is reopened and everything is refreshed
+        await asyncio.sleep(0.05)
+        assert computer.updates[1] == sorted(STREAMED_ACTIONS)
+        await stream.stop()
+
+    asyncio.run(run())
+
+
+def test_unexpected_refresh_errors_do_not_stop_the_stream():
+    async def run():
+        connection = StreamConnection([["Event 'change' on sink #56"]])
+        computer = FakeComputer(connection)
+        failures = []
+
+        async def update(state=None, actions=(), deadline=None):
+            failures.append(actions)
+            raise RuntimeError("boom")
+
+        computer.update = update
+        stream = make_stream(computer)
+
+        stream.start()
+        await asyncio.sleep(0.02)
+        assert failures
+
+        stream._schedule(STREAMED_ACTIONS)
+        await asyncio.sleep(0.02)
+        assert len(failures) == 2
+        assert stream.running
+        await stream.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,75 @@
+import subprocess
+
+from custom_components.easy_computer_manager.computer.inventory import SECTION_MARKER, build_inventory_script, \
+    parse_inventory_output
+
+TOKEN = "0123456789abcdef"
+
+
+def run_script(script: str) -> str:
+    """Run an inventory script in a local POSIX shell, as the remote login shell would."""
+    return subprocess.run(script, shell=True, capture_output=True, text=True, timeout=10).stdout
+
+
+def test_sections_stop_at_the_first_command_that_succeeds():
+    sections = {
+        "operating_system_version": ["cat /nonexistent/os-release", "printf 'Ubuntu 24.04 LTS\\n'"],
+        "desktop_environment": ["echo GNOME", "echo never run"],
+        "get_windows_entry_grub": ["false", "exit 3"],
+    }
+
+    outputs = parse_inventory_output(run_script(build_inventory_script(sections, TOKEN)), sections, TOKEN)
+
+    assert outputs["operating_system_version"].output == "Ubuntu 24.04 LTS"
+    assert outputs["operating_system_version"].command == "printf 'Ubuntu 24.04 LTS\\n'"
+    assert outputs["desktop_environment"].output == "GNOME"
+    assert outputs["desktop_environment"].command == "echo GNOME"
+    # Every command failed, the last exit code is kept with the whole chain
+    assert outputs["get_windows_entry_grub"].return_code == 3
+    assert outputs["get_windows_entry_grub"].command == "false || exit 3"
+
+
+def test_multiline_output_and_quotes():
+    sections = {"get_speakers": ["printf 'Sink #56\\n\\tName: alsa_output.pci\\n'; echo \"it's\""]}
+
+    outputs = parse_inventory_output(run_script(build_inventory_script(sections, TOKEN)), sections, TOKEN)
+
+    assert outputs["get_speakers"].output == "Sink #56\n\tName: alsa_output.pci\nit's"
+    assert outputs["get_speakers"].successful()
+
+
+def test_markers_with_another_token_are_output():
+    forged = f"{SECTION_MARKER}:ffffffffffffffff:end:0:0"
+    sections = {"boot_id": [f"echo '{forged}'; echo 5f1c2b0e"]}
+
+    outputs = parse_inventory_output(run_script(build_inventory_script(sections, TOKEN)), sections, TOKEN)
+
+    assert outputs["boot_id"].output == f"{forged}\n5f1c2b0e"
+
+
+def test_missing_and_interrupted_sections_are_left_out():
+    sections = {"boot_id": ["cat /proc/sys/kernel/random/boot_id"], "desktop_environment": ["echo GNOME"],
+                "get_speakers": ["pactl list sinks"]}
+    output = (
+        f"{SECTION_MARKER}:{TOKEN}:begin:boot_id\n"
+        "5f1c2b0e-8a4d-4c3e-9f7a-2d6b1e0c9a84\n"
+        f"{SECTION_MARKER}:{TOKEN}:end:0:0\n"
+        f"{SECTION_MARKER}:{TOKEN}:begin:desktop_environment\n"
+        "GNO"  # Cut off by the deadline
+    )
+
+    outputs = parse_inventory_output(output, sections, TOKEN)
+
+    assert list(outputs) == ["boot_id"]
+    assert outputs["boot_id"].output == "5f1c2b0e-8a4d-4c3e-9f7a-2d6b1e0c9a84"
+    assert parse_inventory_output("", sections, TOKEN) == {}
+
+
+def test_malformed_end_marker_counts_as_a_failure():
+    sections = {"boot_id": ["cat /proc/sys/kernel/random/boot_id", "uuidgen"]}
+    output = f"{SECTION_MARKER}:{TOKEN}:begin:boot_id\n{SECTION_MARKER}:{TOKEN}:end:garbage\n"
+
+    outputs = parse_inventory_output(output, sections, TOKEN)
+
+    assert outputs["boot_id"].return_code == 1
+    assert outputs["boot_id"].command == "cat /proc/sys/kernel/random/boot_id || uuidgen"
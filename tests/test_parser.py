@@ -0,0 +1,211 @@
+import json
+
+import pytest
+
+from custom_components.easy_computer_manager.computer.common import CommandOutput
+from custom_components.easy_computer_manager.computer.models import AudioDevice, Monitor
+from custom_components.easy_computer_manager.computer.parser import parse_bluetoothctl, parse_bluez_objects, \
+    parse_gnome_monitors_output, parse_mutter_display_config, parse_pactl_devices, parse_pactl_json_devices, \
+    parse_pactl_output
+
+GNOME_MONITORS = """Monitor [ DP-1 ] ON
+  display-name: "Dell Inc. DELL U2720Q"
+  2560x1440@143.912 [preferred]
+  2560x1440@119.998
+  2560x1440@119.500
+  2560x1440@59.951
+  1920x1080@60.000
+  1920x1080@59.940
+  1280x720@60.000
+  1024x768@60.004
+
+Monitor [ HDMI-1 ] OFF
+  display-name:
+  1920x1080@60.000 [preferred]
+
+Logical monitor [ 0+0 ] PRIMARY, scale = 1, transform = normal
+  DP-1"""
+
+PACTL_SOURCES = """Source #57
+\tState: SUSPENDED
+\tName: alsa_output.pci-0000_0c_00.4.analog-stereo.monitor
+\tDescription: Monitor of Starship/Matisse HD Audio Controller Analog Stereo
+\tDriver: PipeWire
+\tSample Specification: s32le 2ch 48000Hz
+\tMonitor of Sink: alsa_output.pci-0000_0c_00.4.analog-stereo
+\tProperties:
+\t\tdevice.description = "Monitor of Starship/Matisse HD Audio Controller Analog Stereo"
+\t\tdevice.class = "monitor"
+
+Source #58
+\tState: RUNNING
+\tName: alsa_input.usb-SteelSeries_Arctis_7-00.mono-fallback
+\tDescription: Arctis 7 Mono
+\tDriver: PipeWire
+\tMute: no
+\tVolume: mono: 45875 /  70% / -9.29 dB
+\t        balance 0.00
+\tProperties:
+\t\tdevice.description = "Arctis 7 Mono"
+
+Source #61
+\tState: SUSPENDED
+\tName: alsa_output.usb-SteelSeries_Arctis_7-00.analog-stereo.monitor
+\tDescription: Monitor of Arctis 7 Analog Stereo
+\tDriver: PipeWire"""
+
+PACTL_SINKS = """Sink #56
+\tState: SUSPENDED
+\tName: alsa_output.pci-0000_0c_00.4.analog-stereo
+\tDescription: Starship/Matisse HD Audio Controller Analog Stereo
+\tDriver: PipeWire
+\tMonitor Source: alsa_output.pci-0000_0c_00.4.analog-stereo.monitor
+\tPorts:
+\t\tanalog-output-lineout: Line Out (type: Line, priority: 9000, availability unknown)
+\tActive Port: analog-output-lineout"""
+
+
+# busctl --json=short call org.gnome.Mutter.DisplayConfig ... GetCurrentState, for the same monitors as GNOME_MONITORS
+MUTTER_STATE = json.dumps({"type": "ua((ssss)a(siiddada{sv})a{sv})a(iiduba(ssss)a{sv})a{sv}", "data": [
+    12,
+    [
+        [["DP-1", "DEL", "DELL U2720Q", "8L3LS13"], [
+            ["2560x1440@143.912", 2560, 1440, 143.912, 1.0, [1.0, 2.0], {"is-current": {"type": "b", "data": True}}],
+            ["2560x1440@119.998", 2560, 1440, 119.998, 1.0, [1.0, 2.0], {}],
+            ["2560x1440@119.500", 2560, 1440, 119.5, 1.0, [1.0, 2.0], {}],
+            ["2560x1440@59.951", 2560, 1440, 59.951, 1.0, [1.0, 2.0], {}],
+            ["1920x1080@60.000", 1920, 1080, 60.0, 1.0, [1.0, 2.0], {}],
+            ["1920x1080@59.940", 1920, 1080, 59.94, 1.0, [1.0, 2.0], {}],
+            ["1280x720@60.000", 1280, 720, 60.0, 1.0, [1.0], {}],
+            ["1024x768@60.004", 1024, 768, 60.004, 1.0, [1.0], {}],
+        ], {"display-name": {"type": "s", "data": "Dell Inc. DELL U2720Q"},
+            "is-builtin": {"type": "b", "data": False}}],
+        [["HDMI-1", "GSM", "LG HDR 4K", "0x0001"], [
+            ["1920x1080@60.000", 1920, 1080, 60.0, 1.0, [1.0], {"is-preferred": {"type": "b", "data": True}}],
+        ], {}],
+    ],
+    [[0, 0, 1.0, 0, True, [["DP-1", "DEL", "DELL U2720Q", "8L3LS13"]], {}]],
+    {"layout-mode": {"type": "u", "data": 1}},
+]})
+
+BLUETOOTHCTL = """Device 38:18:4C:12:34:56 (public)
+\tName: WH-1000XM4
+\tAlias: WH-1000XM4
+\tPaired: yes
+\tConnected: yes
+Device F4:73:35:AB:CD:EF (public)
+\tName: MX Master 3
+\tPaired: yes
+\tConnected: no"""
+
+# busctl --json=short call org.bluez / org.freedesktop.DBus.ObjectManager GetManagedObjects, same devices
+BLUEZ_OBJECTS = json.dumps({"type": "a{oa{sa{sv}}}", "data": [{
+    "/org/bluez": {"org.bluez.AgentManager1": {}},
+    "/org/bluez/hci0": {"org.bluez.Adapter1": {"Address": {"type": "s", "data": "00:1A:7D:DA:71:13"}}},
+    "/org/bluez/hci0/dev_38_18_4C_12_34_56": {"org.bluez.Device1": {
+        "Address": {"type": "s", "data": "38:18:4C:12:34:56"}, "Name": {"type": "s", "data": "WH-1000XM4"},
+        "Connected": {"type": "b", "data": True}}, "org.bluez.MediaControl1": {}},
+    "/org/bluez/hci0/dev_F4_73_35_AB_CD_EF": {"org.bluez.Device1": {
+        "Address": {"type": "s", "data": "F4:73:35:AB:CD:EF"}, "Name": {"type": "s", "data": "MX Master 3"},
+        "Connected": {"type": "b", "data": False}}},
+}]})
+
+
+def test_gnome_monitors():
+    monitors = parse_gnome_monitors_output(GNOME_MONITORS)
+
+    assert list(monitors) == [
+        # 119.500 is less than 1Hz below 119.998, 59.940 below 60.000, and 1024 pixels is too narrow
+        Monitor("DP-1", "ON", ["Dell Inc. DELL U2720Q"],
+                ["2560x1440@143.912", "2560x1440@119.998", "2560x1440@59.951", "1920x1080@60.000",
+                 "1280x720@60.000"]),
+        Monitor("HDMI-1", "OFF", [], ["1920x1080@60.000"]),
+    ]
+    assert monitors.find("Dell Inc. DELL U2720Q").source == "DP-1"
+
+
+def test_gnome_monitors_from_a_stream_of_lines():
+    lines = (f"{line}\n" for line in GNOME_MONITORS.split("\n"))
+
+    assert parse_gnome_monitors_output(lines) == parse_gnome_monitors_output(GNOME_MONITORS)
+
+
+def test_gnome_monitors_without_monitors():
+    assert len(parse_gnome_monitors_output("")) == 0
+    assert len(parse_gnome_monitors_output("  2560x1440@143.912\nMonitor [ DP-1 ON")) == 0
+
+
+def test_pactl_devices_skip_monitors():
+    microphones = parse_pactl_devices(PACTL_SOURCES, "Source")
+
+    # Including the last device, only known to be a monitor once its description is read
+    assert list(microphones) == [
+        AudioDevice(58, "alsa_input.usb-SteelSeries_Arctis_7-00.mono-fallback", "RUNNING", "Arctis 7 Mono"),
+    ]
+
+
+def test_pactl_output():
+    config = parse_pactl_output(PACTL_SINKS, PACTL_SOURCES)
+
+    assert config.speakers.find("alsa_output.pci-0000_0c_00.4.analog-stereo").id == 56
+    assert config.speakers[0].description == "Starship/Matisse HD Audio Controller Analog Stereo"
+    assert [device.id for device in config.microphones] == [58]
+
+
+def test_pactl_devices_of_the_other_type_are_ignored():
+    assert len(parse_pactl_devices(PACTL_SINKS, "Source")) == 0
+    assert len(parse_pactl_devices("", "Sink")) == 0
+
+
+def test_mutter_display_config_matches_gnome_monitor_config():
+    monitors = parse_mutter_display_config(MUTTER_STATE)
+
+    assert monitors == parse_gnome_monitors_output(GNOME_MONITORS)
+
+
+@pytest.mark.parametrize("config", ["", "not json", '{"data": []}', '{"data": [1, [["DP-1"]], [], {}]}'])
+def test_unexpected_mutter_display_config(config):
+    with pytest.raises(ValueError):
+        parse_mutter_display_config(config)
+
+
+def test_pactl_json_devices_skip_monitors():
+    devices = [
+        {"index": 57, "state": "SUSPENDED", "name": "alsa_output.pci-0000_0c_00.4.analog-stereo.monitor",
+         "description": "Monitor of Starship/Matisse HD Audio Controller Analog Stereo",
+         "monitor_of_sink": "alsa_output.pci-0000_0c_00.4.analog-stereo", "properties": {"device.class": "monitor"}},
+        {"index": 58, "state": "RUNNING", "name": "alsa_input.usb-SteelSeries_Arctis_7-00.mono-fallback",
+         "description": "Arctis 7 Mono", "monitor_of_sink": "n/a", "properties": {"device.class": "sound"}},
+        # Localized description, still a monitor
+        {"index": 61, "state": "SUSPENDED", "name": "alsa_output.usb-SteelSeries_Arctis_7-00.analog-stereo.monitor",
+         "description": "Moniteur de Arctis 7 Analog Stereo", "monitor_of_sink": "n/a",
+         "properties": {"device.class": "monitor"}},
+    ]
+
+    assert parse_pactl_json_devices(json.dumps(devices)) == parse_pactl_devices(PACTL_SOURCES, "Source")
+
+
+def test_pactl_json_devices_with_missing_fields():
+    devices = parse_pactl_json_devices('[{"index": 56}]')
+
+    assert list(devices) == [AudioDevice(56)]
+    with pytest.raises(ValueError):
+        parse_pactl_json_devices('[{"name": "alsa_output.pci-0000_0c_00.4.analog-stereo"}]')
+    with pytest.raises(ValueError):
+        parse_pactl_json_devices('{"index": 56}')
+
+
+def test_bluez_objects_match_bluetoothctl():
+    bluetoothctl = CommandOutput("bluetoothctl info", 0, BLUETOOTHCTL, "")
+
+    assert parse_bluez_objects(BLUEZ_OBJECTS) == parse_bluetoothctl(bluetoothctl)
+    assert parse_bluez_objects(BLUEZ_OBJECTS, False) == parse_bluetoothctl(bluetoothctl, False)
+    assert [device.name for device in parse_bluez_objects(BLUEZ_OBJECTS, False)] == ["WH-1000XM4", "MX Master 3"]
+
+
+def test_unexpected_bluez_objects():
+    assert len(parse_bluez_objects('{"type": "a{oa{sa{sv}}}", "data": [{}]}')) == 0
+    with pytest.raises(ValueError):
+        parse_bluez_objects('{"data": [{"/org/bluez/hci0/dev_1": {"org.bluez.Device1": {}}}]}')
+    with pytest.raises(ValueError):
+        parse_bluez_objects('{"data": []}')
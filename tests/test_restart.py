@@ -0,0 +1,70 @@
+import asyncio
+import re
+
+import pytest
+
+from custom_components.easy_computer_manager.computer import Computer
+from custom_components.easy_computer_manager.computer.batch import STEP_MARKER
+from custom_components.easy_computer_manager.computer.common import CommandOutput, OSType
+
+GRUB_ENTRIES = "Windows Boot Manager (on /dev/nvme0n1p1)\nWindows 10 (on /dev/sda1)"
+
+
+class HostConnection:
+    """Records the commands, `uname` tells whether it runs Linux, the GRUB entries are listed and batches succeed."""
+
+    def __init__(self, linux: bool) -> None:
+        self.linux = linux
+        self.commands = []
+
+    async def execute_command(self, command: str, timeout=None) -> CommandOutput:
+        self.commands.append(command)
+        if command == "uname":
+            return CommandOutput(command, 0 if self.linux else 1, "Linux" if self.linux else "", "")
+        if "/windows/" in command:
+            return CommandOutput(command, 0, GRUB_ENTRIES, "")
+        batch = re.search(f"{STEP_MARKER}:([0-9a-f]+):", command)
+        if batch:
+            steps = len(re.findall(f"{STEP_MARKER}:", command))
+            return CommandOutput(command, 0, "".join(f"\n{batch[0]}{step}:0:0\n" for step in range(steps)), "")
+        return CommandOutput(command, 0, "", "")
+
+    execute_in_shell = execute_command
+
+
+def make_computer(connection: HostConnection) -> Computer:
+    return Computer("192.0.2.10", "02:00:00:00:00:01", "test", "test", connection=connection, persistent_shell=False)
+
+
+def test_restart_to_windows_detects_the_os_first():
+    async def run():
+        connection = HostConnection(linux=True)
+        computer = make_computer(connection)
+
+        await computer.restart(OSType.LINUX, OSType.WINDOWS)
+
+        assert connection.commands[0] == "uname"
+        assert computer.windows_entry_grub == "Windows Boot Manager (on /dev/nvme0n1p1)"
+        assert "'Windows Boot Manager (on /dev/nvme0n1p1)'" in connection.commands[-1]
+
+    asyncio.run(run())
+
+
+def test_restart_to_windows_is_refused_from_windows():
+    async def run():
+        connection = HostConnection(linux=False)
+        computer = make_computer(connection)
+
+        with pytest.raises(ValueError, match="only from Linux"):
+            await computer.restart(OSType.LINUX, OSType.WINDOWS)
+        assert connection.commands == ["uname"]  # Not restarted to the default entry
+
+    asyncio.run(run())
+
+
+def test_only_the_first_grub_entry_is_kept():
+    computer = make_computer(HostConnection(linux=True))
+
+    computer._apply_outputs({"get_windows_entry_grub": CommandOutput("grep", 0, GRUB_ENTRIES, "")})
+
+    assert computer.windows_entry_grub == "Windows Boot Manager (on /dev/nvme0n1p1)"
@@ -0,0 +1,109 @@
+import asyncio
+
+from custom_components.easy_computer_manager.computer import Computer
+from custom_components.easy_computer_manager.computer.common import CommandOutput, OSType
+from custom_components.easy_computer_manager.computer.result_cache import ResultCache, cache_key
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class GatedConnection:
+    """Answers every command right away, except the pactl reads which wait until released."""
+
+    def __init__(self) -> None:
+        self.read_started = asyncio.Event()
+        self.release_reads = asyncio.Event()
+
+    async def execute_command(self, command: str, timeout=None) -> CommandOutput:
+        if "pactl" in command and " list " in command:
+            self.read_started.set()
+            await self.release_reads.wait()
+            return CommandOutput(command, 0, "[]", "")
+        return CommandOutput(command, 0, "", "")
+
+    execute_in_shell = execute_command
+
+
+def make_computer(connection: GatedConnection) -> Computer:
+    computer = Computer("192.0.2.10", "02:00:00:00:00:01", "test", "test", connection=connection,
+                        persistent_shell=False)
+    computer.operating_system = OSType.LINUX
+    return computer
+
+
+def test_put_and_ttl():
+    clock = Clock()
+    cache = ResultCache(10, clock)
+    key = cache_key("host", "get_speakers")
+
+    cache.put(key, CommandOutput("pactl", 0, "[]", ""))
+    assert cache.get(key).output == "[]"
+
+    clock.now = 10
+    assert cache.get(key) is None
+
+
+def test_failed_results_are_not_kept():
+    cache = ResultCache(10)
+    key = cache_key("host", "get_speakers")
+
+    cache.put(key, CommandOutput("pactl", 1, "", "error"))
+    assert cache.get(key) is None
+
+
+def test_put_after_invalidation_is_dropped():
+    cache = ResultCache(10)
+    speakers, grub = cache_key("host", "get_speakers"), cache_key("host", "get_windows_entry_grub")
+    speakers_epoch, grub_epoch = cache.epoch(speakers), cache.epoch(grub)
+
+    cache.invalidate(["get_speakers"])
+    cache.put(speakers, CommandOutput("pactl", 0, "[]", ""), speakers_epoch)
+    cache.put(grub, CommandOutput("grep", 0, "Windows", ""), grub_epoch)
+
+    assert cache.get(speakers) is None
+    assert cache.get(grub).output == "Windows"
+
+
+def test_put_after_invalidating_everything_is_dropped():
+    cache = ResultCache(10)
+    key = cache_key("host", "get_speakers")
+    epoch = cache.epoch(key)
+
+    cache.invalidate()
+    cache.put(key, CommandOutput("pactl", 0, "[]", ""), epoch)
+
+    assert cache.get(key) is None
+
+
+def test_write_during_an_in_flight_read_is_not_undone():
+    async def run():
+        connection = GatedConnection()
+        computer = make_computer(connection)
+
+        read = asyncio.create_task(computer.run_action("get_speakers"))
+        await connection.read_started.wait()
+        await computer.run_action("set_audio_config", {"args": "set-sink-mute @DEFAULT_SINK@ 1"})
+        connection.release_reads.set()
+
+        assert (await read).successful()
+        assert computer.read_cache.get(cache_key(computer.host, "get_speakers")) is None
+
+    asyncio.run(run())
+
+
+def test_read_without_write_is_cached():
+    async def run():
+        connection = GatedConnection()
+        connection.release_reads.set()
+        computer = make_computer(connection)
+
+        await computer.run_action("get_speakers")
+        assert computer.read_cache.get(cache_key(computer.host, "get_speakers")) is not None
+
+    asyncio.run(run())
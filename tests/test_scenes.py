@@ -0,0 +1,35 @@
+import asyncio
+
+from custom_components.easy_computer_manager.computer import Computer
+from custom_components.easy_computer_manager.computer.common import CommandOutput, OSType
+from custom_components.easy_computer_manager.computer.scenes import parse_scenes
+
+
+class RecordingConnection:
+    def __init__(self) -> None:
+        self.commands = []
+
+    async def execute_command(self, command: str, timeout=None) -> CommandOutput:
+        self.commands.append(command)
+        return CommandOutput(command, 0, "", "")
+
+    execute_in_shell = execute_command
+
+
+def test_scene_batch_is_rebuilt_when_the_command_memory_changes():
+    async def run():
+        computer = Computer("192.0.2.10", "02:00:00:00:00:01", "test", "test", connection=RecordingConnection(),
+                            persistent_shell=False, scenes=parse_scenes({"gaming": {"steam_big_picture": "start"}}))
+        computer.operating_system = OSType.LINUX
+
+        await computer.apply_scene("gaming")
+        batch = computer._scene_batches["gaming"][1]
+        await computer.apply_scene("gaming")
+        assert computer._scene_batches["gaming"][1] is batch  # Nothing changed, reused
+
+        sources = computer._plan("shutdown").sources
+        computer.command_memory.succeeded(OSType.LINUX.value, "shutdown", sources[1], sources)
+        await computer.apply_scene("gaming")
+        assert computer._scene_batches["gaming"][1] is not batch
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+import subprocess
+from typing import List
+
+import pytest
+
+from custom_components.easy_computer_manager.computer.common import CommandOutput
+from custom_components.easy_computer_manager.computer.shell import FRAME_MARKER, SHELL_COMMAND, SHELL_SETUP, \
+    ShellFrame, build_shell_command
+
+TOKEN = "0123456789abcdef"
+
+
+def run_in_shell(commands: List[str]) -> List[CommandOutput]:
+    """Write framed commands to a single local shell, set up like the persistent shell of a host, and read them back."""
+    script = SHELL_SETUP + "".join(build_shell_command(command, TOKEN) for command in commands)
+    stdout = subprocess.run(SHELL_COMMAND, input=script, capture_output=True, text=True, timeout=10).stdout
+    lines = iter(stdout.splitlines(keepends=True))
+
+    results = []
+    for command in commands:
+        frame = ShellFrame(command, TOKEN)
+        while not frame.feed(next(lines, "")):
+            pass
+        results.append(frame.result())
+    return results
+
+
+def test_output_error_and_exit_code_are_split():
+    result, = run_in_shell(["echo 'Sink #56'; echo 'No such sink' >&2; exit 2"])
+
+    assert result.output == "Sink #56"
+    assert result.error == "No such sink"
+    assert result.return_code == 2
+
+
+def test_output_without_a_trailing_newline():
+    result, = run_in_shell(["printf GNOME"])  # The exit code marker still starts a line
+
+    assert result.output == "GNOME"
+    assert result.successful()
+
+
+def test_shell_survives_exit_syntax_errors_and_stdin_readers():
+    results = run_in_shell(["exit 5", "if then", "cat", "uname"])
+
+    assert results[0].return_code == 5
+    assert not results[1].successful()
+    assert results[2].successful() and results[2].output == ""  # Did not eat the next command
+    assert results[3].output == "Linux"
+
+
+def test_markers_inside_the_output_are_not_frames():
+    forged = f"{FRAME_MARKER}:ffffffffffffffff:rc:0"
+    result, = run_in_shell([f"echo '{forged}'; echo 'text {FRAME_MARKER}:{TOKEN}:end'"])
+
+    assert result.output == f"{forged}\ntext {FRAME_MARKER}:{TOKEN}:end"
+    assert result.return_code == 0
+
+
+def test_shell_exiting_mid_frame():
+    frame = ShellFrame("uname", TOKEN)
+    assert not frame.feed("Linux\n")
+
+    with pytest.raises(EOFError):
+        frame.feed("")
+
+
+def test_malformed_exit_code_counts_as_a_failure():
+    frame = ShellFrame("uname", TOKEN)
+    frame.feed(f"{FRAME_MARKER}:{TOKEN}:rc:\n")
+    assert frame.feed(f"{FRAME_MARKER}:{TOKEN}:end\n")
+
+    assert frame.result().return_code == 1
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_host import start_hosts
+from custom_components.easy_computer_manager.computer import Computer, SSH_CLIENTS
+from custom_components.easy_computer_manager.computer.common import CommandOutput
+from custom_components.easy_computer_manager.const import PRESENCE_PROBE_TCP, SSH_BACKENDS
+
+READ_ACTIONS = ("get_speakers", "get_microphones", "get_bluetooth_devices")
+
+
+async def wait_for_connections(hosts, expected: int, timeout: float = 5) -> int:
+    """Return the number of connections open on the hosts once it is at most `expected` (or the timeout expired)."""
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + timeout
+    while (connections := (await hosts.totals())["connections"]) > expected and loop.time() < expires_at:
+        await asyncio.sleep(0.05)
+    return connections
+
+
+@pytest.mark.parametrize("backend", SSH_BACKENDS)
+def test_concurrent_connects_open_a_single_connection(backend):
+    async def run():
+        hosts = await start_hosts(1)
+        client = SSH_CLIENTS[backend]("127.0.0.1", "test", "test", hosts.ports[0])
+        try:
+            await asyncio.gather(*(client.connect() for _ in range(10)))
+
+            assert client.connected
+            assert await wait_for_connections(hosts, 1) == 1
+        finally:
+            await client.close()
+            await hosts.stop()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("backend", SSH_BACKENDS)
+def test_commands_racing_a_disconnect_fail_without_raising(backend):
+    async def run():
+        hosts = await start_hosts(1, latency=0.01)
+        client = SSH_CLIENTS[backend]("127.0.0.1", "test", "test", hosts.ports[0])
+        try:
+            await client.connect()
+            for _ in range(5):
+                results = await asyncio.gather(
+                    *(client.execute_command("uname") for _ in range(4)),
+                    *(client.execute_in_shell("uname") for _ in range(4)),
+                    client.disconnect(),
+                )
+                assert all(isinstance(result, CommandOutput) for result in results[:-1])
+        finally:
+            await client.close()
+            await hosts.stop()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("persistent_shell", [True, False])
+@pytest.mark.parametrize("backend", SSH_BACKENDS)
+def test_reconnect_under_load(backend, persistent_shell):
+    async def run():
+        hosts = await start_hosts(2, latency=0.002, drop_rate=0.1)
+        computers = [
+            Computer("127.0.0.1", f"02:00:00:00:00:{index:02x}", "test", "test", port, inventory=False,
+                     ssh_backend=backend, persistent_shell=persistent_shell, presence_probe=PRESENCE_PROBE_TCP)
+            for index, port in enumerate(hosts.ports)
+        ]
+        try:
+            for _ in range(15):
+                results = await asyncio.gather(
+                    *(computer.update(True) for computer in computers),
+                    *(computer.run_action(action_id, use_cache=False)
+                      for computer in computers for action_id in READ_ACTIONS),
+                    return_exceptions=True
+                )
+                # A connection that cannot be re-established is reported to the coordinator, nothing else may escape
+                unexpected = [result for result in results
+                              if isinstance(result, BaseException) and not isinstance(result, ConnectionError)]
+                assert not unexpected
+
+            assert (await hosts.totals())["drops"] > 0
+            # Every reconnection replaced the previous connection instead of adding one
+            assert await wait_for_connections(hosts, len(computers)) <= len(computers)
+        finally:
+            await asyncio.gather(*(computer._connection.close() for computer in computers))
+            await hosts.stop()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("backend", SSH_BACKENDS)
+def test_commands_to_a_frozen_host_time_out(backend):
+    async def run():
+        hosts = await start_hosts(1)
+        client = SSH_CLIENTS[backend]("127.0.0.1", "test", "test", hosts.ports[0])
+        try:
+            await client.connect()
+            hosts.freeze()  # Opening a channel is never answered
+
+            loop = asyncio.get_running_loop()
+            started_at = loop.time()
+            results = await asyncio.gather(client.execute_command("uname", 0.5), client.execute_in_shell("uname", 0.5))
+
+            assert all(result.timed_out for result in results)
+            assert loop.time() - started_at < 2
+        finally:
+            hosts.thaw()
+            await client.close()
+            await hosts.stop()
+
+    asyncio.run(run())
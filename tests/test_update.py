@@ -0,0 +1,42 @@
+import asyncio
+
+from custom_components.easy_computer_manager.computer import Computer
+from custom_components.easy_computer_manager.computer.common import CommandOutput, OSType
+
+
+class SlowSourcesConnection:
+    """Answers every command right away, except listing the sources which always times out."""
+
+    def __init__(self) -> None:
+        self.linux = True
+
+    async def check_connection_alive(self) -> bool:
+        return True
+
+    async def execute_command(self, command: str, timeout=None) -> CommandOutput:
+        if "pactl" in command and "sources" in command:
+            return CommandOutput.timeout(command)
+        if command == "uname" and not self.linux:
+            return CommandOutput(command, 1, "", "'uname' is not recognized")
+        return CommandOutput(command, 0, "[]", "")
+
+    execute_in_shell = execute_command
+
+
+def test_update_reports_the_refreshed_actions_only():
+    async def run():
+        connection = SlowSourcesConnection()
+        computer = Computer("192.0.2.10", "02:00:00:00:00:01", "test", "test", connection=connection,
+                            inventory=False, persistent_shell=False)
+        computer.operating_system = OSType.LINUX
+
+        refreshed = await computer.update(True, actions=("get_speakers", "get_microphones"))
+        assert refreshed == {"get_speakers"}
+
+        connection.linux = False
+        computer.operating_system = None  # Nothing to read on Windows, but nothing missed either
+        assert await computer.update(True, actions=("get_microphones",)) == {"get_microphones"}
+
+        assert await computer.update(False, actions=("get_speakers",)) == frozenset()
+
+    asyncio.run(run())